@@ -0,0 +1,150 @@
+from SolanaRpcApi import SolanaRpcApi
+import JsonDecoder
+import asyncio
+import itertools
+import websockets
+
+c_resubscribe_delay = 1 #Seconds before a rejected subscription is requested again
+
+#One websocket connection and the accountSubscribe subscriptions that live on it
+class AccountSubscriptionShard:
+    def __init__(self, wss_uri: str, encoding: str, on_notification):
+        self.wss_uri = wss_uri
+        self.encoding = encoding
+        self.on_notification = on_notification
+        self.accounts : dict[any, str] = {} #Key=subscriber key; Value=account address. Survives reconnects
+        self.pending_requests : dict[int, any] = {} #Key=request id; Value=subscriber key
+        self.pending_keys = set()
+        self.subscription_keys : dict[int, any] = {} #Key=subscription id; Value=subscriber key
+        self.subscription_ids : dict[any, int] = {} #Key=subscriber key; Value=subscription id
+        self.request_ids = itertools.count(1)
+        self.request_queue = asyncio.Queue()
+        self.wsocket = None
+
+    def get_subscription_count(self)->int:
+        return len(self.accounts)
+
+    def is_connected(self)->bool:
+        return self.wsocket is not None
+
+    async def run(self):
+        await asyncio.gather(self._send_requests(), self._read_socket())
+
+    async def _send_requests(self):
+        while True:
+            key, subscribe = await self.request_queue.get()
+
+            try:
+                if self.wsocket:
+                    if subscribe and key in self.accounts and key not in self.subscription_ids and key not in self.pending_keys:
+                        await self._send_subscribe(key)
+                    elif not subscribe and key in self.subscription_ids:
+                        subscription_id = self.subscription_ids.pop(key)
+                        self.subscription_keys.pop(subscription_id, None)
+                        request = SolanaRpcApi.get_account_unsubscribe_request(subscription_id, next(self.request_ids))
+                        await self.wsocket.send(JsonDecoder.dumps(request))
+            except Exception as e:
+                print("Error " + str(e))
+
+    async def _send_subscribe(self, key):
+        request_id = next(self.request_ids)
+        self.pending_requests[request_id] = key
+        self.pending_keys.add(key)
+
+        request = SolanaRpcApi.get_account_subscribe_request(self.accounts[key], request_id, self.encoding)
+        await self.wsocket.send(JsonDecoder.dumps(request))
+
+    async def _read_socket(self):
+        while True:
+            try:
+                async with websockets.connect(self.wss_uri) as websocket:
+                    self.pending_requests.clear()
+                    self.pending_keys.clear()
+                    self.subscription_keys.clear()
+                    self.subscription_ids.clear()
+                    self.wsocket = websocket
+
+                    #Pipeline every resubscription up front; confirmations are matched by request id as they arrive
+                    for key in list(self.accounts.keys()):
+                        await self._send_subscribe(key)
+
+                    while True:
+                        received = await websocket.recv()
+                        self._process(JsonDecoder.decode_account_message(received))
+            except Exception as e:
+                print("Error " + str(e))
+            finally:
+                self.wsocket = None
+
+            await asyncio.sleep(1)
+
+    def _process(self, data: dict):
+        params = data.get('params', None)
+
+        if params:
+            key = self.subscription_keys.get(params['subscription'], None)
+
+            if key is not None:
+                self.on_notification(key, params['result'])
+        elif 'result' in data:
+            key = self.pending_requests.pop(data.get('id', None), None)
+
+            if key is not None:
+                self.pending_keys.discard(key)
+
+                if key in self.accounts:
+                    self.subscription_keys[data['result']] = key
+                    self.subscription_ids[key] = data['result']
+                else:
+                    #Unsubscribed while the request was in flight
+                    self.request_queue.put_nowait((key, False))
+                    self.subscription_ids[key] = data['result']
+        elif 'error' in data:
+            key = self.pending_requests.pop(data.get('id', None), None)
+
+            if key is not None:
+                self.pending_keys.discard(key)
+                print(f"Error subscribing to {self.accounts.get(key, key)}: {data['error']}")
+                asyncio.get_running_loop().call_later(c_resubscribe_delay, self.request_queue.put_nowait, (key, True))
+
+class AccountSubscriptionManager:
+    """
+    Spreads accountSubscribe subscriptions across connection_count websocket connections and routes
+    every notification back to its subscriber key through the subscription id returned by the node.
+    on_notification(key, result) is called on the manager's event loop.
+    """
+    def __init__(self, wss_uri: str, on_notification, connection_count = 1, encoding = "jsonParsed"):
+        self.shards = [AccountSubscriptionShard(wss_uri, encoding, on_notification) for i in range(max(1, connection_count))]
+        self.shard_by_key : dict[any, AccountSubscriptionShard] = {}
+        self.loop : asyncio.AbstractEventLoop = None
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        await asyncio.gather(*[shard.run() for shard in self.shards])
+
+    def subscribe(self, key, account_address: str):
+        """Thread safe. The subscription is (re)established whenever its connection is up."""
+        if key not in self.shard_by_key:
+            shard = min(self.shards, key=lambda shard: shard.get_subscription_count())
+            shard.accounts[key] = account_address
+            self.shard_by_key[key] = shard
+            self._queue_request(shard, key, True)
+
+    def unsubscribe(self, key):
+        shard = self.shard_by_key.pop(key, None)
+
+        if shard:
+            shard.accounts.pop(key, None)
+            self._queue_request(shard, key, False)
+
+    def is_subscribed(self, key)->bool:
+        shard = self.shard_by_key.get(key, None)
+
+        return shard is not None and shard.is_connected() and key in shard.subscription_ids
+
+    def get_subscription_count(self)->int:
+        return len(self.shard_by_key)
+
+    def _queue_request(self, shard: AccountSubscriptionShard, key, subscribe: bool):
+        if self.loop:
+            self.loop.call_soon_threadsafe(shard.request_queue.put_nowait, (key, subscribe))
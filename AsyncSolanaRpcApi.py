@@ -0,0 +1,208 @@
+from jsonrpcclient import request, parse, Ok, Error
+from solders.transaction import VersionedTransaction
+from SolanaRpcApi import SolanaRpcApi, c_max_batch_size
+import JsonDecoder
+import aiohttp
+import asyncio
+import base64
+
+c_default_connection_limit = 100
+c_default_request_timeout = 30
+c_max_signature_statuses = 256 #getSignatureStatuses limit per call
+c_default_close_timeout = 5
+
+#asyncio counterpart of SolanaRpcApi; every coroutine shares one pooled aiohttp session per event loop
+class AsyncSolanaRpcApi:
+
+    def __init__(self, rpc_uri, wss_uri, wallet_address, connection_limit = c_default_connection_limit, request_timeout = c_default_request_timeout):
+        self.rpc_uri = rpc_uri
+        self.wss_uri = wss_uri
+        self.wallet_address = wallet_address
+        self.connection_limit = connection_limit
+        self.request_timeout = request_timeout
+        self.sessions : dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {} #aiohttp sessions are bound to the loop that created them
+
+    @staticmethod
+    def from_rpc_api(solana_rpc_api: SolanaRpcApi, connection_limit = c_default_connection_limit):
+        return AsyncSolanaRpcApi(solana_rpc_api.rpc_uri, solana_rpc_api.wss_uri, solana_rpc_api.wallet_address, connection_limit)
+
+    def _get_session(self)->aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = self.sessions.get(loop, None)
+
+        if not session or session.closed:
+            self._evict_closed_loops()
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=60)
+            session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.request_timeout))
+            self.sessions[loop] = session
+
+        return session
+
+    def _evict_closed_loops(self):
+        #Sessions of loops that were closed before their owner called close() can no longer be closed; drop them
+        for loop in [loop for loop in self.sessions if loop.is_closed()]:
+            del self.sessions[loop]
+
+    async def close(self):
+        """Closes the session of the running loop. Owners call it on their loop before that loop stops."""
+        session = self.sessions.pop(asyncio.get_running_loop(), None)
+
+        if session:
+            await session.close()
+
+    def close_threadsafe(self, loop: asyncio.AbstractEventLoop, timeout = c_default_close_timeout):
+        """Runs close() on loop from another thread and waits up to timeout seconds for it."""
+        if loop and loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(self.close(), loop).result(timeout)
+            except Exception as e:
+                print("Error closing RPC session " + str(e))
+
+    async def run_rpc_method(self, request_name: str, params, decoder = JsonDecoder.loads):
+        json_request = request(request_name, params=params)
+
+        async with self._get_session().post(self.rpc_uri, json=json_request) as response:
+            parsed = parse(decoder(await response.read()))
+
+        if isinstance(parsed, Error):
+            return None
+        else:
+            return parsed
+
+    async def run_rpc_batch(self, request_name: str, params_list: list, decoder = JsonDecoder.loads)->list:
+        """
+        Async version of SolanaRpcApi.run_rpc_batch. Batches are sent concurrently over the shared pool.
+        """
+        batches = [params_list[i:i+c_max_batch_size] for i in range(0, len(params_list), c_max_batch_size)]
+        batch_results = await asyncio.gather(*[self._run_single_batch(request_name, batch, decoder) for batch in batches])
+
+        return [result for results in batch_results for result in results]
+
+    async def _run_single_batch(self, request_name: str, params_list: list, decoder)->list:
+        json_requests = [request(request_name, params=params) for params in params_list]
+
+        async with self._get_session().post(self.rpc_uri, json=json_requests) as response:
+            response_data = decoder(await response.read())
+
+        results_by_id = {}
+
+        if isinstance(response_data, list):
+            for parsed in parse(response_data):
+                if isinstance(parsed, Ok):
+                    results_by_id[parsed.id] = parsed.result
+
+        return [results_by_id.get(json_request['id'], None) for json_request in json_requests]
+
+    async def get_transaction(self, tx_signature: str | list[str]):
+        if isinstance(tx_signature, list):
+            return await self.run_rpc_batch("getTransaction", [[signature, {'encoding': 'jsonParsed', 'maxSupportedTransactionVersion':0 }]
+                                                              for signature in tx_signature], JsonDecoder.decode_transaction_response)
+
+        response = await self.run_rpc_method("getTransaction", [tx_signature,
+                                              {'encoding': 'jsonParsed', 'maxSupportedTransactionVersion':0 }],
+                                              JsonDecoder.decode_transaction_response)
+
+        if response:
+            return response.result
+
+    async def get_account_balance(self, account_address: str | list[str])->float:
+        if isinstance(account_address, list):
+            results = await self.run_rpc_batch("getBalance", [[address] for address in account_address])
+
+            return [result['value'] if result else None for result in results]
+
+        response = await self.run_rpc_method("getBalance", [ account_address ])
+
+        if response:
+            return response.result['value']
+        else:
+            return None
+
+    async def get_token_account_balance(self, associated_token_address: str | list[str]):
+        if isinstance(associated_token_address, list):
+            results = await self.run_rpc_batch("getTokenAccountBalance", [[address] for address in associated_token_address])
+
+            return [result['value']['uiAmount'] if result else None for result in results]
+
+        response = await self.run_rpc_method("getTokenAccountBalance", [ associated_token_address ])
+
+        if response:
+            return response.result['value']['uiAmount']
+        else:
+            return None
+
+    async def get_non_zero_token_accounts(self):
+        """
+        Returns a list of dictionaries, each containing 'mint', 'balance' and 'decimals'
+        for tokens held by the wallet with a non-zero balance.
+        """
+        response = await self.run_rpc_method("getTokenAccountsByOwner", [self.wallet_address,
+                                              {'programId': "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"},
+                                              {'encoding': 'jsonParsed'}])
+        token_accounts = []
+
+        if response and response.result['value']:
+            for token_account in response.result['value']:
+                account_info = token_account['account']['data']['parsed']['info']
+                token_balance = account_info["tokenAmount"]["uiAmount"]
+                if token_balance and token_balance > 0:
+                    token_accounts.append({
+                        "mint": account_info["mint"],
+                        "balance": token_balance,
+                        "decimals": account_info["tokenAmount"]["decimals"]
+                    })
+        return token_accounts
+
+    async def send_transaction(self, transaction: VersionedTransaction | bytes, maxTries=0):
+        transaction_bytes = bytes(transaction)
+        encoded_transaction = base64.b64encode(transaction_bytes).decode('ascii')
+
+        response = await self.run_rpc_method("sendTransaction", [encoded_transaction, {'encoding': 'base64',
+                                                                                       'skipPreflight': True,
+                                                                                       'maxRetries': maxTries}])
+        if response:
+            return response.result
+
+
+    async def get_multiple_account_balances(self, account_addresses: list[str])->list[int]:
+        """
+        Returns the lamport balance of every account in account_addresses (None when missing) using
+        one getMultipleAccounts call per c_max_batch_size accounts. Account data is sliced away to keep responses small.
+        """
+        chunks = [account_addresses[i:i+c_max_batch_size] for i in range(0, len(account_addresses), c_max_batch_size)]
+        responses = await asyncio.gather(*[self.run_rpc_method("getMultipleAccounts", [chunk, {'encoding': 'base64',
+                                                                                                'dataSlice': {'offset': 0, 'length': 0}}])
+                                            for chunk in chunks])
+        balances = []
+
+        for chunk, response in zip(chunks, responses):
+            if response:
+                balances.extend([account['lamports'] if account else None for account in response.result['value']])
+            else:
+                balances.extend([None]*len(chunk))
+
+        return balances
+
+    async def is_blockhash_valid(self, blockhash: str)->bool:
+        response = await self.run_rpc_method("isBlockhashValid", [blockhash, {'commitment': 'processed'}])
+
+        if response:
+            return response.result['value']
+
+    async def get_signature_statuses(self, tx_signatures: list[str])->list[dict]:
+        """
+        Returns the status dict (slot, confirmationStatus, err) of every signature, None when unknown.
+        Sends one getSignatureStatuses call per c_max_signature_statuses signatures.
+        """
+        chunks = [tx_signatures[i:i+c_max_signature_statuses] for i in range(0, len(tx_signatures), c_max_signature_statuses)]
+        responses = await asyncio.gather(*[self.run_rpc_method("getSignatureStatuses", [chunk, {'searchTransactionHistory': False}])
+                                            for chunk in chunks])
+        statuses = []
+
+        for chunk, response in zip(chunks, responses):
+            if response:
+                statuses.extend(response.result['value'])
+            else:
+                statuses.extend([None]*len(chunk))
+
+        return statuses
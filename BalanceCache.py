@@ -0,0 +1,88 @@
+from SolanaRpcApi import SolanaRpcApi
+from AccountSubscriptionManager import AccountSubscriptionManager
+import threading
+import asyncio
+import time
+
+c_default_max_age = 30 #Seconds an unsubscribed balance is trusted before it is read again over RPC
+
+class AccountBalance:
+    def __init__(self, amount: float, slot: int):
+        self.amount = amount #Lamports for a wallet account, ui amount for a token account
+        self.slot = slot
+        self.updated_at = time.time()
+
+class BalanceCache(threading.Thread):
+    """
+    Wallet balances kept current by accountSubscribe notifications, each stamped with the slot it was observed at.
+    A value from an older slot never replaces a newer one. get_balance is a dictionary lookup while the account's
+    subscription is live; a missing value, or one older than max_age while the subscription is down, is refreshed
+    with a single RPC.
+    """
+    def __init__(self, solana_rpc_api: SolanaRpcApi, connection_count = 1, max_age = c_default_max_age):
+        threading.Thread.__init__(self, daemon=True)
+        self.solana_rpc_api = solana_rpc_api
+        self.max_age = max_age
+        self.balances : dict[str, AccountBalance] = {} #Key=account address
+        self.lock = threading.Lock()
+        #Subscriber keys are (account_address, is_token_account)
+        self.subscription_manager = AccountSubscriptionManager(solana_rpc_api.wss_uri, self._process, connection_count)
+
+    def run(self):
+        asyncio.run(self.subscription_manager.run())
+
+    def watch(self, account_address: str, is_token_account: bool):
+        self.subscription_manager.subscribe((account_address, is_token_account), account_address)
+
+    def get_balance(self, account_address: str, is_token_account: bool)->float:
+        """Lamports for a wallet account, ui amount for a token account, or None if it could not be read."""
+        with self.lock:
+            balance = self.balances.get(account_address, None)
+
+        if balance:
+            is_live = self.subscription_manager.is_subscribed((account_address, is_token_account))
+
+            if is_live or time.time() - balance.updated_at <= self.max_age:
+                return balance.amount
+
+        return self._fetch(account_address, is_token_account)
+
+    def get_slot(self, account_address: str)->int:
+        with self.lock:
+            balance = self.balances.get(account_address, None)
+
+            return balance.slot if balance else 0
+
+    def _fetch(self, account_address: str, is_token_account: bool)->float:
+        method = "getTokenAccountBalance" if is_token_account else "getBalance"
+        response = self.solana_rpc_api.run_rpc_method(method, [account_address, {'commitment': 'confirmed'}])
+
+        if response:
+            value = response.result['value']
+            amount = (value['uiAmount'] or 0) if is_token_account else value
+
+            return self._set_balance(account_address, amount, response.result['context']['slot'])
+
+    def _set_balance(self, account_address: str, amount: float, slot: int)->float:
+        """Returns the balance kept, which is the pushed one if it is from a newer slot."""
+        with self.lock:
+            balance = self.balances.get(account_address, None)
+
+            if balance is None or slot >= balance.slot:
+                balance = AccountBalance(amount, slot)
+                self.balances[account_address] = balance
+
+            return balance.amount
+
+    def _process(self, key: tuple[str, bool], result: dict):
+        account_address, is_token_account = key
+        value = result['value']
+
+        if value is None:
+            amount = 0 #Account closed
+        elif is_token_account:
+            amount = value['data']['parsed']['info']['tokenAmount']['uiAmount'] or 0
+        else:
+            amount = value['lamports']
+
+        self._set_balance(account_address, amount, result['context']['slot'])
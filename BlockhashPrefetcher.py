@@ -0,0 +1,60 @@
+from SolanaRpcApi import SolanaRpcApi
+from solders.hash import Hash
+import threading
+import time
+
+c_default_refresh_interval = 0.3
+c_default_max_age = 20 #Seconds a prefetched blockhash is used before falling back to a direct fetch (blockhashes expire after ~60s)
+
+class BlockhashPrefetcher(threading.Thread):
+    """
+    Keeps a recent blockhash fresh in the background so transactions can be built and signed without an RPC
+    round trip. Refreshes every refresh_interval seconds and never moves back to a blockhash from an older slot.
+    """
+    def __init__(self, solana_rpc_api: SolanaRpcApi, refresh_interval = c_default_refresh_interval, max_age = c_default_max_age):
+        threading.Thread.__init__(self, daemon=True)
+        self.solana_rpc_api = solana_rpc_api
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.blockhash : Hash = None
+        self.last_valid_block_height = 0
+        self.slot = 0
+        self.fetched_at = 0
+
+    def run(self):
+        while True:
+            try:
+                self._refresh()
+            except Exception as e:
+                print("Error refreshing blockhash " + str(e))
+
+            time.sleep(self.refresh_interval)
+
+    def _refresh(self):
+        result = self.solana_rpc_api.get_latest_blockhash()
+
+        if result:
+            blockhash, last_valid_block_height, slot = result
+
+            with self.lock:
+                if slot >= self.slot:
+                    self.blockhash = Hash.from_string(blockhash)
+                    self.last_valid_block_height = last_valid_block_height
+                    self.slot = slot
+                    self.fetched_at = time.time()
+
+    def get_blockhash(self)->Hash:
+        """The prefetched blockhash, or a freshly fetched one if the background refresh has fallen behind."""
+        with self.lock:
+            if self.blockhash and time.time() - self.fetched_at <= self.max_age:
+                return self.blockhash
+
+        self._refresh()
+
+        with self.lock:
+            return self.blockhash
+
+    def get_slot(self)->int:
+        with self.lock:
+            return self.slot
@@ -1,9 +1,48 @@
 from PnlTradingEngine import PnlTradingEngine
 from Strategy1 import Strategy1
-from Candlesticks import Candlesticks
+from Candlesticks import Candlesticks, CandlestickBuilder, c_candle_columns
 from TradingDTOs import *
+from RpcRouter import RpcRouter
+from SolanaRpcApi import SolanaRpcApi, c_max_batch_size
+from AsyncSolanaRpcApi import AsyncSolanaRpcApi, c_max_signature_statuses
+from CandlestickStore import CandlestickStore
+from Indicators import *
+from TokenUpdateDispatcher import TokenUpdateDispatcher
+from StrategyScheduler import StrategyScheduler
+from TriggerBook import TriggerBook, PriceTrigger
+from BalanceCache import BalanceCache
+from RaydiumTokensMonitor import RaydiumTokensMonitor
+from AccountSubscriptionManager import AccountSubscriptionManager, AccountSubscriptionShard
+from TradesManager import TradesManager
+from TransactionBroadcaster import TransactionBroadcaster
+from SignatureConfirmationService import SignatureConfirmationService
+import QuoteEngine
+import TokensApi
+import config.config as config
+import JsonDecoder
+import PubkeyCache
+from RaydiumSwapBuilder import RaydiumSwapBuilder, RaydiumPoolKeys, c_raydium_amm_v4_program_id
+from spl.token.constants import TOKEN_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID, WRAPPED_SOL_MINT
+from solders.pubkey import Pubkey
+from solders.keypair import Keypair
+from solders.hash import Hash
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime, timedelta
+import threading
+import itertools
+import websockets
+import contextlib
+import io
+import concurrent.futures
+import asyncio
+import tempfile
+import os
+import math
 import random
+import json
+import base64
+import struct
+import requests
 import time
 
 class MockMarketManager(AbstractMarketManager):
@@ -31,31 +70,35 @@ class MockOrderExecutor(OrderExecutor):
     def execute_order(self, order: Order, retry_until_successful = False)->str:
         return "DONE"
 
+#Built per test, so no test sees prices or order state left behind by another
 class TestSetup:
-    market_manager = MockMarketManager()
-   
-    #Populate default candlesticks for a mock token
-    for i in range(600): # Simulate 2 minutes of data
-        price = random.uniform(100, 200)
-        market_manager.update_price(price)       
+    __test__ = False #Not a pytest test class
 
-    token_info = TokenInfo("test_token")
-    token_info.decimals_scale_factor = 1E9
+    def __init__(self):
+        self.market_manager = MockMarketManager()
 
-    #Setup Order
-    default_buy_amount = Amount.sol_ui(.001)
-    slippage = Amount.percent_ui(50)
-    priority_fee = Amount.sol_ui(.0004)
-    profit_limit = PnlOption(trigger_at_percent = Amount.percent_ui(100), allocation_percent = Amount.percent_ui(100))
-    stop_loss = PnlOption(trigger_at_percent = Amount.percent_ui(-80), allocation_percent = Amount.percent_ui(100))
-    base_token_price = Amount.sol_ui(market_manager.get_price("test_token"))
-    tokens_bought = Amount.tokens_ui(1000, token_info.decimals_scale_factor)
-    order = OrderWithLimitsStops(token_info.token_address, base_token_price, tokens_bought, slippage, priority_fee)          
-    order.add_pnl_option(profit_limit)
-    order.add_pnl_option(stop_loss)
-
-    #Setup Mock Executor
-    order_executor = MockOrderExecutor(market_manager)
+        #Populate default candlesticks for a mock token
+        for i in range(600): # Simulate 2 minutes of data
+            price = random.uniform(100, 200)
+            self.market_manager.update_price(price)
+
+        self.token_info = TokenInfo("test_token")
+        self.token_info.decimals_scale_factor = 1E9
+
+        #Setup Order
+        self.default_buy_amount = Amount.sol_ui(.001)
+        self.slippage = Amount.percent_ui(50)
+        self.priority_fee = Amount.sol_ui(.0004)
+        self.profit_limit = PnlOption(trigger_at_percent = Amount.percent_ui(100), allocation_percent = Amount.percent_ui(100))
+        self.stop_loss = PnlOption(trigger_at_percent = Amount.percent_ui(-80), allocation_percent = Amount.percent_ui(100))
+        self.base_token_price = Amount.sol_ui(self.market_manager.get_price("test_token"))
+        self.tokens_bought = Amount.tokens_ui(1000, self.token_info.decimals_scale_factor)
+        self.order = OrderWithLimitsStops(self.token_info.token_address, self.base_token_price, self.tokens_bought, self.slippage, self.priority_fee)
+        self.order.add_pnl_option(self.profit_limit)
+        self.order.add_pnl_option(self.stop_loss)
+
+        #Setup Mock Executor
+        self.order_executor = MockOrderExecutor(self.market_manager)
 
 def test_Strategy1():
     test_setup = TestSetup()
@@ -95,6 +138,7 @@ def test_PnlTradingEngine():
     engine = PnlTradingEngine(test_setup.token_info, test_setup.order_executor, test_setup.order)
 
     engine.start()
+    engine.join()
 
     #Check if limit order or stop order triggers
     engine._process_event_task()
@@ -118,7 +162,1407 @@ def test_PnlTradingEngine():
     engine._process_event_task()
     
     assert engine.state == StrategyState.COMPLETE
-    
+
+def test_PnlTradingEngine_ladder():
+    class RecordingOrderExecutor(MockOrderExecutor):
+        def __init__(self, market_manager):
+            MockOrderExecutor.__init__(self, market_manager)
+            self.sold_amounts = []
+
+        def execute_order(self, order: Order, retry_until_successful = False)->str:
+            self.sold_amounts.append(order.amount.ToUiValue())
+            return "DONE"
+
+    market_manager = MockMarketManager()
+    market_manager.update_price(1)
+    order_executor = RecordingOrderExecutor(market_manager)
+    token_info = TokenInfo("test_token")
+    token_info.decimals_scale_factor = 1E9
+
+    order = OrderWithLimitsStops(token_info.token_address, Amount.sol_ui(1), Amount.tokens_ui(1000, 1E9), Amount.percent_ui(50), Amount.sol_ui(.0004))
+    order.add_pnl_option(PnlOption(Amount.percent_ui(50), Amount.percent_ui(50)))
+    order.add_pnl_option(PnlOption(Amount.percent_ui(200), Amount.percent_ui(100)))
+    order.add_pnl_option(PnlOption(Amount.percent_ui(-20), Amount.percent_ui(100), trailing=True))
+
+    engine = PnlTradingEngine(token_info, order_executor, order)
+    engine.run()
+
+    #First take-profit level sells half, then the trailing stop follows the high up to 1.9 and sells the rest below 1.52
+    for price in [1.2, 1.6, 1.9, 1.6, 1.5]:
+        market_manager.update_price(price)
+        engine._process_event_task()
+
+    assert order_executor.sold_amounts == [500, 500]
+    assert engine.state == StrategyState.COMPLETE
+
+def test_PnlTradingEngine_balance_check():
+    class BalanceOrderExecutor(MockOrderExecutor):
+        def __init__(self, market_manager, balance: Amount, balance_slot: int):
+            MockOrderExecutor.__init__(self, market_manager)
+            self.balance = balance
+            self.balance_slot = balance_slot
+
+        def execute_order(self, order: Order, retry_until_successful = False)->str:
+            return "DONE"
+
+        def get_order_slot(self, tx_signature: str)->int:
+            return 100
+
+        def get_account_balance(self, account_address: str)->Amount:
+            return self.balance
+
+        def get_account_balance_slot(self, account_address: str)->int:
+            return self.balance_slot
+
+    class FailingRpcApi:
+        wss_uri = "ws://localhost"
+
+        def run_rpc_method(self, request_name: str, params):
+            return None
+
+    #A token account whose balance cannot be read reports no balance rather than zero
+    trades_manager = TradesManager.__new__(TradesManager)
+    trades_manager.signer_pubkey = "signer"
+    trades_manager.token_account_dict = {"test_token": TokenAccountInfo("test_token", "token_account", Amount.tokens_ui(0, 1E9))}
+    trades_manager.balance_cache = BalanceCache(FailingRpcApi())
+
+    assert trades_manager.get_account_balance("test_token") is None
+
+    #The ladder stays armed unless an empty balance was observed at or after the sell's slot
+    for balance, balance_slot, expected_state in [(None, None, StrategyState.PENDING), (Amount.tokens_ui(0, 1E9), 90, StrategyState.PENDING),
+                                                  (Amount.tokens_ui(0, 1E9), 100, StrategyState.COMPLETE)]:
+        market_manager = MockMarketManager()
+        market_manager.update_price(1)
+        token_info = TokenInfo("test_token")
+        token_info.decimals_scale_factor = 1E9
+        order = OrderWithLimitsStops(token_info.token_address, Amount.sol_ui(1), Amount.tokens_ui(1000, 1E9), Amount.percent_ui(50), Amount.sol_ui(.0004))
+        order.add_pnl_option(PnlOption(Amount.percent_ui(50), Amount.percent_ui(50)))
+        order.add_pnl_option(PnlOption(Amount.percent_ui(200), Amount.percent_ui(100)))
+        order.add_pnl_option(PnlOption(Amount.percent_ui(-20), Amount.percent_ui(100)))
+
+        engine = PnlTradingEngine(token_info, BalanceOrderExecutor(market_manager, balance, balance_slot), order)
+        engine.run()
+        market_manager.update_price(1.6)
+        engine._process_event_task()
+
+        assert engine.state == expected_state
+        assert engine.current_tokens == (500 if expected_state == StrategyState.PENDING else 0)
+        assert expected_state == StrategyState.COMPLETE or (len(engine.triggers) == 2 and len(engine.trigger_book) == 2)
+
+def test_PnlTradingEngine_stop_side():
+    market_manager = MockMarketManager()
+    market_manager.update_price(1.2)
+    order_executor = MockOrderExecutor(market_manager)
+    token_info = TokenInfo("test_token")
+    token_info.decimals_scale_factor = 1E9
+
+    #A break-even stop above the entry price sells on the way down, not up
+    order = OrderWithLimitsStops(token_info.token_address, Amount.sol_ui(1), Amount.tokens_ui(1000, 1E9), Amount.percent_ui(50), Amount.sol_ui(.0004))
+    order.add_pnl_option(PnlOption(Amount.percent_ui(100), Amount.percent_ui(40)))
+    order.add_pnl_option(PnlOption(Amount.percent_ui(5), Amount.percent_ui(50)), is_limit=False)
+
+    engine = PnlTradingEngine(token_info, order_executor, order)
+    engine.run()
+
+    assert [trigger.is_limit for trigger in engine.triggers] == [True, False]
+    engine._process_event_task()
+    assert engine.state == StrategyState.PENDING and len(engine.triggers) == 2
+
+    #Allocations sum to less than 100%: once every level has fired the engine completes with tokens left over
+    for price in [2.1, 1.0]:
+        market_manager.update_price(price)
+        engine._process_event_task()
+
+    assert engine.state == StrategyState.COMPLETE and engine.current_tokens == 300
+
+def test_QuoteEngine():
+    token_info = TokenInfo("test_token")
+    token_info.token_vault_ui_amount = 1_000_000
+    token_info.sol_vault_ui_amount = 100
+
+    buy_quote = QuoteEngine.get_quote(token_info, Order_Type.BUY, 1, 10)
+
+    #1 SOL in, 0.25% fee: out = 1e6*0.9975/(100 + 0.9975)
+    assert math.isclose(buy_quote.out_amount, 1_000_000*0.9975/100.9975)
+    assert math.isclose(buy_quote.minimum_out, buy_quote.out_amount*0.9)
+    assert buy_quote.execution_price > buy_quote.spot_price and 1.2 < buy_quote.price_impact_percent < 1.3
+
+    #Selling the tokens back returns less than the SOL spent
+    sell_quote = QuoteEngine.get_quote(token_info, Order_Type.SELL, buy_quote.out_amount, 10)
+
+    assert sell_quote.out_amount < 1 and sell_quote.price_impact_percent > 0
+    assert QuoteEngine.get_quote(TokenInfo("unknown"), Order_Type.BUY, 1, 10) is None
+
+def get_stub_pool_keys()->dict:
+    key_names = ['id', 'authority', 'openOrders', 'targetOrders', 'marketProgramId', 'marketId', 'marketBids', 'marketAsks',
+                 'marketEventQueue', 'marketBaseVault', 'marketQuoteVault', 'marketAuthority']
+    pool_keys = {name: str(Pubkey(bytes([i + 1])*32)) for i, name in enumerate(key_names)}
+    pool_keys['vault'] = {'A': str(Pubkey(bytes([20])*32)), 'B': str(Pubkey(bytes([21])*32))}
+    pool_keys['programId'] = str(c_raydium_amm_v4_program_id)
+
+    return pool_keys
+
+def test_RaydiumSwapBuilder():
+    pool_keys = get_stub_pool_keys()
+    source, destination, owner = Pubkey(bytes([30])*32), Pubkey(bytes([31])*32), Pubkey(bytes([32])*32)
+
+    #Byte-exact instruction layouts: tag, little endian fields, and account order and flags
+    swap_instruction = RaydiumSwapBuilder.get_swap_base_in_instruction(RaydiumPoolKeys(pool_keys), source, destination, owner, 1_000_000, 123_456)
+    expected_accounts = [(str(TOKEN_PROGRAM_ID), False, False), (pool_keys['id'], False, True), (pool_keys['authority'], False, False),
+                         (pool_keys['openOrders'], False, True), (pool_keys['targetOrders'], False, True), (pool_keys['vault']['A'], False, True),
+                         (pool_keys['vault']['B'], False, True), (pool_keys['marketProgramId'], False, False), (pool_keys['marketId'], False, True),
+                         (pool_keys['marketBids'], False, True), (pool_keys['marketAsks'], False, True), (pool_keys['marketEventQueue'], False, True),
+                         (pool_keys['marketBaseVault'], False, True), (pool_keys['marketQuoteVault'], False, True),
+                         (pool_keys['marketAuthority'], False, False), (str(source), False, True), (str(destination), False, True), (str(owner), True, False)]
+
+    assert bytes(swap_instruction.data).hex() == "0940420f000000000040e2010000000000"
+    assert [(str(meta.pubkey), meta.is_signer, meta.is_writable) for meta in swap_instruction.accounts] == expected_accounts
+    assert bytes(RaydiumSwapBuilder.get_compute_unit_limit_instruction(150_000).data).hex() == "02f0490200"
+    assert bytes(RaydiumSwapBuilder.get_compute_unit_price_instruction(1000).data).hex() == "03e803000000000000"
+    assert bytes(RaydiumSwapBuilder.get_transfer_instruction(owner, source, 5000).data).hex() == "020000008813000000000000"
+    assert bytes(RaydiumSwapBuilder.get_sync_native_instruction(source).data).hex() == "11"
+    assert bytes(RaydiumSwapBuilder.get_close_account_instruction(source, owner, owner).data).hex() == "09"
+
+    #A buy wraps SOL, swaps and unwraps in one signed transaction
+    signer_wallet = Keypair.from_seed(bytes(32))
+    token_info = TokenInfo(str(Pubkey(bytes([40])*32)))
+    token_info.pool_keys = pool_keys
+    swap_builder = RaydiumSwapBuilder(signer_wallet)
+    order_template = swap_builder.prepare_order_template(token_info)
+    transaction = swap_builder.build_swap_transaction(token_info, True, 1_000_000, 123_456, 100_000, Hash.default())
+
+    assert len(transaction.message.instructions) == 8
+    assert transaction.message.account_keys[0] == signer_wallet.pubkey()
+    assert transaction.verify_with_results() == [True]
+
+    #A sell reuses the prepared template and skips the wrap
+    transaction = swap_builder.build_swap_transaction(token_info, False, 1_000_000, 123_456, 100_000, Hash.default())
+
+    assert swap_builder.prepare_order_template(token_info) is order_template and len(order_template.compute_unit_price_instructions) == 1
+    assert len(transaction.message.instructions) == 6
+    assert transaction.verify_with_results() == [True]
+
+def test_TradesManager_raydium_route():
+    class StubMarketManager:
+        def __init__(self, token_infos: dict[str, TokenInfo]):
+            self.token_infos = token_infos
+
+        def get_token_info(self, token_address: str)->TokenInfo:
+            return self.token_infos.get(token_address, None)
+
+        def get_quote(self, token_address: str, order_type: Order_Type, amount: Amount, slippage: Amount)->SwapQuote:
+            return QuoteEngine.get_quote(self.token_infos[token_address], order_type, amount.ToUiValue(), slippage.ToUiValue())
+
+    token_info = create_stub_token_info(str(Pubkey(bytes([40])*32)))
+    token_info.pool_keys = get_stub_pool_keys()
+    token_info.token_vault_ui_amount = 1000
+    token_info.sol_vault_ui_amount = 10
+    token_info.decimals_scale_factor = 1E6
+    malformed_token_info = create_stub_token_info(str(Pubkey(bytes([41])*32)))
+    malformed_token_info.pool_keys = dict(get_stub_pool_keys(), authority="not base58")
+    trades_manager = TradesManager.__new__(TradesManager)
+    trades_manager.signer_pubkey = "signer"
+    trades_manager.market_manager = StubMarketManager({token_info.token_address: token_info, malformed_token_info.token_address: malformed_token_info})
+    trades_manager.raydium_swap_builder = RaydiumSwapBuilder(Keypair.from_seed(bytes(32)))
+    trades_manager.blockhash_prefetcher = type("StubBlockhashPrefetcher", (), {'get_blockhash': lambda self: Hash.default()})()
+    sol_address = str(WRAPPED_SOL_MINT)
+    args = (Amount.sol_ui(0.1), Amount.percent_ui(10), Amount.sol_ui(0.0001))
+
+    assert trades_manager._build_raydium_swap(sol_address, token_info.token_address, *args).verify_with_results() == [True]
+
+    #Unknown tokens and malformed pool keys fall back to Jupiter
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        assert trades_manager._build_raydium_swap(sol_address, "unknown_token", *args) is None
+        assert trades_manager._build_raydium_swap(sol_address, malformed_token_info.token_address, *args) is None
+
+    assert "Error reading Raydium pool keys" in output.getvalue()
+
+    #A fault in building or signing the transaction is not hidden behind the fallback
+    def failing_build(*build_args):
+        raise struct.error("bad layout")
+
+    trades_manager.raydium_swap_builder.build_swap_transaction = failing_build
+
+    try:
+        trades_manager._build_raydium_swap(sol_address, token_info.token_address, *args)
+        assert False
+    except struct.error:
+        pass
+
+    #With the local route switched off every swap is built by Jupiter
+    jupiter_requests = []
+    get_swap_transaction = TokensApi.get_swap_transaction
+    TokensApi.get_swap_transaction = lambda *swap_args: jupiter_requests.append(swap_args)
+    use_local_raydium_swap = config.USE_LOCAL_RAYDIUM_SWAP
+    config.USE_LOCAL_RAYDIUM_SWAP = False
+
+    try:
+        assert trades_manager._swap(sol_address, token_info.token_address, *args, True) is None
+        assert len(jupiter_requests) == 1
+    finally:
+        TokensApi.get_swap_transaction = get_swap_transaction
+        config.USE_LOCAL_RAYDIUM_SWAP = use_local_raydium_swap
+
+def test_PubkeyCache():
+    #Fresh keys, so earlier calls in the same process cannot have warmed the caches
+    owner = str(Keypair().pubkey())
+    mints = [str(Keypair().pubkey()) for i in range(5)]
+    expected = {mint: Pubkey.find_program_address([bytes(Pubkey.from_string(owner)), bytes(TOKEN_PROGRAM_ID), bytes(Pubkey.from_string(mint))],
+                                                  ASSOCIATED_TOKEN_PROGRAM_ID)[0] for mint in mints}
+    stats = PubkeyCache.get_stats()
+
+    assert PubkeyCache.get_associated_token_addresses(owner, mints) == expected
+    assert PubkeyCache.get_stats()['associated_token_misses'] - stats['associated_token_misses'] == len(mints)
+
+    #Repeat derivations, from strings or Pubkeys, are cache hits
+    stats = PubkeyCache.get_stats()
+
+    for mint in mints:
+        assert PubkeyCache.get_associated_token_address(Pubkey.from_string(owner), mint) == expected[mint]
+
+    assert PubkeyCache.get_stats()['associated_token_hits'] - stats['associated_token_hits'] == len(mints)
+    assert PubkeyCache.get_stats()['associated_token_misses'] == stats['associated_token_misses']
+
+def test_BalanceCache():
+    class MockRpcApi:
+        wss_uri = "ws://localhost"
+        rpc_calls = 0
+
+        def run_rpc_method(self, request_name: str, params):
+            MockRpcApi.rpc_calls += 1
+            return type("Response", (), {'result': {'context': {'slot': 8}, 'value': {'uiAmount': 3.0}}})
+
+    balance_cache = BalanceCache(MockRpcApi(), max_age=60)
+    account = "token_account"
+    notification = lambda slot, amount: {'context': {'slot': slot}, 'value': {'data': {'parsed': {'info': {'tokenAmount': {'uiAmount': amount}}}}}}
+
+    #Unknown balances are read once over RPC, then served from memory
+    assert balance_cache.get_balance(account, True) == 3.0 and balance_cache.get_balance(account, True) == 3.0
+    assert MockRpcApi.rpc_calls == 1
+
+    #Pushed values only move forward in slots
+    balance_cache._process((account, True), notification(10, 5.0))
+    balance_cache._process((account, True), notification(9, 7.0))
+
+    assert balance_cache.get_balance(account, True) == 5.0 and balance_cache.get_slot(account) == 10
+
+    #A stale value falls back to RPC, which cannot override a newer pushed slot
+    balance_cache.max_age = -1
+
+    assert balance_cache.get_balance(account, True) == 5.0 and MockRpcApi.rpc_calls == 2
+
+def test_AccountSubscriptionShard_errors():
+    async def run():
+        shard = AccountSubscriptionShard("ws://localhost", "jsonParsed", lambda key, result: None)
+        shard.accounts["key"] = "account"
+        shard.pending_requests[1] = "key"
+        shard.pending_keys.add("key")
+
+        #A rejected subscribe is neither confirmed nor left pending, and is requested again
+        shard._process(JsonDecoder.decode_account_message('{"jsonrpc":"2.0","id":1,"error":{"code":-32602,"message":"Invalid param"}}'))
+
+        assert "key" not in shard.pending_keys and "key" not in shard.subscription_ids
+        assert await asyncio.wait_for(shard.request_queue.get(), 5) == ("key", True)
+
+    asyncio.run(run())
+
+#Stands in for a node's websocket endpoint: confirms accountSubscribe with ids that never repeat across connections
+#and sends accountNotifications for a subscribed account on the connection that subscribed it
+class StubAccountNode:
+    def __init__(self):
+        self.next_subscription_ids = itertools.count(100)
+        self.subscriptions : dict[int, tuple] = {} #Key=subscription id; Value=(websocket, account address)
+        self.connections = []
+
+    async def handle(self, websocket):
+        self.connections.append(websocket)
+
+        async for message in websocket:
+            request = json.loads(message)
+
+            if request['method'] == "accountSubscribe":
+                subscription_id = next(self.next_subscription_ids)
+                self.subscriptions[subscription_id] = (websocket, request['params'][0])
+                await websocket.send(json.dumps({"jsonrpc": "2.0", "result": subscription_id, "id": request['id']}))
+
+    def get_live_subscriptions(self)->dict[int, str]:
+        return {subscription_id: account_address for subscription_id, (websocket, account_address) in self.subscriptions.items()
+                if websocket in self.connections}
+
+    async def notify(self, subscription_id: int, slot: int):
+        websocket = self.subscriptions[subscription_id][0]
+        await websocket.send(json.dumps({"jsonrpc": "2.0", "method": "accountNotification",
+                                         "params": {"result": {"context": {"slot": slot}, "value": {"lamports": 1, "owner": "owner", "data": ["", "base64"]}},
+                                                    "subscription": subscription_id}}))
+
+    async def drop_connections(self):
+        connections = self.connections
+        self.connections = []
+
+        for websocket in connections:
+            await websocket.close()
+
+def test_AccountSubscriptionManager_routing():
+    async def wait_until(condition, timeout = 5):
+        deadline = time.time() + timeout
+
+        while not condition():
+            assert time.time() < deadline
+            await asyncio.sleep(0.01)
+
+    async def run():
+        node = StubAccountNode()
+        server = await websockets.serve(node.handle, "127.0.0.1", 0)
+        delivered = []
+        manager = AccountSubscriptionManager(f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}", lambda key, result: delivered.append((key, result['context']['slot'])), 2)
+        accounts = {("tokenA", False): "tokenVaultA", ("tokenA", True): "solVaultA", ("tokenB", False): "tokenVaultB", ("tokenB", True): "solVaultB"}
+
+        for key, account_address in accounts.items():
+            manager.subscribe(key, account_address)
+
+        run_task = asyncio.create_task(manager.run())
+        await wait_until(lambda: all(manager.is_subscribed(key) for key in accounts))
+
+        #Subscriptions are split evenly over the two connections
+        assert [shard.get_subscription_count() for shard in manager.shards] == [2, 2] and len(node.connections) == 2
+
+        async def check_routing(first_slot: int):
+            delivered.clear()
+            live_subscriptions = node.get_live_subscriptions()
+
+            #Every notification reaches the key of the account its subscription id belongs to
+            for slot, subscription_id in enumerate(live_subscriptions, first_slot):
+                await node.notify(subscription_id, slot)
+
+            await wait_until(lambda: len(delivered) == len(accounts))
+            expected = {(key, slot) for slot, subscription_id in enumerate(live_subscriptions, first_slot)
+                        for key, account_address in accounts.items() if account_address == live_subscriptions[subscription_id]}
+
+            assert set(delivered) == expected and len(expected) == len(accounts)
+
+            return live_subscriptions
+
+        old_subscriptions = await check_routing(1)
+
+        #After a reconnect every account is resubscribed and the node's new ids replace the old ones
+        with contextlib.redirect_stdout(io.StringIO()):
+            await node.drop_connections()
+            await wait_until(lambda: len(node.get_live_subscriptions()) == len(accounts) and
+                             all(manager.is_subscribed(key) for key in accounts))
+
+        new_subscriptions = await check_routing(10)
+
+        assert sorted(new_subscriptions.values()) == sorted(accounts.values())
+        assert not set(new_subscriptions) & set(old_subscriptions)
+        assert all(subscription_id not in shard.subscription_keys for shard in manager.shards for subscription_id in old_subscriptions)
+
+        #A notification still carrying a stale id is dropped
+        delivered.clear()
+        old_subscription_id = next(iter(old_subscriptions))
+        node.subscriptions[old_subscription_id] = (node.connections[0], old_subscriptions[old_subscription_id])
+        await node.notify(old_subscription_id, 99)
+        await asyncio.sleep(0.1)
+
+        assert delivered == []
+
+        run_task.cancel()
+        server.close()
+
+    asyncio.run(run())
+
+def test_TriggerBook():
+    trigger_book = TriggerBook()
+    triggers = [PriceTrigger(None, random.uniform(50, 150), random.random() < 0.5) for i in range(10000)]
+
+    for trigger in triggers:
+        trigger_book.add(trigger)
+
+    assert trigger_book.remove(triggers[0]) and not trigger_book.remove(triggers[0])
+    armed = set(triggers[1:])
+
+    #Each tick fires exactly the armed triggers it crosses, once
+    for price in [100, 120, 80, 140, 60, 100]:
+        fired = trigger_book.update(price)
+        expected = {trigger for trigger in armed if (price >= trigger.target_price if trigger.is_limit else price <= trigger.target_price)}
+
+        assert set(fired) == expected and len(fired) == len(expected)
+        armed -= expected
+
+    assert len(trigger_book) == len(armed)
+
+def test_CandlestickBuilder():
+    builder = CandlestickBuilder(interval=1, max_length=1000)
+    start_time = datetime(2025, 1, 1)
+    prices = [random.uniform(100, 200) for i in range(2500)]
+
+    for i, price in enumerate(prices):
+        builder.update(start_time + timedelta(seconds=i), price)
+
+    #Only the latest max_length candles are kept, in order, after wrapping around the ring buffer
+    all_candles = builder.get_all()
+
+    assert len(all_candles) == 1000
+    assert all_candles[0].start_time == start_time + timedelta(seconds=1500)
+    assert all_candles[-1].close == prices[-1]
+    assert builder.current_candle.close == prices[-1]
+
+    latest_candles = builder.get(10)
+
+    assert list(latest_candles.get_column('close')) == prices[-10:]
+    assert [candle.open for candle in latest_candles] == prices[-10:]
+    assert builder.get(1001) is None
+
+    #Range queries return views over the candles overlapping [start, end)
+    candle_range = builder.get_range(start_time + timedelta(seconds=1999.5), start_time + timedelta(seconds=2010))
+
+    assert [candle.open for candle in candle_range] == prices[1999:2010]
+    assert builder.get_at(start_time + timedelta(seconds=2400.5)).open == prices[2400]
+    assert builder.get_at(start_time + timedelta(seconds=100)) is None
+    assert len(builder.get_range(start_time, start_time + timedelta(seconds=10))) == 0
+
+def test_Candlesticks_rollup():
+    ticked = Candlesticks([1, 60])
+    derived = Candlesticks([1, 60], derive_from_base=True)
+    start_time = datetime(2025, 1, 1)
+
+    for i in range(600):
+        price = random.uniform(100, 200)
+        ticked.update(start_time + timedelta(seconds=i), price, 1000, 2.5, i % 3 != 0, 1)
+        derived.update(start_time + timedelta(seconds=i), price, 1000, 2.5, i % 3 != 0, 1)
+
+    #Completed minute candles rolled up from 1-second candles match the ones built from ticks
+    columns = ['start', 'open', 'high', 'low', 'close', 'volume', 'base_volume', 'buy_volume', 'sell_volume', 'trade_count']
+    ticked_candles = ticked.get_candlesticks(60)[:-1]
+    derived_candles = derived.get_candlesticks(60)[:-1]
+
+    assert len(derived_candles) == 9
+    assert all(list(ticked_candles.get_column(name)) == list(derived_candles.get_column(name)) for name in columns)
+
+    #Unconfigured multiples of the base interval are computed on demand
+    five_minute_candles = derived.get_candlesticks(300)
+
+    assert len(five_minute_candles) == 2
+    assert five_minute_candles[0].trade_count == 300
+    assert five_minute_candles[0].volume == 750
+    assert five_minute_candles[0].buy_volume == 500
+    assert five_minute_candles[0].base_volume == 300000
+    assert five_minute_candles[0].high == max(ticked_candles.get_column('high')[:5])
+
+    #The on-demand builder is kept and fed each base candle as it closes instead of replaying the history per call
+    five_minute_builder = derived.on_demand_builders[300]
+
+    for i in range(600, 1200):
+        derived.update(start_time + timedelta(seconds=i), random.uniform(100, 200), 1000, 2.5, True, 1)
+
+    five_minute_candles = derived.get_candlesticks(300)
+    base_candles = derived.get_candlesticks(1).get_range(start_time + timedelta(seconds=600), start_time + timedelta(seconds=900))
+
+    assert derived.on_demand_builders[300] is five_minute_builder and len(five_minute_candles) == 4
+    assert five_minute_candles[2].trade_count == 300 and five_minute_candles[2].open == base_candles[0].open
+    assert five_minute_candles[2].high == max(base_candles.get_column('high')) and five_minute_candles[2].close == base_candles[-1].close
+    assert five_minute_candles[-1].close == derived.get_candlesticks(1)[-2].close
+
+    #Intervals that are not a multiple of the base interval are rejected
+    try:
+        Candlesticks([2, 60]).get_candlesticks(3)
+        assert False
+    except ValueError:
+        pass
+
+def test_Indicators():
+    builder = CandlestickBuilder(interval=60, max_length=1000)
+    start_time = datetime(2025, 1, 1)
+    prices = [random.uniform(100, 200) for i in range(3000)]
+    sma = builder.add_indicator(SMA(20))
+    ema = builder.add_indicator(EMA(10))
+    bollinger = builder.add_indicator(BollingerBands(20))
+
+    for i, price in enumerate(prices[:1500]):
+        builder.update(start_time + timedelta(seconds=i), price)
+
+    #Indicators attached later are primed from the candles already built
+    rolling_min_max = builder.add_indicator(RollingMinMax(5))
+    rsi = builder.add_indicator(RSI(14))
+
+    for i, price in enumerate(prices[1500:]):
+        builder.update(start_time + timedelta(seconds=1500 + i), price)
+
+    candles = builder.get_all()
+    closes = list(candles.get_column('close'))
+    expected_ema = closes[0]
+
+    for close in closes[1:]:
+        expected_ema = ema.alpha*close + (1 - ema.alpha)*expected_ema
+
+    assert math.isclose(sma.get_value(), sum(closes[-20:])/20)
+    assert math.isclose(ema.get_value(), expected_ema)
+    assert math.isclose(bollinger.get_value()[1], sma.get_value())
+    assert rolling_min_max.get_value() == (min(candles.get_column('low')[-5:]), max(candles.get_column('high')[-5:]))
+    assert 0 <= rsi.get_value() <= 100
+
+def test_Indicators_reference():
+    builder = CandlestickBuilder(interval=10, max_length=1000)
+    start_time = datetime(2025, 1, 1)
+    ticks = [(random.uniform(100, 200), random.uniform(0, 5)) for i in range(600)]
+    atr = builder.add_indicator(ATR(14))
+    vwap = builder.add_indicator(VWAP())
+
+    for i, (price, quote_volume) in enumerate(ticks[:305]):
+        builder.update(start_time + timedelta(seconds=i), price, quote_volume=quote_volume, trade_count=1)
+
+    #Primed from the candles already built, the in-progress one included
+    rsi = builder.add_indicator(RSI(14))
+
+    for i, (price, quote_volume) in enumerate(ticks[305:]):
+        builder.update(start_time + timedelta(seconds=305 + i), price, quote_volume=quote_volume, trade_count=1)
+
+    candles = builder.get_all()
+    highs, lows, closes, volumes = [list(candles.get_column(name)) for name in ['high', 'low', 'close', 'volume']]
+    period = 14
+
+    #Straightforward recomputations over every candle, the one still open included
+    true_ranges = [highs[0] - lows[0]] + [max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1]))
+                                          for i in range(1, len(closes))]
+    expected_atr = sum(true_ranges[:period])/period
+
+    for true_range in true_ranges[period:]:
+        expected_atr = (expected_atr*(period - 1) + true_range)/period
+
+    changes = [closes[i] - closes[i - 1] for i in range(1, len(closes))]
+    average_gain = sum(max(change, 0) for change in changes[:period])/period
+    average_loss = sum(max(-change, 0) for change in changes[:period])/period
+
+    for change in changes[period:]:
+        average_gain = (average_gain*(period - 1) + max(change, 0))/period
+        average_loss = (average_loss*(period - 1) + max(-change, 0))/period
+
+    expected_rsi = 100 - 100/(1 + average_gain/average_loss)
+    typical_prices = [(high + low + close)/3 for high, low, close in zip(highs, lows, closes)]
+    expected_vwap = sum(price*volume for price, volume in zip(typical_prices, volumes))/sum(volumes)
+
+    assert len(closes) == 60
+    assert math.isclose(atr.get_value(), expected_atr)
+    assert math.isclose(rsi.get_value(), expected_rsi)
+    assert math.isclose(vwap.get_value(), expected_vwap)
+
+def test_CandlestickStore():
+    start_time = datetime(2025, 1, 1)
+    prices = [random.uniform(100, 200) for i in range(300)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = CandlestickStore(directory)
+        candlesticks = Candlesticks([1, 60], derive_from_base=True, store=store, token_address="token")
+
+        for i, price in enumerate(prices[:200]):
+            candlesticks.update(start_time + timedelta(seconds=i), price)
+
+        #Every closed candle is on disk; the one still open is not
+        history = store.get_file("token", 1).get_all()
+
+        assert len(history) == 199
+        assert list(history.get_column('open')) == prices[:199]
+        assert len(store.get_file("token", 60).get_all()) == 3
+        store.close()
+
+        #A restart reloads the history and continues appending without duplicating the last stored candle
+        store = CandlestickStore(directory)
+        candlesticks = Candlesticks([1, 60], derive_from_base=True, store=store, token_address="token")
+
+        assert len(candlesticks.get_candlesticks(1)) == 199
+        assert candlesticks.get_candlesticks(60)[-1].start_time == start_time + timedelta(seconds=120)
+
+        for i, price in enumerate(prices[200:]):
+            candlesticks.update(start_time + timedelta(seconds=200 + i), price)
+
+        history = store.get_file("token", 1).get_all()
+
+        assert list(history.get_column('open')) == prices[:199] + prices[200:299]
+        assert history.get_at(start_time + timedelta(seconds=250.5)).open == prices[250]
+
+        #Closing candles checks the last stored start from memory, without remapping the file
+        candlestick_file = store.get_file("token", 1)
+        mapped_count = candlestick_file.mapped_count
+        candlesticks.update(start_time + timedelta(seconds=300), prices[0])
+        candlesticks.update(start_time + timedelta(seconds=301), prices[1])
+
+        assert candlestick_file.mapped_count == mapped_count and len(candlestick_file) == 300
+        assert candlestick_file.get_last_start() == (start_time + timedelta(seconds=300)).timestamp()
+        store.close()
+
+        #Appends are buffered and written in batches, by the flush timer, or before a read
+        store = CandlestickStore(directory, flush_interval=0.1)
+        candlestick_file = store.get_file("batched", 1)
+        file_path = candlestick_file.file_path
+        empty_size = os.path.getsize(file_path)
+
+        for i in range(10):
+            candlestick_file.append([float(i)]*len(c_candle_columns))
+
+        assert os.path.getsize(file_path) == empty_size and len(candlestick_file) == 10
+        time.sleep(0.3)
+
+        assert os.path.getsize(file_path) == empty_size + 10*8*len(c_candle_columns)
+
+        for i in range(10, 10 + candlestick_file.flush_count):
+            candlestick_file.append([float(i)]*len(c_candle_columns))
+
+        assert os.path.getsize(file_path) == empty_size + (10 + candlestick_file.flush_count)*8*len(c_candle_columns)
+        store.close()
+
+        #Only max_open_files histories keep a descriptor; idle ones are released and reopen on their next use
+        store = CandlestickStore(directory, max_open_files=2)
+        candlestick_files = [store.get_file("lru" + str(i), 1) for i in range(3)]
+
+        for i, candlestick_file in enumerate(candlestick_files):
+            candlestick_file.append([float(i)]*len(c_candle_columns))
+            candlestick_file.flush()
+
+        assert store.get_open_file_count() == 2 and not candlestick_files[0].is_open()
+        assert candlestick_files[0].get_all()[0].open == 0 and candlestick_files[0].is_open()
+        assert store.get_open_file_count() == 2 and not candlestick_files[1].is_open()
+
+        candlestick_files[1].append([5.0]*len(c_candle_columns))
+
+        assert list(candlestick_files[1].get_all().get_column('open')) == [1.0, 5.0]
+        store.close()
+
+        #A truncated or foreign header is treated as an empty history
+        for header in [b'CND', b'JUNK' + bytes(28)]:
+            with open(os.path.join(directory, "broken_1.candles"), 'wb') as file:
+                file.write(header)
+
+            store = CandlestickStore(directory)
+            candlestick_file = store.get_file("broken", 1)
+
+            assert len(candlestick_file) == 0 and candlestick_file.get_last_start() is None
+            candlestick_file.append([1.0]*len(c_candle_columns))
+            assert len(candlestick_file.get_all()) == 1
+            store.close()
+
+def test_TokenUpdateDispatcher():
+    deliveries = []
+    active_tokens = set()
+    overlaps = []
+
+    def deliver(token_address: str):
+        if token_address in active_tokens:
+            overlaps.append(token_address)
+
+        active_tokens.add(token_address)
+        time.sleep(0.01)
+        deliveries.append(token_address)
+        active_tokens.discard(token_address)
+
+    dispatcher = TokenUpdateDispatcher(deliver, worker_count=2)
+    dispatcher.start()
+
+    for i in range(200):
+        dispatcher.submit("token" + str(i % 3))
+
+    time.sleep(0.5)
+    stats = dispatcher.get_stats()
+
+    #Bursts collapse to a few deliveries per token, and each token is delivered again after its last update
+    assert stats['submitted'] == 200 and stats['pending'] == 0
+    assert stats['delivered'] == len(deliveries) and len(deliveries) <= 6
+    assert stats['merged'] > 0 and stats['dropped'] == 0
+    assert set(deliveries) == {"token0", "token1", "token2"}
+    assert len(overlaps) == 0 #A token is never delivered on two workers at once
+
+def test_StrategyScheduler():
+    class CountingStrategy:
+        def __init__(self):
+            self.runs = 0
+            self.running = False
+            self.overlaps = 0
+
+        def _process_event_task(self):
+            self.overlaps += 1 if self.running else 0
+            self.running = True
+            time.sleep(0.005)
+            self.runs += 1
+            self.running = False
+
+    scheduler = StrategyScheduler(worker_count=4)
+    scheduler.start()
+    strategies = [CountingStrategy() for i in range(10)]
+
+    for i in range(50):
+        for strategy in strategies:
+            scheduler.schedule(strategy)
+
+    time.sleep(0.5)
+    stats = scheduler.get_stats()
+
+    #Every strategy ran at least once after its last update, never concurrently, and bursts were merged
+    assert all(strategy.runs >= 1 and strategy.overlaps == 0 for strategy in strategies)
+    assert stats['processed'] == sum(strategy.runs for strategy in strategies) and stats['processed'] < 500
+    assert stats['queue_depth'] == 0 and stats['merged'] > 0 and stats['run_p50'] > 0
+
+def test_PnlTradingEngine_order_pool():
+    class BlockingOrderExecutor(MockOrderExecutor):
+        def __init__(self, market_manager):
+            MockOrderExecutor.__init__(self, market_manager)
+            self.release = threading.Event()
+            self.order_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+        def execute_order(self, order: Order, retry_until_successful = False)->str:
+            self.release.wait(5)
+            return "DONE"
+
+        def run_order_task(self, task, *args)->concurrent.futures.Future:
+            return self.order_pool.submit(task, *args)
+
+    class FlagStrategy:
+        def __init__(self):
+            self.ran = threading.Event()
+
+        def _process_event_task(self):
+            self.ran.set()
+
+    market_manager = MockMarketManager()
+    market_manager.update_price(1)
+    order_executor = BlockingOrderExecutor(market_manager)
+    token_info = TokenInfo("test_token")
+    token_info.decimals_scale_factor = 1E9
+    order = OrderWithLimitsStops(token_info.token_address, Amount.sol_ui(1), Amount.tokens_ui(1000, 1E9), Amount.percent_ui(50), Amount.sol_ui(.0004))
+    order.add_pnl_option(PnlOption(Amount.percent_ui(50), Amount.percent_ui(100)))
+    scheduler = StrategyScheduler(worker_count=1)
+    scheduler.start()
+
+    engine = PnlTradingEngine(token_info, order_executor, order, scheduler)
+    engine.run()
+    market_manager.update_price(2)
+    scheduler.schedule(engine)
+
+    #While the sell waits for confirmation, the only strategy worker is free for other strategies
+    other_strategy = FlagStrategy()
+    time.sleep(0.1)
+    scheduler.schedule(other_strategy)
+
+    assert other_strategy.ran.wait(2) and engine.pending_sell is not None and engine.state == StrategyState.PENDING
+
+    #Once the sell returns, the engine is scheduled again and finishes it
+    order_executor.release.set()
+    deadline = time.time() + 5
+
+    while engine.state != StrategyState.COMPLETE and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert engine.state == StrategyState.COMPLETE and engine.pending_sell is None
+
+#Local JSON-RPC stub that answers every request with its own name after a fixed delay
+class StubRpcHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        json_request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.server.delay)
+
+        if self.server.fail:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        body = json.dumps({"jsonrpc": "2.0", "id": json_request["id"], "result": self.server.name}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        try:
+            self.wfile.write(body)
+        except ConnectionError:
+            pass #The client gave up waiting
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_rpc_server(name: str, delay: float, fail = False)->ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubRpcHandler)
+    server.name = name
+    server.delay = delay
+    server.fail = fail
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+#Stands in for requests.Session: answers JSON-RPC batches in reverse order with handle(request) per call
+class StubRpcSession:
+    def __init__(self, handle):
+        self.handle = handle
+        self.batch_sizes = []
+
+    def post(self, uri: str, json = None, timeout = None):
+        requests_list = json if isinstance(json, list) else [json]
+        self.batch_sizes.append(len(requests_list))
+        responses = [self.handle(json_request) for json_request in reversed(requests_list)]
+        body = responses if isinstance(json, list) else responses[0]
+
+        return type("StubResponse", (), {'content': JsonDecoder.dumps(body).encode(), 'raise_for_status': lambda self: None})()
+
+def test_SolanaRpcApi_batch():
+    def handle(json_request: dict)->dict:
+        value = json_request['params'][0]
+
+        if value % 7 == 0:
+            return {"jsonrpc": "2.0", "id": json_request['id'], "error": {"code": -32602, "message": "Invalid param"}}
+
+        return {"jsonrpc": "2.0", "id": json_request['id'], "result": {"value": value*10}}
+
+    session = StubRpcSession(handle)
+    solana_rpc_api = SolanaRpcApi.__new__(SolanaRpcApi)
+    solana_rpc_api.router = RpcRouter(["http://stub"], session)
+    values = list(range(1, 2*c_max_batch_size + 51))
+
+    #Calls are chunked, matched back by id although answered out of order, and per-call errors become None
+    results = solana_rpc_api.run_rpc_batch("getBalance", [[value] for value in values])
+
+    assert session.batch_sizes == [c_max_batch_size, c_max_batch_size, 50]
+    assert results == [None if value % 7 == 0 else {"value": value*10} for value in values]
+
+#SPL token account bytes: mint(32) | owner(32) | amount(u64 little endian) | rest of the 165 byte layout
+def get_token_account_data(mint: Pubkey, raw_amount: int)->str:
+    account = bytes(mint) + bytes(Keypair().pubkey()) + raw_amount.to_bytes(8, 'little') + bytes(165 - 72)
+
+    return base64.b64encode(account).decode()
+
+def create_stub_tokens_monitor(async_rpc_api = None, subscribe_sol_vault = False, compact_encoding = False)->RaydiumTokensMonitor:
+    stub_rpc_api = type("StubRpcApi", (), {'wss_uri': "ws://localhost"})()
+
+    return RaydiumTokensMonitor(stub_rpc_api, async_rpc_api if async_rpc_api else object(), subscribe_sol_vault, compact_encoding)
+
+#Stands in for aiohttp.ClientSession: answers each JSON-RPC call with handle(request), or fails it when handle returns None
+class StubAsyncRpcSession:
+    def __init__(self, handle):
+        self.handle = handle
+        self.requests = []
+        self.closed = False
+
+    def post(self, uri: str, json = None):
+        self.requests.append(json)
+        response = self.handle(json)
+        body = {"jsonrpc": "2.0", "id": json['id'], "error": {"code": -32005, "message": "Node is behind"}} if response is None else \
+               {"jsonrpc": "2.0", "id": json['id'], "result": response}
+
+        class StubResponse:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                pass
+
+            async def read(self):
+                return JsonDecoder.dumps(body).encode()
+
+        return StubResponse()
+
+def create_stub_async_rpc_api(handle)->tuple[AsyncSolanaRpcApi, StubAsyncRpcSession]:
+    async_rpc_api = AsyncSolanaRpcApi("http://stub", "ws://stub", "wallet")
+    session = StubAsyncRpcSession(handle)
+    async_rpc_api._get_session = lambda: session
+
+    return async_rpc_api, session
+
+def test_AsyncSolanaRpcApi_batched_reads():
+    accounts = ["account" + str(i) for i in range(2*c_max_batch_size + 10)]
+
+    def handle_accounts(json_request: dict)->dict:
+        chunk = json_request['params'][0]
+
+        if chunk[0] == accounts[c_max_batch_size]:
+            return None #Second chunk fails
+
+        return {"context": {"slot": 1}, "value": [None if int(address[7:]) % 5 == 0 else {"lamports": int(address[7:])} for address in chunk]}
+
+    async_rpc_api, session = create_stub_async_rpc_api(handle_accounts)
+    balances = asyncio.run(async_rpc_api.get_multiple_account_balances(accounts))
+
+    #One call per chunk, missing accounts and every account of a failed chunk are None, order is kept
+    assert [len(json_request['params'][0]) for json_request in session.requests] == [c_max_batch_size, c_max_batch_size, 10]
+    assert balances == [None if c_max_batch_size <= i < 2*c_max_batch_size or i % 5 == 0 else i for i in range(len(accounts))]
+
+    signatures = ["signature" + str(i) for i in range(c_max_signature_statuses + 3)]
+
+    def handle_statuses(json_request: dict)->dict:
+        return {"context": {"slot": 1}, "value": [None if int(signature[9:]) % 4 == 0 else {"slot": int(signature[9:]), "confirmationStatus": "confirmed", "err": None}
+                                                  for signature in json_request['params'][0]]}
+
+    async_rpc_api, session = create_stub_async_rpc_api(handle_statuses)
+    statuses = asyncio.run(async_rpc_api.get_signature_statuses(signatures))
+
+    assert [len(json_request['params'][0]) for json_request in session.requests] == [c_max_signature_statuses, 3]
+    assert [status['slot'] if status else None for status in statuses] == [None if i % 4 == 0 else i for i in range(len(signatures))]
+
+def test_AsyncSolanaRpcApi_token_accounts():
+    def get_token_account(mint: str, ui_amount: float, decimals: int)->dict:
+        token_amount = {"amount": str(int(ui_amount*10**decimals)), "decimals": decimals, "uiAmount": ui_amount}
+        return {"pubkey": mint + "Account", "account": {"data": {"parsed": {"info": {"mint": mint, "tokenAmount": token_amount}}}}}
+
+    token_accounts = [get_token_account("mintA", 12.5, 6), get_token_account("mintB", 0, 9), get_token_account("mintC", 3, 9)]
+    async_rpc_api, session = create_stub_async_rpc_api(lambda json_request: {"context": {"slot": 1}, "value": token_accounts})
+
+    #Same shape as SolanaRpcApi.get_non_zero_token_accounts, empty accounts left out
+    assert asyncio.run(async_rpc_api.get_non_zero_token_accounts()) == [{"mint": "mintA", "balance": 12.5, "decimals": 6},
+                                                                        {"mint": "mintC", "balance": 3, "decimals": 9}]
+
+def test_AsyncSolanaRpcApi_sessions():
+    async_rpc_api = AsyncSolanaRpcApi("http://stub", "ws://stub", "wallet")
+
+    async def get_session():
+        return async_rpc_api._get_session()
+
+    #Owners running a loop in their own thread close its session from any thread
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop_thread.start()
+    session = asyncio.run_coroutine_threadsafe(get_session(), loop).result(5)
+
+    assert async_rpc_api.sessions[loop] is session
+
+    async_rpc_api.close_threadsafe(loop)
+
+    assert session.closed and not async_rpc_api.sessions
+
+    loop.call_soon_threadsafe(loop.stop)
+    loop_thread.join(5)
+    loop.close()
+
+    #A session whose loop closed before close() ran is dropped when the next session is made
+    loop = asyncio.new_event_loop()
+    session = loop.run_until_complete(get_session())
+    loop.run_until_complete(session.close())
+    loop.close()
+
+    async def get_and_close_session():
+        assert async_rpc_api._get_session() is not session and list(async_rpc_api.sessions) == [asyncio.get_running_loop()]
+        await async_rpc_api.close()
+
+    asyncio.run(get_and_close_session())
+
+    assert not async_rpc_api.sessions
+
+    #Closing explicitly and making a new session on the same loop keeps the new one
+    async def close_and_reopen():
+        first_session = async_rpc_api._get_session()
+        await async_rpc_api.close()
+        second_session = async_rpc_api._get_session()
+
+        assert first_session.closed and async_rpc_api.sessions[asyncio.get_running_loop()] is second_session
+        await async_rpc_api.close()
+
+        return second_session
+
+    session = asyncio.run(close_and_reopen())
+
+    assert session.closed and not async_rpc_api.sessions
+
+#Stands in for AsyncSolanaRpcApi in the broadcaster; the blockhash turns invalid from the expiry_check'th check on
+class StubBroadcastApi:
+    def __init__(self, rpc_uri: str, fail = False, expiry_check: int = None):
+        self.rpc_uri = rpc_uri
+        self.fail = fail
+        self.expiry_check = expiry_check
+        self.sends = 0
+        self.checks = 0
+
+    async def send_transaction(self, transaction_bytes: bytes):
+        self.sends += 1
+
+        if self.fail:
+            raise ConnectionError("Connection refused")
+
+        return "signature"
+
+    async def is_blockhash_valid(self, blockhash: str)->bool:
+        self.checks += 1
+
+        return self.expiry_check is None or self.checks < self.expiry_check
+
+def test_TransactionBroadcaster():
+    broadcaster = TransactionBroadcaster([], resend_interval=0.02, max_duration=5)
+    broadcaster.start()
+
+    #Stops once confirmed, logging the endpoint that fails without giving up on the others
+    healthy_api = StubBroadcastApi("http://healthy")
+    broadcaster.rpc_apis = [healthy_api, StubBroadcastApi("http://failing", fail=True)]
+    stop_event = threading.Event()
+    output = io.StringIO()
+
+    with contextlib.redirect_stdout(output):
+        future = broadcaster.broadcast(b"transaction", stop_event=stop_event)
+        time.sleep(0.15)
+        stop_event.set()
+        rounds = future.result(timeout=1)
+
+    assert rounds >= 3 and healthy_api.sends == rounds
+    assert output.getvalue().count("Error sending transaction to http://failing: Connection refused") == rounds
+
+    #Stops when the blockhash expires; expiry is first checked on the second round
+    expiring_api = StubBroadcastApi("http://expiring", expiry_check=2)
+    broadcaster.rpc_apis = [expiring_api]
+
+    assert broadcaster.broadcast(b"transaction", "blockhash", stop_event=threading.Event()).result(timeout=1) == 3
+    assert expiring_api.sends == 3 and expiring_api.checks == 2
+
+    #Stops at max_duration when nothing else ends it
+    broadcaster.max_duration = 0.1
+    broadcaster.rpc_apis = [StubBroadcastApi("http://healthy")]
+    start_time = time.time()
+    rounds = broadcaster.broadcast(b"transaction", "blockhash", stop_event=threading.Event()).result(timeout=1)
+
+    assert 0.1 <= time.time() - start_time < 0.5 and rounds >= 3
+
+#Stands in for AsyncSolanaRpcApi in the confirmation service; statuses is Key=transaction signature
+class StubStatusApi:
+    def __init__(self, statuses: dict[str, dict]):
+        self.statuses = statuses
+        self.polled = []
+
+    async def get_signature_statuses(self, tx_signatures: list[str])->list[dict]:
+        self.polled.append(list(tx_signatures))
+
+        return [self.statuses.get(tx_signature, None) for tx_signature in tx_signatures]
+
+def test_SignatureConfirmationService():
+    solana_rpc_api = type("StubSolanaRpcApi", (), {'wss_uri': "ws://stub"})()
+    status_api = StubStatusApi({"polled": {"slot": 12, "confirmationStatus": "confirmed", "err": None},
+                                "processed": {"slot": 13, "confirmationStatus": "processed", "err": None}})
+    service = SignatureConfirmationService(solana_rpc_api, status_api, poll_interval=0.02)
+
+    #A signatureNotification resolves the signature its subscription was made for
+    notified_future = service.watch("notified")
+    polled_future = service.watch("polled")
+    processed_future = service.watch("processed")
+    expiring_future = service.watch("expiring", timeout=0.05)
+    service.loop.run_until_complete(asyncio.sleep(0)) #Adds the queued watches
+    service.wsocket = object() #Connected from here on, so only signatures without a confirmed subscription are polled
+    service.pending_requests = {5: "notified"}
+    service._process({"jsonrpc": "2.0", "result": 77, "id": 5})
+    service._process({"jsonrpc": "2.0", "method": "signatureNotification", "params": {"subscription": 77,
+                      "result": {"context": {"slot": 11}, "value": {"err": None}}}})
+
+    assert notified_future.result(timeout=0) == {'err': None, 'slot': 11}
+
+    #The getSignatureStatuses poll resolves confirmed signatures, leaves processed ones waiting and times out at the deadline
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            service.loop.run_until_complete(asyncio.wait_for(service._poll_statuses(), 0.2))
+        except asyncio.TimeoutError:
+            pass
+
+    assert status_api.polled[0] == ["polled", "processed", "expiring"]
+    assert polled_future.result(timeout=0) == {'err': None, 'slot': 12}
+    assert expiring_future.result(timeout=0) is None
+    assert not processed_future.done() and service.get_pending_count() == 1
+
+def create_stub_token_info(token_address: str)->TokenInfo:
+    token_info = TokenInfo(token_address)
+    token_info.token_vault_address = token_address + "TokenVault"
+    token_info.sol_vault_address = token_address + "SolVault"
+    token_info.sol_address = str(WRAPPED_SOL_MINT)
+
+    return token_info
+
+def get_vault_update(ui_amount: float, slot = 1)->dict:
+    return {'context': {'slot': slot}, 'value': {'data': {'parsed': {'info': {'tokenAmount': {'uiAmount': ui_amount}}}}}}
+
+#Stands in for AsyncSolanaRpcApi in the tokens monitor; lamports is Key=account address
+class StubBalancesApi:
+    def __init__(self, lamports: dict[str, int]):
+        self.lamports = lamports
+        self.requested = []
+
+    async def get_multiple_account_balances(self, account_addresses: list[str])->list[int]:
+        self.requested.append(list(account_addresses))
+
+        return [self.lamports.get(account_address, None) for account_address in account_addresses]
+
+def test_RaydiumTokensMonitor_refresh_prices():
+    token_addresses = ["TokenA", "TokenB", "TokenC", "TokenD"]
+    balances_api = StubBalancesApi({"TokenASolVault": 10*10**9, "TokenBSolVault": 30*10**9, "TokenDSolVault": 80*10**9}) #TokenC's vault is missing
+    monitor = create_stub_tokens_monitor(balances_api)
+
+    for token_address in token_addresses:
+        monitor.token_infos[token_address] = create_stub_token_info(token_address)
+
+    async def run():
+        refresh_task = asyncio.create_task(monitor._refresh_prices())
+
+        for token_address, token_ui_amount in zip(token_addresses, [100, 200, 300, 400]):
+            monitor._process((token_address, False), get_vault_update(token_ui_amount))
+
+        monitor.updated_tokens.add("Unknown") #Dropped from token_infos meanwhile
+        await asyncio.sleep(0.05)
+        refresh_task.cancel()
+
+    asyncio.run(run())
+
+    #One getMultipleAccounts read for all changed tokens, each balance priced against its own token's vault
+    assert len(balances_api.requested) == 1
+    assert sorted(balances_api.requested[0]) == [token_address + "SolVault" for token_address in token_addresses]
+    assert [monitor.token_infos[token_address].price for token_address in token_addresses] == [10/100, 30/200, 0, 80/400]
+    assert [monitor.token_infos[token_address].sol_vault_ui_amount for token_address in token_addresses] == [10, 30, 0, 80]
+    assert monitor.dispatcher.get_stats()['submitted'] == len(token_addresses)
+
+def test_RaydiumTokensMonitor_two_vaults():
+    monitor = create_stub_tokens_monitor(subscribe_sol_vault=True)
+    token_info = create_stub_token_info("TokenA")
+    monitor.token_infos[token_info.token_address] = token_info
+    key = (token_info.token_address, False)
+    sol_key = (token_info.token_address, True)
+
+    #No price until both reserves are known
+    monitor._process(key, get_vault_update(1000))
+
+    assert token_info.price == 0 and monitor.dispatcher.get_stats()['submitted'] == 0
+
+    monitor._process(sol_key, get_vault_update(10))
+
+    assert token_info.price == 10/1000
+
+    #Either vault updating alone reprices from its new reserve and the other's cached one, without an RPC
+    monitor._process(key, get_vault_update(800))
+
+    assert token_info.price == 10/800
+
+    monitor._process(sol_key, get_vault_update(12))
+
+    assert token_info.price == 12/800 and token_info.token_vault_ui_amount == 800
+    assert monitor.dispatcher.get_stats()['submitted'] == 3 and not monitor.updated_tokens
+
+def test_JsonDecoder_equivalence():
+    mint = str(Keypair().pubkey())
+    owner = str(Keypair().pubkey())
+    token_amount = {"amount": "123456789", "decimals": 6, "uiAmount": 123.456789, "uiAmountString": "123.456789"}
+    parsed_data = {"parsed": {"info": {"isNative": False, "mint": mint, "owner": owner, "state": "initialized", "tokenAmount": token_amount},
+                              "type": "account"}, "program": "spl-token", "space": 165}
+
+    #Frames as the node sends them; the typed decoders drop only the fields they do not declare
+    for value in [{"lamports": 2039280, "owner": str(TOKEN_PROGRAM_ID), "data": parsed_data, "executable": False, "rentEpoch": 2**64 - 1, "space": 165},
+                  {"lamports": 2039280, "owner": str(TOKEN_PROGRAM_ID), "data": [get_token_account_data(Pubkey.from_string(mint), 5), "base64"], "executable": False},
+                  None]:
+        frame = json.dumps({"jsonrpc": "2.0", "method": "accountNotification",
+                            "params": {"result": {"context": {"slot": 280_000_001}, "value": value}, "subscription": 42}})
+        expected = json.loads(frame)
+        del expected['jsonrpc'], expected['method']
+
+        if value:
+            del expected['params']['result']['value']['executable']
+            expected['params']['result']['value'].pop('rentEpoch', None)
+            expected['params']['result']['value'].pop('space', None)
+
+        assert JsonDecoder.decode_account_message(frame) == expected
+
+    for frame in ['{"jsonrpc":"2.0","result":23784,"id":7}', '{"jsonrpc":"2.0","result":true,"id":8}',
+                  '{"jsonrpc":"2.0","error":{"code":-32602,"message":"Invalid param"},"id":9}']:
+        expected = json.loads(frame)
+        del expected['jsonrpc']
+
+        assert JsonDecoder.decode_account_message(frame) == expected
+
+    transaction = {"blockTime": 1_700_000_000, "slot": 280_000_002, "version": 0,
+                   "meta": {"err": None, "fee": 5000, "preBalances": [10_000_000, 2039280], "postBalances": [4_995_000, 2039280],
+                            "preTokenBalances": [{"accountIndex": 1, "mint": mint, "owner": owner, "programId": str(TOKEN_PROGRAM_ID),
+                                                  "uiTokenAmount": {"amount": "0", "decimals": 6, "uiAmount": None, "uiAmountString": "0"}}],
+                            "postTokenBalances": [{"accountIndex": 1, "mint": mint, "owner": owner, "programId": str(TOKEN_PROGRAM_ID),
+                                                   "uiTokenAmount": token_amount}],
+                            "logMessages": ["Program log: Instruction: Swap"], "computeUnitsConsumed": 60_000},
+                   "transaction": {"signatures": ["signature"],
+                                   "message": {"accountKeys": [{"pubkey": owner, "signer": True, "source": "transaction", "writable": True},
+                                                               {"pubkey": mint, "signer": False, "source": "lookupTable", "writable": False}],
+                                               "recentBlockhash": str(Hash.default()), "instructions": []}}}
+
+    def strip_transaction(result: dict):
+        del result['version'], result['meta']['logMessages'], result['meta']['computeUnitsConsumed']
+        del result['transaction']['message']['recentBlockhash'], result['transaction']['message']['instructions']
+
+        for token_balance in result['meta']['preTokenBalances'] + result['meta']['postTokenBalances']:
+            del token_balance['programId'], token_balance['uiTokenAmount']['uiAmountString']
+
+        for account_key in result['transaction']['message']['accountKeys']:
+            del account_key['source']
+
+    response = json.dumps({"jsonrpc": "2.0", "result": transaction, "id": 1})
+    expected = json.loads(response)
+    strip_transaction(expected['result'])
+
+    assert JsonDecoder.decode_transaction_response(response) == expected
+
+    #Batches, unknown signatures and error replies
+    batch = json.dumps([{"jsonrpc": "2.0", "result": transaction, "id": 2}, {"jsonrpc": "2.0", "result": None, "id": 3},
+                        {"jsonrpc": "2.0", "error": {"code": -32004, "message": "Block not available"}, "id": 4}])
+    expected = json.loads(batch)
+    strip_transaction(expected[0]['result'])
+
+    assert JsonDecoder.decode_transaction_response(batch) == expected
+
+def test_RaydiumTokensMonitor_record_trade():
+    monitor = create_stub_tokens_monitor(subscribe_sol_vault=True)
+    token_info = create_stub_token_info("TokenA")
+    monitor.token_infos[token_info.token_address] = token_info
+
+    def set_reserves(token_ui_amount: float, sol_ui_amount: float):
+        token_info.token_vault_ui_amount = token_ui_amount
+        token_info.sol_vault_ui_amount = sol_ui_amount
+        token_info.price = sol_ui_amount/token_ui_amount
+        monitor._record_trade(token_info)
+
+    #The first reserves only set the baseline
+    set_reserves(1000, 10)
+
+    assert not token_info.trades
+
+    #Buyers take tokens out and put SOL in; sellers do the opposite
+    set_reserves(900, 11.2)
+    set_reserves(950, 10.6)
+    buy, sell = token_info.trades
+
+    assert buy.is_buy and math.isclose(buy.base_amount, 100) and math.isclose(buy.quote_amount, 1.2) and buy.trade_count == 1
+    assert not sell.is_buy and math.isclose(sell.base_amount, 50) and math.isclose(sell.quote_amount, 0.6) and sell.trade_count == 1
+    assert buy.price == 11.2/900 and sell.price == 10.6/950
+
+    #Liquidity moving both vaults the same way is not a trade
+    set_reserves(1900, 21.2)
+
+    assert len(token_info.trades) == 2
+
+    #With both vaults subscribed one swap arrives as two updates; their partial trades add up to the swap, counted once
+    token_info.trades.clear()
+    monitor._process((token_info.token_address, True), get_vault_update(23.2))
+    monitor._process((token_info.token_address, False), get_vault_update(1800))
+    sol_part, token_part = token_info.trades
+
+    assert sol_part.is_buy and token_part.is_buy
+    assert math.isclose(sol_part.quote_amount + token_part.quote_amount, 2) and math.isclose(sol_part.base_amount + token_part.base_amount, 100)
+    assert sol_part.trade_count + token_part.trade_count == 1
+
+def test_decode_token_account():
+    mint = Keypair().pubkey()
+
+    assert SolanaRpcApi.decode_token_account(get_token_account_data(mint, 123_456_789)) == (bytes(mint), 123_456_789)
+    assert SolanaRpcApi.decode_token_account(get_token_account_data(mint, 2**64 - 1))[1] == 2**64 - 1
+
+    #The monitor only takes amounts from vaults holding the mint it expects on that side
+    monitor = create_stub_tokens_monitor(compact_encoding=True)
+    token_info = TokenInfo(str(mint))
+    token_info.sol_address = str(WRAPPED_SOL_MINT)
+    token_info.decimals_scale_factor = 1E6
+    monitor.token_infos[token_info.token_address] = token_info
+    token_vault_update = {'context': {'slot': 1}, 'value': {'data': [get_token_account_data(mint, 123_456_789), 'base64']}}
+
+    monitor._process((token_info.token_address, False), token_vault_update)
+    monitor._process((token_info.token_address, True), token_vault_update)
+
+    assert math.isclose(token_info.token_vault_ui_amount, 123.456789) and token_info.sol_vault_ui_amount == 0
+
+def test_RpcRouter():
+    slow_server = start_stub_rpc_server("slow", 0.5)
+    fast_server = start_stub_rpc_server("fast", 0)
+    failing_server = start_stub_rpc_server("failing", 0, fail=True)
+    slow_uri = f"http://127.0.0.1:{slow_server.server_port}"
+    fast_uri = f"http://127.0.0.1:{fast_server.server_port}"
+    failing_uri = f"http://127.0.0.1:{failing_server.server_port}"
+    json_request = {"jsonrpc": "2.0", "id": 1, "method": "getSlot"}
+
+    #Nothing measured yet, so the slow endpoint goes first and the hedge must win
+    router = RpcRouter([slow_uri, fast_uri], hedge_delay=0.05)
+    start_time = time.time()
+    response = router.post(json_request, hedged=True)
+
+    assert response.json()["result"] == "fast"
+    assert time.time() - start_time < 0.4
+
+    #Once both are measured, plain reads go to the fastest endpoint
+    time.sleep(0.6)
+    response = router.post(json_request)
+
+    assert response.json()["result"] == "fast"
+    assert router.get_ranked_endpoints()[0].uri == fast_uri
+    assert router.get_stats()[slow_uri]["p99"] >= 0.5
+
+    #Errors fail over to the next endpoint
+    router = RpcRouter([failing_uri, fast_uri])
+    response = router.post(json_request)
+
+    assert response.json()["result"] == "fast"
+
+    #A hung endpoint times out, counts as a failure and drops behind the measured fast endpoint
+    router = RpcRouter([slow_uri, fast_uri], timeout=0.2)
+    router._post_to_endpoint(router.endpoints[1], json_request)
+    start_time = time.time()
+
+    try:
+        router._post_to_endpoint(router.endpoints[0], json_request)
+        assert False
+    except requests.Timeout:
+        assert time.time() - start_time < 0.45
+
+    assert router.endpoints[0].consecutive_failures == 1 and router.get_ranked_endpoints()[0].uri == fast_uri
+
+    for server in [slow_server, fast_server, failing_server]:
+        server.shutdown()
+
 test_Strategy1()
 
-test_PnlTradingEngine()
\ No newline at end of file
+test_PnlTradingEngine()
+
+test_CandlestickBuilder()
+
+test_RpcRouter()
+
+test_Candlesticks_rollup()
+
+test_CandlestickStore()
+
+test_Indicators()
+
+test_TokenUpdateDispatcher()
+
+test_StrategyScheduler()
+
+test_TriggerBook()
+
+test_PnlTradingEngine_ladder()
+
+test_QuoteEngine()
+
+test_RaydiumSwapBuilder()
+
+test_PubkeyCache()
+
+test_BalanceCache()
+
+test_PnlTradingEngine_balance_check()
+
+test_AccountSubscriptionShard_errors()
+
+test_PnlTradingEngine_order_pool()
+
+test_PnlTradingEngine_stop_side()
+
+test_SolanaRpcApi_batch()
+
+test_decode_token_account()
+
+test_AsyncSolanaRpcApi_batched_reads()
+
+test_AsyncSolanaRpcApi_sessions()
+
+test_TransactionBroadcaster()
+
+test_SignatureConfirmationService()
+
+test_RaydiumTokensMonitor_refresh_prices()
+
+test_RaydiumTokensMonitor_two_vaults()
+
+test_JsonDecoder_equivalence()
+
+test_Indicators_reference()
+
+test_RaydiumTokensMonitor_record_trade()
+
+test_TradesManager_raydium_route()
+
+test_AccountSubscriptionManager_routing()
+
+test_AsyncSolanaRpcApi_token_accounts()
\ No newline at end of file
@@ -0,0 +1,273 @@
+from Candlesticks import CandlestickSeries, c_candle_columns
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+c_store_format_version = 2 #2: volume columns from pool reserve changes
+c_store_magic = b'CNDL'
+c_header_format = '<4sIIIQ' #magic, format version, column count, interval, candle count
+c_header_size = 32 #Header padded to a multiple of the record alignment
+c_count_offset = struct.calcsize('<4sIII')
+c_record_size = 8*len(c_candle_columns)
+c_default_flush_count = 64 #Buffered candles written in one go
+c_default_flush_interval = 5 #Seconds buffered candles wait at most before being written
+c_default_max_open_files = 256 #Each open history holds a descriptor, plus one for its map
+
+#Append-only candle history for one token and interval: a fixed header followed by fixed-width float64 records
+#laid out in c_candle_columns order. Reads go through a read-only memory map, so history larger than RAM is paged
+#in on demand, and each column is exposed as a strided memoryview over the mapped records.
+#Appended candles are buffered and written flush_count at a time (or by flush()); reads flush them first.
+#release() closes the descriptor and the map of an idle file, and the next use reopens them.
+class CandlestickFile:
+    def __init__(self, file_path: str, interval: int, on_use = None, flush_count = c_default_flush_count):
+        self.file_path = file_path
+        self.interval = interval
+        self.on_use = on_use #Called, outside the lock, after each use that keeps the file open
+        self.flush_count = flush_count
+        self.lock = threading.Lock()
+        self.mapped_file : mmap.mmap = None
+        self.mapped_values : memoryview = None
+        self.mapped_count = 0
+        self.pending_records : list[bytes] = [] #Appended candles not written yet
+        self.file = self._open()
+        self.count = self._read_count() #Candles written to the file
+        self.last_start = self._read_last_start() #Kept in memory so the persister's check after each close needs no map
+
+    def __len__(self)->int:
+        with self.lock:
+            return self.count + len(self.pending_records)
+
+    def get_first_index(self)->int:
+        return 0
+
+    def _open(self):
+        if os.path.exists(self.file_path):
+            file = open(self.file_path, 'r+b')
+            header = file.read(c_header_size)
+
+            #A short header (e.g. a crash while creating the file) or a foreign one holds no usable history
+            if len(header) < c_header_size or header[:len(c_store_magic)] != c_store_magic:
+                file.close()
+                print("Error: corrupt candle history " + self.file_path + ", starting a new one")
+            else:
+                magic, version, column_count, interval, count = struct.unpack_from(c_header_format, header)
+
+                if version == c_store_format_version and column_count == len(c_candle_columns) and interval == self.interval:
+                    return file
+
+                #Written by another format version; keep it aside and start a new history
+                file.close()
+                print("Error: incompatible candle history " + self.file_path + ", moving it aside")
+                os.replace(self.file_path, self.file_path + ".v" + str(version))
+
+        file = open(self.file_path, 'w+b')
+        file.write(struct.pack(c_header_format, c_store_magic, c_store_format_version, len(c_candle_columns), self.interval, 0).ljust(c_header_size, b'\0'))
+        file.flush()
+
+        return file
+
+    def _read_count(self)->int:
+        #Ignore a partially written trailing record left by an interrupted append
+        self.file.seek(c_count_offset)
+        count = struct.unpack('<Q', self.file.read(8))[0]
+        file_size = os.fstat(self.file.fileno()).st_size
+
+        return min(count, (file_size - c_header_size) // c_record_size)
+
+    def _read_last_start(self)->float:
+        if self.count > 0:
+            self.file.seek(c_header_size + (self.count - 1)*c_record_size + 8*c_candle_columns.index('start'))
+
+            return struct.unpack('<d', self.file.read(8))[0]
+
+    def is_open(self)->bool:
+        return self.file is not None
+
+    def _get_file(self):
+        if self.file is None:
+            self.file = open(self.file_path, 'r+b') #Validated when first opened
+
+        return self.file
+
+    def append(self, values: list[float]):
+        """Appends one closed candle; values follow c_candle_columns order."""
+        with self.lock:
+            self.pending_records.append(struct.pack('<%dd' % len(c_candle_columns), *values))
+            self.last_start = values[c_candle_columns.index('start')]
+
+            if len(self.pending_records) < self.flush_count:
+                return
+
+            self._flush()
+
+        self._notify_use()
+
+    def flush(self):
+        """Writes the buffered candles."""
+        with self.lock:
+            if not self.pending_records:
+                return
+
+            self._flush()
+
+        self._notify_use()
+
+    def _flush(self):
+        if self.pending_records:
+            file = self._get_file()
+
+            #Write the records before publishing the new count so readers never see a torn candle
+            file.seek(c_header_size + self.count*c_record_size)
+            file.write(b''.join(self.pending_records))
+            file.seek(c_count_offset)
+            file.write(struct.pack('<Q', self.count + len(self.pending_records)))
+            file.flush()
+            self.count += len(self.pending_records)
+            self.pending_records = []
+
+    def _notify_use(self):
+        if self.on_use:
+            self.on_use(self)
+
+    def get_last_start(self)->float:
+        return self.last_start
+
+    def _get_mapped_values(self)->memoryview:
+        with self.lock:
+            self._flush()
+
+            if self.mapped_values is None or self.mapped_count != self.count:
+                #Remap to cover appended records; views handed out earlier keep the previous map alive
+                self.mapped_file = mmap.mmap(self._get_file().fileno(), c_header_size + self.count*c_record_size, access=mmap.ACCESS_READ)
+                self.mapped_values = memoryview(self.mapped_file)[c_header_size:].cast('d')
+                self.mapped_count = self.count
+                is_remapped = True
+            else:
+                is_remapped = False
+
+            mapped_values = self.mapped_values
+
+        if is_remapped:
+            self._notify_use()
+
+        return mapped_values
+
+    def get_value(self, index: int, name: str)->float:
+        return self._get_mapped_values()[index*len(c_candle_columns) + c_candle_columns.index(name)]
+
+    def get_column(self, name: str, begin: int, end: int)->memoryview:
+        if end <= begin:
+            return memoryview(b'').cast('d')
+
+        column_count = len(c_candle_columns)
+        offset = c_candle_columns.index(name)
+
+        return self._get_mapped_values()[begin*column_count + offset:end*column_count:column_count]
+
+    def get_all(self)->CandlestickSeries:
+        return CandlestickSeries(self, self.interval, 0, len(self))
+
+    def get(self, count: int)->CandlestickSeries:
+        length = len(self)
+        count = min(count, length)
+
+        return CandlestickSeries(self, self.interval, length - count, length)
+
+    def release(self):
+        """Writes the buffered candles and closes the map and the descriptor until the next use."""
+        with self.lock:
+            self._flush()
+
+            if self.mapped_values is not None:
+                self.mapped_values.release()
+                self.mapped_values = None
+
+            if self.mapped_file is not None:
+                try:
+                    self.mapped_file.close()
+                except BufferError:
+                    pass #Series handed out still view the map; it is unmapped once they are released
+
+                self.mapped_file = None
+
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def close(self):
+        self.release()
+
+class CandlestickStore:
+    """
+    On-disk candle history, one memory-mapped file per token and interval under directory.
+    File objects are made once per key and shared, so every Candlesticks instance for a token appends to the same history.
+    At most max_open_files keep their descriptor and map open; the least recently used one is released beyond that.
+    Buffered candles are written every flush_interval seconds and on close().
+    """
+    def __init__(self, directory: str, max_open_files = c_default_max_open_files, flush_interval = c_default_flush_interval):
+        self.directory = directory
+        self.max_open_files = max_open_files
+        self.flush_interval = flush_interval
+        self.files : dict[tuple[str, int], CandlestickFile] = {}
+        self.open_files : OrderedDict[CandlestickFile, None] = OrderedDict() #Least recently used first
+        self.lock = threading.Lock()
+        self.closed_event = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        threading.Thread(target=self._run_flusher, name="CandlestickStore", daemon=True).start()
+
+    def get_file(self, token_address: str, interval: int)->CandlestickFile:
+        key = (token_address, interval)
+
+        with self.lock:
+            if key not in self.files:
+                file_path = os.path.join(self.directory, f"{token_address}_{interval}.candles")
+                self.files[key] = CandlestickFile(file_path, interval, self._on_file_used)
+
+            candlestick_file = self.files[key]
+
+        self._on_file_used(candlestick_file)
+
+        return candlestick_file
+
+    def get_open_file_count(self)->int:
+        with self.lock:
+            return len(self.open_files)
+
+    def flush(self):
+        with self.lock:
+            files = list(self.files.values())
+
+        for candlestick_file in files:
+            candlestick_file.flush()
+
+    def _on_file_used(self, candlestick_file: CandlestickFile):
+        with self.lock:
+            self.open_files[candlestick_file] = None
+            self.open_files.move_to_end(candlestick_file)
+            idle_files = []
+
+            while len(self.open_files) > self.max_open_files:
+                idle_files.append(self.open_files.popitem(last=False)[0])
+
+        #Released outside the store lock; a file's own lock is never held while taking the store's
+        for idle_file in idle_files:
+            idle_file.release()
+
+    def _run_flusher(self):
+        while not self.closed_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print("Error flushing candle history " + str(e))
+
+    def close(self):
+        self.closed_event.set()
+
+        with self.lock:
+            for candlestick_file in self.files.values():
+                candlestick_file.close()
+
+            self.files.clear()
+            self.open_files.clear()
@@ -1,4 +1,11 @@
 from datetime import datetime, timedelta
+from array import array
+import bisect
+
+#start is the candle's start time in epoch seconds. volume is quote (SOL) volume, base_volume is token volume,
+#buy/sell volumes are quote volume split by side; all are derived from pool reserve changes
+c_candle_columns = ['start', 'open', 'high', 'low', 'close', 'volume', 'base_volume', 'buy_volume', 'sell_volume', 'trade_count']
+c_volume_columns = c_candle_columns[5:]
 
 class Candlestick:
     def __init__(self, start_time: datetime, interval_secs: int, open_price: float):
@@ -9,52 +16,357 @@ class Candlestick:
         self.low = open_price
         self.close = open_price
         self.volume = 0
-    
-    def update(self, price):
+        self.base_volume = 0
+        self.buy_volume = 0
+        self.sell_volume = 0
+        self.trade_count = 0
+
+    def update(self, price, base_volume = 0.0, quote_volume = 0.0, is_buy = True, trade_count = 0):
         if price > self.high:
             self.high = price
         elif price < self.low:
             self.low = price
-        
+
         self.close = price
-        self.volume += 1  # Increment volume (can replace with actual traded volume if available)
-    
+        self.volume += quote_volume
+        self.base_volume += base_volume
+        self.trade_count += trade_count
+
+        if is_buy:
+            self.buy_volume += quote_volume
+        else:
+            self.sell_volume += quote_volume
+
+#Fixed-capacity columnar candle storage. Every value is written twice (at i and i+capacity) so the latest
+#capacity candles are always one contiguous slice of each column, which lets reads return memoryviews instead of copies.
+class CandlestickRingBuffer:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.count = 0 #Candles appended since creation; candle n lives at position n % capacity
+        self.columns : dict[str, array] = {name: array('d', bytes(16*capacity)) for name in c_candle_columns}
+
+    def __len__(self)->int:
+        return min(self.count, self.capacity)
+
+    def get_first_index(self)->int:
+        return max(0, self.count - self.capacity)
+
+    def append(self, start: float, open_price: float):
+        position = self.count % self.capacity
+
+        for name, value in (('start', start), ('open', open_price), ('high', open_price), ('low', open_price), ('close', open_price)):
+            column = self.columns[name]
+            column[position] = value
+            column[position + self.capacity] = value
+
+        for name in c_volume_columns:
+            column = self.columns[name]
+            column[position] = 0
+            column[position + self.capacity] = 0
+
+        self.count += 1
+
+    def set_value(self, index: int, name: str, value: float):
+        position = index % self.capacity
+        column = self.columns[name]
+        column[position] = value
+        column[position + self.capacity] = value
+
+    def get_value(self, index: int, name: str)->float:
+        return self.columns[name][index % self.capacity]
+
+    def get_column(self, name: str, begin: int, end: int)->memoryview:
+        position = begin % self.capacity
+
+        return memoryview(self.columns[name])[position:position + end - begin]
+
+#Read-only window over candles [begin, end) of a ring buffer. Columns are zero-copy views of the live buffer,
+#so they stay valid until the window falls out of the buffer's capacity.
+class CandlestickSeries:
+    def __init__(self, buffer: CandlestickRingBuffer, interval: int, begin: int, end: int):
+        self.buffer = buffer
+        self.interval = interval
+        self.begin = begin
+        self.end = end
+
+    def __len__(self)->int:
+        return self.end - self.begin
+
+    def __getitem__(self, index: int | slice):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+
+            if step != 1:
+                raise ValueError("CandlestickSeries only supports contiguous slices")
+
+            return CandlestickSeries(self.buffer, self.interval, self.begin + start, self.begin + max(start, stop))
+
+        if index < 0:
+            index += len(self)
+
+        if index < 0 or index >= len(self):
+            raise IndexError("candlestick index out of range")
+
+        return self._get_candlestick(self.begin + index)
+
+    def __iter__(self):
+        for index in range(self.begin, self.end):
+            yield self._get_candlestick(index)
+
+    def get_column(self, name: str)->memoryview:
+        return self.buffer.get_column(name, self.begin, self.end)
+
+    def get_range(self, start_time: datetime, end_time: datetime)->'CandlestickSeries':
+        """Candles overlapping [start_time, end_time), found by binary search over the start column."""
+        starts = self.get_column('start')
+        begin = bisect.bisect_right(starts, start_time.timestamp() - self.interval)
+        end = bisect.bisect_left(starts, end_time.timestamp())
+
+        return CandlestickSeries(self.buffer, self.interval, self.begin + begin, self.begin + max(begin, end))
+
+    def get_at(self, timestamp: datetime)->Candlestick:
+        """The candle containing timestamp, or None if no candle covers it."""
+        time_secs = timestamp.timestamp()
+        starts = self.get_column('start')
+        index = bisect.bisect_right(starts, time_secs) - 1
+
+        if index >= 0 and time_secs < starts[index] + self.interval:
+            return self._get_candlestick(self.begin + index)
+
+    def _get_candlestick(self, index: int)->Candlestick:
+        buffer = self.buffer
+        candlestick = Candlestick(datetime.fromtimestamp(buffer.get_value(index, 'start')), self.interval, buffer.get_value(index, 'open'))
+        candlestick.high = buffer.get_value(index, 'high')
+        candlestick.low = buffer.get_value(index, 'low')
+        candlestick.close = buffer.get_value(index, 'close')
+
+        for name in c_volume_columns:
+            setattr(candlestick, name, buffer.get_value(index, name))
+
+        return candlestick
+
 class CandlestickBuilder:
     def __init__(self, interval: int, max_length = 1000):
         self.interval = interval
-        self.current_candle: Candlestick = None
-        self.candlesticks : list[Candlestick] = []  # Store historical candlesticks
+        self.buffer = CandlestickRingBuffer(max_length) # Keep only the latest candles for memory efficiency
+        self.current_end_time : float = None
         self.max_length = max_length
+        self.close_listeners = [] #Called with (builder, candle index) whenever a candle is completed
+        self.indicators = [] #See Indicators.py
+
+    @property
+    def current_candle(self)->Candlestick:
+        if self.buffer.count > 0:
+            return self.get_all()[-1]
 
-    def update(self, timestamp: datetime, price: float):
-        if self.current_candle is None or timestamp >= self.current_candle.end_time:
-            self.current_candle = Candlestick(start_time=timestamp, interval_secs=self.interval, open_price=price)
-            self.candlesticks.append(self.current_candle)
+    def update(self, timestamp: datetime, price: float, base_volume = 0.0, quote_volume = 0.0, is_buy = True, trade_count = 0):
+        """Applies a price tick, optionally carrying the traded base (token) and quote (SOL) amounts."""
+        time_secs = timestamp.timestamp()
+        buffer = self.buffer
 
-            if len(self.candlesticks) > self.max_length :  # Keep only the latest candles for memory efficiency
-                self.candlesticks.pop(0)
+        if self.current_end_time is None or time_secs >= self.current_end_time:
+            self._start_candle(time_secs, price)
 
         # Update the current candle
-        self.current_candle.update(price)
-    
-    def get_all(self)->list[Candlestick]:
-        return self.candlesticks
-    
-    def get(self, count: int)->list[Candlestick]:
-        if len(self.candlesticks) >= count:
-           return self.candlesticks[-count:]
-            
+        index = buffer.count - 1
+
+        if price > buffer.get_value(index, 'high'):
+            buffer.set_value(index, 'high', price)
+        elif price < buffer.get_value(index, 'low'):
+            buffer.set_value(index, 'low', price)
+
+        buffer.set_value(index, 'close', price)
+
+        if trade_count or quote_volume or base_volume:
+            buffer.set_value(index, 'volume', buffer.get_value(index, 'volume') + quote_volume)
+            buffer.set_value(index, 'base_volume', buffer.get_value(index, 'base_volume') + base_volume)
+            side_column = 'buy_volume' if is_buy else 'sell_volume'
+            buffer.set_value(index, side_column, buffer.get_value(index, side_column) + quote_volume)
+            buffer.set_value(index, 'trade_count', buffer.get_value(index, 'trade_count') + trade_count)
+
+        if self.indicators:
+            self._update_indicators(index)
+
+    def add_candle(self, start: float, open_price: float, high: float, low: float, close: float, *volumes: float):
+        """
+        Merges a completed candle of a finer interval (start in epoch seconds) into this builder.
+        volumes follow c_volume_columns order.
+        """
+        buffer = self.buffer
+
+        if self.current_end_time is None or start >= self.current_end_time:
+            self._start_candle(start, open_price)
+            index = buffer.count - 1
+            buffer.set_value(index, 'high', high)
+            buffer.set_value(index, 'low', low)
+        else:
+            index = buffer.count - 1
+
+            if high > buffer.get_value(index, 'high'):
+                buffer.set_value(index, 'high', high)
+
+            if low < buffer.get_value(index, 'low'):
+                buffer.set_value(index, 'low', low)
+
+        buffer.set_value(index, 'close', close)
+
+        for name, volume in zip(c_volume_columns, volumes):
+            buffer.set_value(index, name, buffer.get_value(index, name) + volume)
+
+        if self.indicators:
+            self._update_indicators(index)
+
+    def load(self, candlesticks: CandlestickSeries):
+        """Fills an empty builder with previously closed candles, keeping the latest max_length."""
+        candlesticks = candlesticks[-self.max_length:]
+        columns = [candlesticks.get_column(name) for name in c_candle_columns]
+
+        for values in zip(*columns):
+            self.buffer.append(values[0], values[1])
+            index = self.buffer.count - 1
+
+            for name, value in zip(c_candle_columns[2:], values[2:]):
+                self.buffer.set_value(index, name, value)
+
+            self.current_end_time = values[0] + self.interval
+
+    def add_close_listener(self, listener):
+        self.close_listeners.append(listener)
+
+    def add_indicator(self, indicator):
+        """Attaches an Indicators.Indicator, primed from the candles already held, and returns it."""
+        first_index = self.buffer.get_first_index()
+
+        for index in range(first_index, self.buffer.count - 1):
+            indicator.on_close(*self._get_candle_values(index))
+
+        if self.buffer.count > 0:
+            indicator.on_update(*self._get_candle_values(self.buffer.count - 1))
+
+        self.indicators.append(indicator)
+
+        return indicator
+
+    def _get_candle_values(self, index: int)->tuple[float, float, float, float, float]:
+        buffer = self.buffer
+
+        return (buffer.get_value(index, 'open'), buffer.get_value(index, 'high'), buffer.get_value(index, 'low'),
+                buffer.get_value(index, 'close'), buffer.get_value(index, 'volume'))
+
+    def _update_indicators(self, index: int):
+        values = self._get_candle_values(index)
+
+        for indicator in self.indicators:
+            indicator.on_update(*values)
+
+    def _start_candle(self, start: float, open_price: float):
+        if self.buffer.count > 0:
+            if self.indicators:
+                values = self._get_candle_values(self.buffer.count - 1)
+
+                for indicator in self.indicators:
+                    indicator.on_close(*values)
+
+            for listener in self.close_listeners:
+                listener(self, self.buffer.count - 1)
+
+        self.buffer.append(start, open_price)
+        self.current_end_time = start + self.interval
+
+    def get_all(self)->CandlestickSeries:
+        return CandlestickSeries(self.buffer, self.interval, self.buffer.get_first_index(), self.buffer.count)
+
+    def get_range(self, start_time: datetime, end_time: datetime)->CandlestickSeries:
+        return self.get_all().get_range(start_time, end_time)
+
+    def get_at(self, timestamp: datetime)->Candlestick:
+        return self.get_all().get_at(timestamp)
+
+    def get(self, count: int)->CandlestickSeries:
+        if len(self.buffer) >= count:
+           return CandlestickSeries(self.buffer, self.interval, self.buffer.count - count, self.buffer.count)
+
 class Candlesticks:
-    def __init__(self, intervals: list[int], max_length = 1000):
+    """
+    Candlestick builders for a set of intervals. With derive_from_base only the smallest (base) interval is
+    built from ticks; every other interval that is a multiple of it is rolled up from completed base candles,
+    so per-tick work no longer grows with the number of intervals. Derived candles trail the base candle in progress.
+    With a CandlestickStore, each builder starts from the token's stored history and appends candles to it as they close.
+    """
+    def __init__(self, intervals: list[int], max_length = 1000, derive_from_base = False, store = None, token_address: str = None):
         self.candlestick_builders : dict[int, CandlestickBuilder] = {}
+        self.on_demand_builders : dict[int, CandlestickBuilder] = {} #Unconfigured intervals, rolled up from the base candles once requested
+        self.tick_builders : list[CandlestickBuilder] = [] #Builders updated directly from price ticks
+        self.base_interval = min(intervals)
+        self.derive_from_base = derive_from_base
+        self.max_length = max_length
         
         for interval in intervals:
             self.candlestick_builders[interval] = CandlestickBuilder(interval=interval, max_length=max_length)
-    
-    def update(self, timestamp: datetime, price: float):
-        for candlestick_builder in self.candlestick_builders.values():
-            candlestick_builder.update(timestamp, price)
+
+        if store:
+            for interval, candlestick_builder in self.candlestick_builders.items():
+                candlestick_file = store.get_file(token_address, interval)
+                candlestick_builder.load(candlestick_file.get_all())
+                candlestick_builder.add_close_listener(self._create_persister(candlestick_file))
+
+        base_builder = self.candlestick_builders[self.base_interval]
+
+        for interval, candlestick_builder in self.candlestick_builders.items():
+            if derive_from_base and interval != self.base_interval and interval % self.base_interval == 0:
+                base_builder.add_close_listener(self._create_rollup(candlestick_builder))
+            else:
+                self.tick_builders.append(candlestick_builder)
+
+    @staticmethod
+    def _create_rollup(candlestick_builder: CandlestickBuilder):
+        def rollup(base_builder: CandlestickBuilder, index: int):
+            buffer = base_builder.buffer
+            candlestick_builder.add_candle(*[buffer.get_value(index, name) for name in c_candle_columns])
+        return rollup
+
+    @staticmethod
+    def _create_persister(candlestick_file):
+        def persist(candlestick_builder: CandlestickBuilder, index: int):
+            buffer = candlestick_builder.buffer
+            last_start = candlestick_file.get_last_start()
+
+            #The last candle loaded from the file closes again on the first new candle after a restart
+            if last_start is None or buffer.get_value(index, 'start') > last_start:
+                candlestick_file.append([buffer.get_value(index, name) for name in c_candle_columns])
+        return persist
+
+    def update(self, timestamp: datetime, price: float, base_volume = 0.0, quote_volume = 0.0, is_buy = True, trade_count = 0):
+        for candlestick_builder in self.tick_builders:
+            candlestick_builder.update(timestamp, price, base_volume, quote_volume, is_buy, trade_count)
         
     def get_candlestick_builder(self, interval: int)->CandlestickBuilder:
         if interval in self.candlestick_builders:
-            return self.candlestick_builders[interval]    
+            return self.candlestick_builders[interval]
+
+    def get_candlesticks(self, interval: int)->CandlestickSeries:
+        """
+        Candles for any configured interval, or for any multiple of the base interval. The first request for an
+        unconfigured multiple rolls its builder up from the base candles held in memory; the builder is then kept
+        and fed each base candle as it closes, so its candles trail the base candle in progress.
+        Raises ValueError for an interval that is not a multiple of the base interval.
+        """
+        if interval in self.candlestick_builders:
+            return self.candlestick_builders[interval].get_all()
+
+        if interval not in self.on_demand_builders:
+            if interval % self.base_interval != 0:
+                raise ValueError(f"Interval {interval} is not a multiple of the base interval {self.base_interval}")
+
+            base_builder = self.candlestick_builders[self.base_interval]
+            candlestick_builder = CandlestickBuilder(interval=interval, max_length=self.max_length)
+            base_candles = base_builder.get_all()[:-1] #The base candle in progress arrives through the listener once it closes
+            columns = [base_candles.get_column(name) for name in c_candle_columns]
+
+            for values in zip(*columns):
+                candlestick_builder.add_candle(*values)
+
+            base_builder.add_close_listener(self._create_rollup(candlestick_builder))
+            self.on_demand_builders[interval] = candlestick_builder
+
+        return self.on_demand_builders[interval].get_all()
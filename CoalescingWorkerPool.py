@@ -0,0 +1,86 @@
+from collections import deque
+import threading
+
+class CoalescingWorkerPool:
+    """
+    Calls deliver(key) from a fixed pool of worker threads so submitters never block. Keys carry no payload, so a key
+    that is already queued is merged into the queued delivery and sees the latest state once. A key is never delivered
+    on two workers at once; a submit arriving mid-delivery queues exactly one redelivery. When max_pending distinct keys
+    are queued, new ones are dropped (None = no limit).
+    Subclasses may override _on_queued, _on_started and _on_finished, which run under the pool's lock.
+    """
+    def __init__(self, deliver, worker_count: int, name: str, max_pending: int = None):
+        self.deliver = deliver
+        self.worker_count = worker_count
+        self.name = name
+        self.max_pending = max_pending
+        self.condition = threading.Condition()
+        self.ready_keys = deque()
+        self.queued_keys = set() #Keys in ready_keys
+        self.in_flight_keys = set()
+        self.redeliver_keys = set() #Keys submitted while being delivered
+        self.workers : list[threading.Thread] = []
+        self.submitted_count = 0
+        self.delivered_count = 0
+        self.merged_count = 0
+        self.dropped_count = 0
+
+    def start(self):
+        for i in range(self.worker_count):
+            worker = threading.Thread(target=self._run_worker, name=self.name + "-" + str(i), daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, key):
+        """Thread safe and non-blocking."""
+        with self.condition:
+            self.submitted_count += 1
+
+            if key in self.queued_keys or key in self.redeliver_keys:
+                self.merged_count += 1
+            elif key in self.in_flight_keys:
+                self.redeliver_keys.add(key)
+            elif self.max_pending is not None and len(self.ready_keys) >= self.max_pending:
+                self.dropped_count += 1
+            else:
+                self._queue(key)
+
+    def _queue(self, key):
+        self.ready_keys.append(key)
+        self.queued_keys.add(key)
+        self._on_queued(key)
+        self.condition.notify()
+
+    def _on_queued(self, key):
+        pass
+
+    def _on_started(self, key):
+        pass
+
+    def _on_finished(self, key):
+        pass
+
+    def _run_worker(self):
+        while True:
+            with self.condition:
+                while not self.ready_keys:
+                    self.condition.wait()
+
+                key = self.ready_keys.popleft()
+                self.queued_keys.discard(key)
+                self.in_flight_keys.add(key)
+                self._on_started(key)
+
+            try:
+                self.deliver(key)
+            except Exception as e:
+                print("Error in " + self.name + " delivery " + str(e))
+
+            with self.condition:
+                self.in_flight_keys.discard(key)
+                self.delivered_count += 1
+                self._on_finished(key)
+
+                if key in self.redeliver_keys:
+                    self.redeliver_keys.discard(key)
+                    self._queue(key)
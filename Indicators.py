@@ -0,0 +1,214 @@
+from collections import deque
+import math
+
+#Incremental technical indicators driven by a CandlestickBuilder (see CandlestickBuilder.add_indicator).
+#on_close commits a finished candle into the indicator's state; on_update recomputes the value for the candle
+#still in progress from that committed state. Both are O(1) (amortized for RollingMinMax), so reading
+#get_value() never walks the candle history.
+class Indicator:
+    def __init__(self):
+        self.value = None
+
+    def get_value(self):
+        return self.value
+
+    def on_update(self, open_price: float, high: float, low: float, close: float, volume: float):
+        pass
+
+    def on_close(self, open_price: float, high: float, low: float, close: float, volume: float):
+        pass
+
+class SMA(Indicator):
+    def __init__(self, period: int):
+        Indicator.__init__(self)
+        self.period = period
+        self.closes = deque()
+        self.closes_sum = 0.0
+
+    def on_update(self, open_price: float, high: float, low: float, close: float, volume: float):
+        if len(self.closes) == self.period - 1:
+            self.value = (self.closes_sum + close)/self.period
+
+    def on_close(self, open_price: float, high: float, low: float, close: float, volume: float):
+        self.on_update(open_price, high, low, close, volume)
+
+        if self.period > 1:
+            if len(self.closes) == self.period - 1:
+                self.closes_sum -= self.closes.popleft()
+
+            self.closes.append(close)
+            self.closes_sum += close
+
+class EMA(Indicator):
+    def __init__(self, period: int):
+        Indicator.__init__(self)
+        self.period = period
+        self.alpha = 2/(period + 1)
+        self.ema : float = None #Value as of the last closed candle
+
+    def on_update(self, open_price: float, high: float, low: float, close: float, volume: float):
+        if self.ema is None:
+            self.value = close
+        else:
+            self.value = self.alpha*close + (1 - self.alpha)*self.ema
+
+    def on_close(self, open_price: float, high: float, low: float, close: float, volume: float):
+        self.on_update(open_price, high, low, close, volume)
+        self.ema = self.value
+
+#Wilder's RSI, seeded with the simple average of the first period changes
+class RSI(Indicator):
+    def __init__(self, period = 14):
+        Indicator.__init__(self)
+        self.period = period
+        self.previous_close : float = None
+        self.change_count = 0
+        self.average_gain = 0.0
+        self.average_loss = 0.0
+
+    def _get_averages(self, close: float)->tuple[float, float]:
+        change = close - self.previous_close
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+
+        if self.change_count < self.period:
+            return self.average_gain + gain/self.period, self.average_loss + loss/self.period
+        else:
+            return (self.average_gain*(self.period - 1) + gain)/self.period, (self.average_loss*(self.period - 1) + loss)/self.period
+
+    def on_update(self, open_price: float, high: float, low: float, close: float, volume: float):
+        if self.previous_close is not None and self.change_count >= self.period - 1:
+            average_gain, average_loss = self._get_averages(close)
+            self.value = 100.0 if average_loss == 0 else 100 - 100/(1 + average_gain/average_loss)
+
+    def on_close(self, open_price: float, high: float, low: float, close: float, volume: float):
+        self.on_update(open_price, high, low, close, volume)
+
+        if self.previous_close is not None:
+            self.average_gain, self.average_loss = self._get_averages(close)
+            self.change_count += 1
+
+        self.previous_close = close
+
+#Wilder's average true range, seeded with the simple average of the first period true ranges
+class ATR(Indicator):
+    def __init__(self, period = 14):
+        Indicator.__init__(self)
+        self.period = period
+        self.previous_close : float = None
+        self.range_count = 0
+        self.atr = 0.0
+
+    def _get_atr(self, high: float, low: float)->float:
+        true_range = high - low
+
+        if self.previous_close is not None:
+            true_range = max(true_range, abs(high - self.previous_close), abs(low - self.previous_close))
+
+        if self.range_count < self.period:
+            return self.atr + true_range/self.period
+        else:
+            return (self.atr*(self.period - 1) + true_range)/self.period
+
+    def on_update(self, open_price: float, high: float, low: float, close: float, volume: float):
+        if self.range_count >= self.period - 1:
+            self.value = self._get_atr(high, low)
+
+    def on_close(self, open_price: float, high: float, low: float, close: float, volume: float):
+        self.on_update(open_price, high, low, close, volume)
+        self.atr = self._get_atr(high, low)
+        self.range_count += 1
+        self.previous_close = close
+
+#Volume weighted typical price since the indicator was attached
+class VWAP(Indicator):
+    def __init__(self):
+        Indicator.__init__(self)
+        self.price_volume_sum = 0.0
+        self.volume_sum = 0.0
+
+    def on_update(self, open_price: float, high: float, low: float, close: float, volume: float):
+        volume_sum = self.volume_sum + volume
+
+        if volume_sum > 0:
+            self.value = (self.price_volume_sum + (high + low + close)/3*volume)/volume_sum
+
+    def on_close(self, open_price: float, high: float, low: float, close: float, volume: float):
+        self.on_update(open_price, high, low, close, volume)
+        self.price_volume_sum += (high + low + close)/3*volume
+        self.volume_sum += volume
+
+#Value is (lower band, middle band, upper band)
+class BollingerBands(Indicator):
+    def __init__(self, period = 20, deviations = 2.0):
+        Indicator.__init__(self)
+        self.period = period
+        self.deviations = deviations
+        self.closes = deque()
+        self.closes_sum = 0.0
+        self.squares_sum = 0.0
+
+    def on_update(self, open_price: float, high: float, low: float, close: float, volume: float):
+        if len(self.closes) == self.period - 1:
+            mean = (self.closes_sum + close)/self.period
+            variance = max(0.0, (self.squares_sum + close*close)/self.period - mean*mean)
+            width = self.deviations*math.sqrt(variance)
+            self.value = (mean - width, mean, mean + width)
+
+    def on_close(self, open_price: float, high: float, low: float, close: float, volume: float):
+        self.on_update(open_price, high, low, close, volume)
+
+        if self.period > 1:
+            if len(self.closes) == self.period - 1:
+                oldest_close = self.closes.popleft()
+                self.closes_sum -= oldest_close
+                self.squares_sum -= oldest_close*oldest_close
+
+            self.closes.append(close)
+            self.closes_sum += close
+            self.squares_sum += close*close
+
+#Lowest low and highest high over the last period candles (including the one in progress), kept in monotonic deques.
+#Value is (lowest low, highest high)
+class RollingMinMax(Indicator):
+    def __init__(self, period: int):
+        Indicator.__init__(self)
+        self.period = period
+        self.close_count = 0
+        self.lows = deque() #(candle number, low) with increasing lows
+        self.highs = deque() #(candle number, high) with decreasing highs
+
+    def on_update(self, open_price: float, high: float, low: float, close: float, volume: float):
+        lowest = min(self.lows[0][1], low) if self.lows else low
+        highest = max(self.highs[0][1], high) if self.highs else high
+        self.value = (lowest, highest)
+
+    def on_close(self, open_price: float, high: float, low: float, close: float, volume: float):
+        self.on_update(open_price, high, low, close, volume)
+
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+
+        self.lows.append((self.close_count, low))
+        self.highs.append((self.close_count, high))
+        self.close_count += 1
+
+        #Closed candles older than period - 1 fall out of the window once the next candle opens
+        oldest = self.close_count - (self.period - 1)
+
+        while self.lows and self.lows[0][0] < oldest:
+            self.lows.popleft()
+
+        while self.highs and self.highs[0][0] < oldest:
+            self.highs.popleft()
+
+    def get_min(self)->float:
+        if self.value:
+            return self.value[0]
+
+    def get_max(self)->float:
+        if self.value:
+            return self.value[1]
@@ -0,0 +1,146 @@
+import json
+from typing import Any
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#Pluggable JSON decoding for the websocket and RPC hot paths: orjson or msgspec when installed, stdlib json otherwise.
+#Every decoder returns plain dicts/lists so callers do not depend on which backend is active.
+
+if orjson:
+    loads = orjson.loads
+    decoder_name = "orjson"
+elif msgspec:
+    loads = msgspec.json.decode
+    decoder_name = "msgspec"
+else:
+    loads = json.loads
+    decoder_name = "json"
+
+if msgspec:
+    #Typed structs only declare the fields this bot reads; msgspec skips everything else without allocating it
+
+    class AccountContext(msgspec.Struct, kw_only=True):
+        slot: int = 0
+
+    class AccountValue(msgspec.Struct, kw_only=True):
+        lamports: int = 0
+        owner: str = ''
+        data: list[str] | dict[str, Any] | None = None
+
+    class AccountResult(msgspec.Struct, kw_only=True):
+        context: AccountContext
+        value: AccountValue | None = None
+
+    class AccountNotificationParams(msgspec.Struct, kw_only=True):
+        subscription: int
+        result: AccountResult
+
+    class AccountMessage(msgspec.Struct, kw_only=True):
+        id: int | None = None
+        result: int | bool | None = None
+        error: Any = None
+        params: AccountNotificationParams | None = None
+
+    class ParsedAccountKey(msgspec.Struct, kw_only=True):
+        pubkey: str
+        signer: bool = False
+        writable: bool = False
+
+    class UiTokenAmount(msgspec.Struct, kw_only=True):
+        uiAmount: float | None = None
+        amount: str = '0'
+        decimals: int = 0
+
+    class TokenBalance(msgspec.Struct, kw_only=True):
+        accountIndex: int
+        mint: str
+        owner: str | None = None
+        uiTokenAmount: UiTokenAmount
+
+    class TransactionMeta(msgspec.Struct, kw_only=True):
+        err: Any = None
+        fee: int = 0
+        preBalances: list[int] = []
+        postBalances: list[int] = []
+        preTokenBalances: list[TokenBalance] = []
+        postTokenBalances: list[TokenBalance] = []
+
+    class TransactionMessage(msgspec.Struct, kw_only=True):
+        accountKeys: list[ParsedAccountKey]
+
+    class Transaction(msgspec.Struct, kw_only=True):
+        signatures: list[str]
+        message: TransactionMessage
+
+    class TransactionResult(msgspec.Struct, kw_only=True):
+        slot: int = 0
+        blockTime: int | None = None
+        transaction: Transaction
+        meta: TransactionMeta | None = None
+
+    class TransactionResponse(msgspec.Struct, kw_only=True):
+        jsonrpc: str = "2.0"
+        id: int | str | None = None
+        result: TransactionResult | None = None
+        error: Any = None
+
+    account_message_decoder = msgspec.json.Decoder(AccountMessage)
+    transaction_response_decoder = msgspec.json.Decoder(TransactionResponse | list[TransactionResponse])
+
+    def _response_to_builtins(response: TransactionResponse)->dict:
+        ret_val = {'jsonrpc': response.jsonrpc, 'id': response.id}
+
+        if response.error:
+            ret_val['error'] = response.error
+        else:
+            ret_val['result'] = msgspec.to_builtins(response.result)
+
+        return ret_val
+
+    def decode_account_message(data: str | bytes)->dict:
+        """
+        Decodes an accountSubscribe websocket frame (notification, subscription confirmation or error reply)
+        into the same dict layout as the node's JSON, limited to the fields declared above.
+        """
+        message = account_message_decoder.decode(data)
+        params = message.params
+
+        if params:
+            value = params.result.value
+            value_dict = {'lamports': value.lamports, 'owner': value.owner, 'data': value.data} if value else None
+
+            return {'params': {'subscription': params.subscription,
+                               'result': {'context': {'slot': params.result.context.slot}, 'value': value_dict}}}
+        elif message.error is not None:
+            return {'id': message.id, 'error': message.error}
+        else:
+            return {'id': message.id, 'result': message.result}
+
+    def decode_transaction_response(data: str | bytes)->dict | list[dict]:
+        """
+        Decodes a getTransaction (jsonParsed) JSON-RPC response, or a batch of them, keeping only
+        the fields SolanaRpcApi.parse_swap_transaction needs.
+        """
+        response = transaction_response_decoder.decode(data)
+
+        if isinstance(response, list):
+            return [_response_to_builtins(item) for item in response]
+        else:
+            return _response_to_builtins(response)
+else:
+    decode_account_message = loads
+    decode_transaction_response = loads
+
+def dumps(data)->str:
+    if orjson:
+        return orjson.dumps(data).decode('utf-8')
+    else:
+        return json.dumps(data)
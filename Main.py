@@ -1,6 +1,6 @@
 from utility import get_time_greeting, get_random_quote,get_fear_greed_index,get_bitcoin_dominance
-from config.config import sol_buy_amount, slippage, priority_fee, profit_limit, stop_loss
-from config.setup import http_uri, wss_uri, keys_hash, wallet_address
+from config.config import sol_buy_amount, slippage, priority_fee, profit_limit, stop_loss, CANDLES_STORE_DIR
+from config.setup import http_uri, http_uris, wss_uri, keys_hash, wallet_address
 from utils.ui import clear_terminal, print_startup_banner, print_dashboard_header, print_quote_of_the_day, print_fear_greed_index,print_initial_sol_price,print_wallet_balance,should_clear_terminal,print_separator
 from utils.wallet import update_and_print_token_holdings
 from utils.market import update_sol_price, update_fear_greed_index
@@ -31,12 +31,13 @@ async def main():
 
     if keys_hash:
         print(Fore.MAGENTA + "✓ Keys hash is available")
-        solana_rpc_api = SolanaRpcApi(http_uri, wss_uri, http_uri, wallet_address)
+        solana_rpc_api = SolanaRpcApi(http_uri, wss_uri, http_uri, wallet_address, rpc_uris=http_uris)
         print(Fore.BLUE + "✓ Connected to Solana RPC")
         
         # ✅ Initialize MarketManager BEFORE using it
-        market_manager = MarketManager(solana_rpc_api)
+        market_manager = MarketManager(solana_rpc_api, candles_store_dir=CANDLES_STORE_DIR)
         trades_manager = TradesManager(keys_hash, solana_rpc_api, market_manager)
+        trades_manager.prepare_token_accounts(solana_rpc_api.get_non_zero_token_accounts())
 
         # Print initial welcome messages
         # Separator
@@ -179,6 +180,12 @@ async def main():
             # Close any open connections or resources
             if 'solana_rpc_api' in locals():
                 await solana_rpc_api.close()
+
+            if 'trades_manager' in locals():
+                trades_manager.close()
+
+            if 'market_manager' in locals():
+                market_manager.close()
             
             # Force exit the event loop
             current_loop = asyncio.get_event_loop()
@@ -3,18 +3,24 @@ from TradingDTOs import *
 from SolanaRpcApi import SolanaRpcApi
 from RaydiumTokensMonitor import RaydiumTokensMonitor
 from Candlesticks import *
+from CandlestickStore import CandlestickStore
 import TokensApi as TokensApi
+import QuoteEngine
 import Globals as globals
 import time
 
 #Manage Tokem Market Activities
 class MarketManager(AbstractMarketManager):
-    def __init__(self, solana_rpc_api: SolanaRpcApi):
-        self.ray_pool_monitor = RaydiumTokensMonitor(solana_rpc_api)
+    def __init__(self, solana_rpc_api: SolanaRpcApi, subscribe_sol_vault = False, compact_encoding = False, connection_count = 1,
+                 derive_chart_intervals = False, candles_store_dir: str = None):
+        self.ray_pool_monitor = RaydiumTokensMonitor(solana_rpc_api, subscribe_sol_vault=subscribe_sol_vault,
+                                                     compact_encoding=compact_encoding, connection_count=connection_count)
 
         self.solana_rpc_api = solana_rpc_api
         self.default_chart_intervals = [1, 60] #Keep 1-second, 1-minute  candlesticks; adjust as required
+        self.derive_chart_intervals = derive_chart_intervals #Roll larger intervals up from the 1-second candles
         self.candlesticks : dict[str, Candlesticks]= {}
+        self.candlestick_store = CandlestickStore(candles_store_dir) if candles_store_dir else None #Persist closed candles for warm restarts
 
         self.ray_pool_monitor.start()
         pub.subscribe(topicName=globals.topic_token_update_event, listener=self._handle_token_update)
@@ -38,9 +44,16 @@ class MarketManager(AbstractMarketManager):
 
             return lp_data.price
     
+    def get_quote(self, token_address: str, order_type: Order_Type, amount: Amount, slippage: Amount)->SwapQuote:
+        """Local quote from the monitored pool reserves; None if the token is not monitored yet."""
+        token_info = self.ray_pool_monitor.get_token_info(token_address)
+
+        if token_info:
+            return QuoteEngine.get_quote(token_info, order_type, amount.ToUiValue(), slippage.ToUiValue())
+    
     def get_swap_info(self, tx_signature: str, signer_pubkey: str, maxtries: int):
         for i in range(maxtries):
-            transaction = self.solana_rpc_api.get_transaction(tx_signature)
+            transaction = self.solana_rpc_api.get_transaction(tx_signature, hedged=True)
 
             if transaction:
                 transaction_info = self.solana_rpc_api.parse_swap_transaction(signer_pubkey, transaction)
@@ -49,22 +62,53 @@ class MarketManager(AbstractMarketManager):
             else:
                 time.sleep(1)
 
-    def get_candlesticks(self, token_address: str, interval: int)->list[Candlestick]:
+    def get_candlesticks(self, token_address: str, interval: int)->CandlestickSeries:
+        if token_address in self.candlesticks:
+            return self.candlesticks[token_address].get_candlesticks(interval)
+
+    def add_indicator(self, token_address: str, interval: int, indicator):
+        """Attaches an Indicators.Indicator to a monitored token's candles for a configured interval."""
+        if token_address in self.candlesticks:
+            candlestick_builder = self.candlesticks[token_address].get_candlestick_builder(interval)
+
+            if candlestick_builder:
+                return candlestick_builder.add_indicator(indicator)
+
+    def get_candlesticks_range(self, token_address: str, interval: int, start_time: datetime, end_time: datetime)->CandlestickSeries:
         if token_address in self.candlesticks:
-            return self.candlesticks[token_address].get_candlestick_builder(interval).get_all()
+            return self.candlesticks[token_address].get_candlesticks(interval).get_range(start_time, end_time)
         
     def monitor_token(self, token_address: str):
         if token_address not in self.candlesticks:
-            self.candlesticks[token_address] = Candlesticks(intervals=self.default_chart_intervals)
+            self.candlesticks[token_address] = Candlesticks(intervals=self.default_chart_intervals, derive_from_base=self.derive_chart_intervals,
+                                                            store=self.candlestick_store, token_address=token_address)
 
         self.ray_pool_monitor.monitor_token(token_address)
 
     def _handle_token_update(self, arg1: str):
-        new_price = self.get_price(arg1)
-        self.candlesticks[arg1].update(datetime.now(), new_price)
+        candlesticks = self.candlesticks[arg1]
+        token_info = self.ray_pool_monitor.get_token_info(arg1)
+
+        if token_info and token_info.trades:
+            trades = token_info.trades
+
+            #Drain trades queued by the monitor; each one is a price tick carrying its traded amounts
+            while trades:
+                trade = trades.popleft()
+                candlesticks.update(trade.timestamp, trade.price, trade.base_amount, trade.quote_amount, trade.is_buy, trade.trade_count)
+        else:
+            new_price = self.get_price(arg1)
+            candlesticks.update(datetime.now(), new_price)
         #new_price_string = f"{new_price:.20f}"
         #print(arg1 + " was updated! Price: " + new_price_string)
 
     def get_sol_balance(self, wallet_address):
         sol_balance = self.solana_rpc_api.get_account_balance(wallet_address)  
-        return sol_balance / 1_000_000_000
\ No newline at end of file
+        return sol_balance / 1_000_000_000
+
+    def close(self):
+        """Closes the pool monitor's RPC session, then unmaps and closes the candle history files."""
+        self.ray_pool_monitor.close()
+
+        if self.candlestick_store:
+            self.candlestick_store.close()
\ No newline at end of file
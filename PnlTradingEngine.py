@@ -3,10 +3,16 @@ from TradingDTOs import *
 from pubsub import pub
 import threading
 import Globals as globals
+from StrategyScheduler import StrategyScheduler, get_default_scheduler
+from TriggerBook import TriggerBook, PriceTrigger
+from collections import deque
+from concurrent.futures import Future
 import asyncio
 
+c_trailing_candle_interval = 1 #Candles whose highs move trailing stops
+
 class PnlTradingEngine(threading.Thread):
-    def __init__(self, token_info: TokenInfo, order_executor: OrderExecutor, initial_order: OrderWithLimitsStops):
+    def __init__(self, token_info: TokenInfo, order_executor: OrderExecutor, initial_order: OrderWithLimitsStops, scheduler: StrategyScheduler = None):
         threading.Thread.__init__(self)
         self.state = StrategyState.PENDING
         self.token_info = token_info
@@ -14,75 +20,133 @@ class PnlTradingEngine(threading.Thread):
         self.priority_fee = initial_order.priority_fee
         self.initial_order = initial_order
         self.order_executor = order_executor      
-        self.limit_order_trigger : TriggerPrice = None
-        self.stop_loss_trigger : TriggerPrice  = None
+        self.scheduler = scheduler if scheduler else get_default_scheduler()
+        self.triggers : list[PriceTrigger] = [] #Armed levels; each trigger's data is its PnlOption
+        self.fired_triggers : deque[PriceTrigger] = deque()
+        shared_trigger_book = order_executor.get_trigger_book(token_info.token_address)
+        self.trigger_book = shared_trigger_book if shared_trigger_book else TriggerBook()
+        self.owns_trigger_book = shared_trigger_book is None #A private book is checked against this engine's own price updates
         self.current_tokens = initial_order.amount.ToUiValue()
+        self.pending_sell : tuple[PriceTrigger, float, Future] = None #(trigger, sell amount, future) of the sell in flight
         self.max_slippage = Amount.percent_ui(100)
         self.updates_lock = threading.Lock()
-        self.unprocessed_event_counter = 0
     
     def run(self):        
-        self._init_strategy(self.initial_order.base_token_price, self.initial_order.amount)
-
-    def _get_triggered_sell_amount(self, price: float):
-        sell_amount = 0
-        
-        if self.limit_order_trigger and price >= self.limit_order_trigger.target_price.ToUiValue():
-            sell_amount = self.limit_order_trigger.in_sell_amount.ToUiValue()
-            print(f"Limit Order triggered")
-        elif self.stop_loss_trigger and price <= self.stop_loss_trigger.target_price.ToUiValue(): 
-            sell_amount = self.stop_loss_trigger.in_sell_amount.ToUiValue()
-            print(f"Stop Loss Order triggered")
-
-        return sell_amount
+        self._init_strategy(self.initial_order.base_token_price)
+
+    def on_trigger(self, trigger: PriceTrigger):
+        """Called by the owner of a shared trigger book when one of this engine's levels is crossed."""
+        self.fired_triggers.append(trigger)
+        self.scheduler.schedule(self)
     
     @staticmethod
-    def get_trigger_price(pnl_option: PnlOption, base_token_price: Amount, tokens_amount: Amount):
+    def get_trigger_price(pnl_option: PnlOption, base_token_price: Amount)->Amount:
         pnl_percent = pnl_option.trigger_at_percent.ToUiValue()/100
-        allocation_percent = pnl_option.allocation_percent.ToUiValue()/100
-        allocated_amount = Amount.tokens_ui(tokens_amount.ToUiValue()*allocation_percent, tokens_amount.GetScalar())            
-        target_price = Amount.sol_ui(base_token_price.ToUiValue()*(1+pnl_percent))
-        
-        return TriggerPrice(allocated_amount, target_price)
+
+        return Amount.sol_ui(base_token_price.ToUiValue()*(1+pnl_percent))
     
-    def _init_strategy(self, base_token_price: Amount, tokens_amount: Amount):
-        if len(self.initial_order.limits) > 0:
-            self.limit_order_trigger = self.get_trigger_price(self.initial_order.limits[0], base_token_price, tokens_amount)
-            print(f"Price={self.limit_order_trigger.target_price.ToUiValue()} Limit Order")
-          
-        if len(self.initial_order.stop_losses) > 0:
-            self.stop_loss_trigger = self.get_trigger_price(self.initial_order.stop_losses[0], base_token_price, tokens_amount)
-            print(f"Price={self.stop_loss_trigger.target_price.ToUiValue()} Stop Loss Order")
+    def _init_strategy(self, base_token_price: Amount):
+        #Arm the whole ladder; each level sells its allocation of whatever is still held when it fills
+        #The list decides the side, so a stop above the entry price (e.g. a break-even stop) is still a stop
+        for pnl_option, is_limit in [(limit, True) for limit in self.initial_order.limits] + [(stop, False) for stop in self.initial_order.stop_losses]:
+            target_price = self.get_trigger_price(pnl_option, base_token_price)
+            trail_percent = pnl_option.trigger_at_percent.ToUiValue()/100 if pnl_option.trailing and not is_limit else None
+            trigger = PriceTrigger(self, target_price.ToUiValue(), is_limit, pnl_option, trail_percent)
+            self.triggers.append(trigger)
+            self.trigger_book.add(trigger)
+            print(f"Price={trigger.target_price} " + ("Limit Order" if is_limit else "Trailing Stop Loss Order" if trail_percent else "Stop Loss Order"))
 
-        pub.subscribe(topicName=globals.topic_token_update_event, listener=self._handle_update)
+        if self.owns_trigger_book:
+            pub.subscribe(topicName=globals.topic_token_update_event, listener=self._handle_update)
 
     def _process_event_task(self):
-        if self.updates_lock.acquire(blocking=False):
-            new_price = self.order_executor.get_market_manager().get_price(self.token_info.token_address)
-            sell_amount = self._get_triggered_sell_amount(new_price)
+        #The scheduler already serializes runs; the lock covers direct calls
+        with self.updates_lock:
+            if self.state == StrategyState.COMPLETE:
+                return
 
-            if sell_amount > 0:
-                sell_amount = Amount.tokens_ui(min(sell_amount, self.current_tokens), self.token_info.decimals_scale_factor)
-                new_order = Order(Order_Type.SELL, self.token_info.token_address, sell_amount, self.max_slippage, self.priority_fee)
+            if self.owns_trigger_book:
+                market_manager = self.order_executor.get_market_manager()
+                new_price = market_manager.get_price(self.token_info.token_address)
+                candles = market_manager.get_candlesticks(self.token_info.token_address, c_trailing_candle_interval)
+                high_price = candles[-1].high if candles else None
+                self.fired_triggers.extend(self.trigger_book.update(new_price, high_price))
 
-                tx_signature = self.order_executor.execute_order(new_order, True)
+            if self.pending_sell and self.pending_sell[2].done():
+                self._finish_sell()
 
-                if tx_signature:
-                    self.current_tokens -= sell_amount.ToUiValue() #Assumes all tokens sold
-                    
-                    if self.current_tokens <= 0:
-                        self.state = StrategyState.COMPLETE  
-                        pub.unsubscribe(topicName=globals.topic_token_update_event, listener=self._handle_update)
+            #One sell at a time; levels that fire meanwhile wait in fired_triggers
+            while self.fired_triggers and self.state != StrategyState.COMPLETE and self.pending_sell is None:
+                self._execute_trigger(self.fired_triggers.popleft())
 
-            self.updates_lock.release()
+    def _execute_trigger(self, trigger: PriceTrigger):
+        print("Limit Order triggered" if trigger.is_limit else "Stop Loss Order triggered")
+        pnl_option : PnlOption = trigger.data
+        allocation_percent = min(pnl_option.allocation_percent.ToUiValue()/100, 1)
+        sell_amount = Amount.tokens_ui(self.current_tokens*allocation_percent, self.token_info.decimals_scale_factor)
+        new_order = Order(Order_Type.SELL, self.token_info.token_address, sell_amount, self.max_slippage, self.priority_fee)
 
-            if self.state != StrategyState.COMPLETE and self.unprocessed_event_counter > 0:
-                self._process_event_task()
-                self.unprocessed_event_counter = 0
+        #The swap blocks until confirmed, so it runs on the order executor's threads rather than a strategy worker
+        future = self.order_executor.run_order_task(self._sell, new_order)
+        self.pending_sell = (trigger, sell_amount.ToUiValue(), future)
+
+        if future.done():
+            self._finish_sell()
         else:
-            self.unprocessed_event_counter += 1        
+            future.add_done_callback(lambda future: self.scheduler.schedule(self))
+
+    def _sell(self, order: Order)->tuple[str, float]:
+        """Returns the signature, and the token balance if one was observed after the sell landed."""
+        tx_signature = self.order_executor.execute_order(order, True)
+
+        return tx_signature, self._get_token_balance_after(tx_signature) if tx_signature else None
+
+    def _finish_sell(self):
+        trigger, sell_amount, future = self.pending_sell
+        self.pending_sell = None
+
+        try:
+            tx_signature, token_balance = future.result()
+        except Exception as e:
+            tx_signature, token_balance = None, None
+
+        if tx_signature:
+            self.triggers.remove(trigger)
+            self.current_tokens -= sell_amount
+
+            if token_balance is not None:
+                self.current_tokens = min(self.current_tokens, token_balance)
+            
+            #With allocations below 100% the last level can fire with tokens left; nothing would ever sell them
+            if self.current_tokens <= 0 or not self.triggers:
+                self._complete()
+        else:
+            #Re-arm so the next tick beyond the level retries the sell
+            self.trigger_book.add(trigger)
+
+    def _get_token_balance_after(self, tx_signature: str)->float:
+        """The wallet's token balance, or None unless it was observed at or after the slot the order landed in."""
+        token_address = self.token_info.token_address
+        order_slot = self.order_executor.get_order_slot(tx_signature)
+        token_balance = self.order_executor.get_account_balance(token_address)
+        balance_slot = self.order_executor.get_account_balance_slot(token_address)
+
+        #Account state at a slot already includes that slot's transactions
+        if token_balance is not None and order_slot is not None and balance_slot is not None and balance_slot >= order_slot:
+            return token_balance.ToUiValue()
+
+    def _complete(self):
+        self.state = StrategyState.COMPLETE
+
+        if self.owns_trigger_book:
+            pub.unsubscribe(topicName=globals.topic_token_update_event, listener=self._handle_update)
+        else:
+            #Take the remaining levels out of the shared book; a private book goes away with the engine
+            for trigger in self.triggers:
+                self.trigger_book.remove(trigger)
+
+            self.triggers = []
 
     def _handle_update(self, arg1: str):
         if self.state != StrategyState.COMPLETE and arg1 == self.token_info.token_address:
-            process_thread = threading.Timer(0, self._process_event_task)
-            process_thread.start()
\ No newline at end of file
+            self.scheduler.schedule(self)
\ No newline at end of file
@@ -0,0 +1,47 @@
+from solders.pubkey import Pubkey
+from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID
+import functools
+
+c_pubkey_cache_size = 4096
+c_associated_token_cache_size = 4096
+
+#Bounded LRU caches for base58 parsing and associated token account derivation. find_program_address hashes
+#candidate bump seeds until one falls off the curve, so each (owner, mint, program) is derived once while in use.
+
+@functools.lru_cache(maxsize=c_pubkey_cache_size)
+def get_pubkey(address: str)->Pubkey:
+    return Pubkey.from_string(address)
+
+@functools.lru_cache(maxsize=c_associated_token_cache_size)
+def _find_associated_token_address(owner: Pubkey, mint: Pubkey, program_id: Pubkey)->Pubkey:
+    return Pubkey.find_program_address([bytes(owner), bytes(program_id), bytes(mint)], ASSOCIATED_TOKEN_PROGRAM_ID)[0]
+
+def get_associated_token_address(owner: Pubkey | str, mint: Pubkey | str, program_id: Pubkey = TOKEN_PROGRAM_ID)->Pubkey:
+    """owner and mint may be Pubkeys or base58 strings."""
+    if isinstance(owner, str):
+        owner = get_pubkey(owner)
+
+    if isinstance(mint, str):
+        mint = get_pubkey(mint)
+
+    return _find_associated_token_address(owner, mint, program_id)
+
+def get_associated_token_addresses(owner: Pubkey | str, mints: list[str], program_id: Pubkey = TOKEN_PROGRAM_ID)->dict[str, Pubkey]:
+    """Derives (and caches) the owner's associated token account for every mint. Key=mint"""
+    if isinstance(owner, str):
+        owner = get_pubkey(owner)
+
+    return {mint: get_associated_token_address(owner, mint, program_id) for mint in mints}
+
+def get_stats()->dict[str, float]:
+    stats = {}
+
+    for name, cached_function in [('pubkey', get_pubkey), ('associated_token', _find_associated_token_address)]:
+        cache_info = cached_function.cache_info()
+        lookups = cache_info.hits + cache_info.misses
+        stats[name + '_hits'] = cache_info.hits
+        stats[name + '_misses'] = cache_info.misses
+        stats[name + '_size'] = cache_info.currsize
+        stats[name + '_hit_rate'] = cache_info.hits/lookups if lookups else 0
+
+    return stats
@@ -0,0 +1,40 @@
+from TradingDTOs import *
+
+#Constant product (x*y=k) quotes from a pool's cached vault reserves, matching Raydium AMM v4 swap_base_in:
+#the fee is taken from the input, and the rest trades against the reserves.
+
+def get_amount_out(amount_in: float, reserve_in: float, reserve_out: float, fee_rate: float)->float:
+    amount_in_after_fee = amount_in*(1 - fee_rate)
+
+    return reserve_out*amount_in_after_fee/(reserve_in + amount_in_after_fee)
+
+def get_quote(token_info: TokenInfo, order_type: Order_Type, amount_in: float, slippage_percent: float)->SwapQuote:
+    """
+    Quotes swapping amount_in (ui units: SOL for a BUY, tokens for a SELL) against the pool's current reserves.
+    Returns None until both reserves are known.
+    """
+    token_reserve = token_info.token_vault_ui_amount
+    sol_reserve = token_info.sol_vault_ui_amount
+
+    if token_reserve <= 0 or sol_reserve <= 0 or amount_in <= 0:
+        return None
+
+    if order_type == Order_Type.BUY:
+        reserve_in, reserve_out = sol_reserve, token_reserve
+    else:
+        reserve_in, reserve_out = token_reserve, sol_reserve
+
+    out_amount = get_amount_out(amount_in, reserve_in, reserve_out, token_info.fee_rate)
+    spot_price = sol_reserve/token_reserve
+
+    if order_type == Order_Type.BUY:
+        execution_price = amount_in/out_amount
+        price_impact = execution_price/spot_price - 1
+    else:
+        execution_price = out_amount/amount_in
+        price_impact = 1 - execution_price/spot_price
+
+    minimum_out = out_amount*(1 - slippage_percent/100)
+
+    return SwapQuote(token_info.token_address, order_type, amount_in, out_amount, minimum_out, amount_in*token_info.fee_rate,
+                     spot_price, execution_price, price_impact*100)
@@ -0,0 +1,193 @@
+from TradingDTOs import TokenInfo
+from solders.pubkey import Pubkey
+from solders.keypair import Keypair
+from solders.hash import Hash
+from solders.instruction import Instruction, AccountMeta
+from solders.message import MessageV0
+from solders.transaction import VersionedTransaction
+from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID, WRAPPED_SOL_MINT
+import PubkeyCache
+import struct
+
+c_raydium_amm_v4_program_id = Pubkey.from_string("675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8")
+c_compute_budget_program_id = Pubkey.from_string("ComputeBudget111111111111111111111111111111")
+c_system_program_id = Pubkey.from_string("11111111111111111111111111111111")
+c_default_compute_unit_limit = 150_000
+
+#Instruction tags
+c_swap_base_in_instruction = 9 #Raydium AMM v4
+c_set_compute_unit_limit_instruction = 2
+c_set_compute_unit_price_instruction = 3
+c_system_transfer_instruction = 2
+c_token_close_account_instruction = 9
+c_token_sync_native_instruction = 17
+c_create_ata_idempotent_instruction = 1
+
+#Raydium AMM v4 pool accounts, from the Raydium v3 API pools/key/ids response
+class RaydiumPoolKeys:
+    def __init__(self, pool_keys: dict):
+        self.amm_id = Pubkey.from_string(pool_keys['id'])
+        self.authority = Pubkey.from_string(pool_keys['authority'])
+        self.open_orders = Pubkey.from_string(pool_keys['openOrders'])
+        self.target_orders = Pubkey.from_string(pool_keys['targetOrders'])
+        self.coin_vault = Pubkey.from_string(pool_keys['vault']['A'])
+        self.pc_vault = Pubkey.from_string(pool_keys['vault']['B'])
+        self.market_program_id = Pubkey.from_string(pool_keys['marketProgramId'])
+        self.market_id = Pubkey.from_string(pool_keys['marketId'])
+        self.market_bids = Pubkey.from_string(pool_keys['marketBids'])
+        self.market_asks = Pubkey.from_string(pool_keys['marketAsks'])
+        self.market_event_queue = Pubkey.from_string(pool_keys['marketEventQueue'])
+        self.market_base_vault = Pubkey.from_string(pool_keys['marketBaseVault'])
+        self.market_quote_vault = Pubkey.from_string(pool_keys['marketQuoteVault'])
+        self.market_authority = Pubkey.from_string(pool_keys['marketAuthority'])
+
+    @staticmethod
+    def is_amm_v4(pool_keys: dict)->bool:
+        return pool_keys is not None and pool_keys.get('programId', None) == str(c_raydium_amm_v4_program_id) and 'marketId' in pool_keys
+
+#Everything about a token's swaps that does not depend on the amount: pool keys, the signer's associated accounts
+#and the fixed instructions. Only the swap, the SOL transfer and the fee price are built when an order fires.
+class OrderTemplate:
+    def __init__(self, pool_keys: RaydiumPoolKeys, owner: Pubkey, token_mint: Pubkey, compute_unit_limit: int):
+        self.pool_keys = pool_keys
+        self.owner = owner
+        self.token_account = RaydiumSwapBuilder.get_associated_token_address(owner, token_mint)
+        self.wsol_account = RaydiumSwapBuilder.get_associated_token_address(owner, WRAPPED_SOL_MINT)
+        self.compute_unit_limit = compute_unit_limit
+        self.compute_unit_limit_instruction = RaydiumSwapBuilder.get_compute_unit_limit_instruction(compute_unit_limit)
+        self.compute_unit_price_instructions : dict[int, Instruction] = {} #Key=micro lamports per compute unit
+        self.create_accounts_instructions = [RaydiumSwapBuilder.get_create_ata_idempotent_instruction(owner, owner, WRAPPED_SOL_MINT, self.wsol_account),
+                                             RaydiumSwapBuilder.get_create_ata_idempotent_instruction(owner, owner, token_mint, self.token_account)]
+        self.sync_native_instruction = RaydiumSwapBuilder.get_sync_native_instruction(self.wsol_account)
+        self.close_wsol_instruction = RaydiumSwapBuilder.get_close_account_instruction(self.wsol_account, owner, owner)
+
+    def get_compute_unit_price_instruction(self, priority_fee: int)->Instruction:
+        micro_lamports = priority_fee*1_000_000//self.compute_unit_limit
+
+        if micro_lamports not in self.compute_unit_price_instructions:
+            self.compute_unit_price_instructions[micro_lamports] = RaydiumSwapBuilder.get_compute_unit_price_instruction(micro_lamports)
+
+        return self.compute_unit_price_instructions[micro_lamports]
+
+    def get_instructions(self, is_buy: bool, amount_in: int, minimum_out: int, priority_fee: int)->list[Instruction]:
+        instructions = [self.compute_unit_limit_instruction, self.get_compute_unit_price_instruction(priority_fee)] + self.create_accounts_instructions
+
+        if is_buy:
+            instructions.append(RaydiumSwapBuilder.get_transfer_instruction(self.owner, self.wsol_account, amount_in))
+            instructions.append(self.sync_native_instruction)
+            instructions.append(RaydiumSwapBuilder.get_swap_base_in_instruction(self.pool_keys, self.wsol_account, self.token_account, self.owner,
+                                                                                 amount_in, minimum_out))
+        else:
+            instructions.append(RaydiumSwapBuilder.get_swap_base_in_instruction(self.pool_keys, self.token_account, self.wsol_account, self.owner,
+                                                                                 amount_in, minimum_out))
+
+        #Unwrap whatever SOL is left in the wrapped account back to the signer
+        instructions.append(self.close_wsol_instruction)
+
+        return instructions
+
+class RaydiumSwapBuilder:
+    """
+    Builds and signs Raydium AMM v4 swap_base_in transactions locally, so a swap needs no HTTP round trips before
+    it is broadcast. SOL legs go through the signer's wrapped SOL associated account, which is created, funded and
+    closed within the same transaction. Per-token order templates are prepared ahead of time (prepare_order_template).
+    """
+    def __init__(self, signer_wallet: Keypair, compute_unit_limit = c_default_compute_unit_limit):
+        self.signer_wallet = signer_wallet
+        self.signer_pubkey = signer_wallet.pubkey()
+        self.compute_unit_limit = compute_unit_limit
+        self.order_templates : dict[str, OrderTemplate] = {} #Key=token_address
+
+    def prepare_order_template(self, token_info: TokenInfo)->OrderTemplate:
+        """Cached template for the token's pool, or None if it is not an AMM v4 pool."""
+        if token_info.token_address not in self.order_templates:
+            if not RaydiumPoolKeys.is_amm_v4(token_info.pool_keys):
+                return None
+
+            self.order_templates[token_info.token_address] = OrderTemplate(RaydiumPoolKeys(token_info.pool_keys), self.signer_pubkey,
+                                                                           PubkeyCache.get_pubkey(token_info.token_address), self.compute_unit_limit)
+
+        return self.order_templates[token_info.token_address]
+
+    def get_pool_keys(self, token_info: TokenInfo)->RaydiumPoolKeys:
+        order_template = self.prepare_order_template(token_info)
+
+        if order_template:
+            return order_template.pool_keys
+
+    def build_swap_transaction(self, token_info: TokenInfo, is_buy: bool, amount_in: int, minimum_out: int, priority_fee: int,
+                               recent_blockhash: Hash)->VersionedTransaction:
+        """amount_in and minimum_out are raw amounts (lamports for SOL); priority_fee is the total fee in lamports."""
+        order_template = self.prepare_order_template(token_info)
+
+        if order_template is None:
+            return None
+
+        instructions = order_template.get_instructions(is_buy, amount_in, minimum_out, priority_fee)
+        message = MessageV0.try_compile(self.signer_pubkey, instructions, [], recent_blockhash)
+
+        return VersionedTransaction(message, [self.signer_wallet])
+
+    @staticmethod
+    def get_associated_token_address(owner: Pubkey, mint: Pubkey)->Pubkey:
+        return PubkeyCache.get_associated_token_address(owner, mint)
+
+    @staticmethod
+    def get_swap_base_in_instruction(pool_keys: RaydiumPoolKeys, source: Pubkey, destination: Pubkey, owner: Pubkey,
+                                     amount_in: int, minimum_out: int)->Instruction:
+        data = struct.pack('<BQQ', c_swap_base_in_instruction, amount_in, minimum_out)
+        accounts = [AccountMeta(TOKEN_PROGRAM_ID, False, False),
+                    AccountMeta(pool_keys.amm_id, False, True),
+                    AccountMeta(pool_keys.authority, False, False),
+                    AccountMeta(pool_keys.open_orders, False, True),
+                    AccountMeta(pool_keys.target_orders, False, True),
+                    AccountMeta(pool_keys.coin_vault, False, True),
+                    AccountMeta(pool_keys.pc_vault, False, True),
+                    AccountMeta(pool_keys.market_program_id, False, False),
+                    AccountMeta(pool_keys.market_id, False, True),
+                    AccountMeta(pool_keys.market_bids, False, True),
+                    AccountMeta(pool_keys.market_asks, False, True),
+                    AccountMeta(pool_keys.market_event_queue, False, True),
+                    AccountMeta(pool_keys.market_base_vault, False, True),
+                    AccountMeta(pool_keys.market_quote_vault, False, True),
+                    AccountMeta(pool_keys.market_authority, False, False),
+                    AccountMeta(source, False, True),
+                    AccountMeta(destination, False, True),
+                    AccountMeta(owner, True, False)]
+
+        return Instruction(c_raydium_amm_v4_program_id, data, accounts)
+
+    @staticmethod
+    def get_compute_unit_limit_instruction(units: int)->Instruction:
+        return Instruction(c_compute_budget_program_id, struct.pack('<BI', c_set_compute_unit_limit_instruction, units), [])
+
+    @staticmethod
+    def get_compute_unit_price_instruction(micro_lamports: int)->Instruction:
+        return Instruction(c_compute_budget_program_id, struct.pack('<BQ', c_set_compute_unit_price_instruction, micro_lamports), [])
+
+    @staticmethod
+    def get_create_ata_idempotent_instruction(payer: Pubkey, owner: Pubkey, mint: Pubkey, associated_account: Pubkey)->Instruction:
+        accounts = [AccountMeta(payer, True, True),
+                    AccountMeta(associated_account, False, True),
+                    AccountMeta(owner, False, False),
+                    AccountMeta(mint, False, False),
+                    AccountMeta(c_system_program_id, False, False),
+                    AccountMeta(TOKEN_PROGRAM_ID, False, False)]
+
+        return Instruction(ASSOCIATED_TOKEN_PROGRAM_ID, bytes([c_create_ata_idempotent_instruction]), accounts)
+
+    @staticmethod
+    def get_transfer_instruction(source: Pubkey, destination: Pubkey, lamports: int)->Instruction:
+        accounts = [AccountMeta(source, True, True), AccountMeta(destination, False, True)]
+
+        return Instruction(c_system_program_id, struct.pack('<IQ', c_system_transfer_instruction, lamports), accounts)
+
+    @staticmethod
+    def get_sync_native_instruction(account: Pubkey)->Instruction:
+        return Instruction(TOKEN_PROGRAM_ID, bytes([c_token_sync_native_instruction]), [AccountMeta(account, False, True)])
+
+    @staticmethod
+    def get_close_account_instruction(account: Pubkey, destination: Pubkey, owner: Pubkey)->Instruction:
+        accounts = [AccountMeta(account, False, True), AccountMeta(destination, False, True), AccountMeta(owner, True, False)]
+
+        return Instruction(TOKEN_PROGRAM_ID, bytes([c_token_close_account_instruction]), accounts)
@@ -1,127 +1,139 @@
-from pubsub import pub
 #from TokensApi import TokenInfo FIXME
-from TradingDTOs import TokenInfo
+from TradingDTOs import TokenInfo, TokenTrade
 from SolanaRpcApi import SolanaRpcApi
-import Globals as globals
+from AsyncSolanaRpcApi import AsyncSolanaRpcApi
+from AccountSubscriptionManager import AccountSubscriptionManager
+from TokenUpdateDispatcher import TokenUpdateDispatcher, c_default_worker_count
 import TokensApi as TokensApi
-import json
+import PubkeyCache
+from datetime import datetime
 import asyncio
 import threading
-import websockets
 
 class RaydiumTokensMonitor(threading.Thread):
-    def __init__(self, solana_rpc_api: SolanaRpcApi):
+    def __init__(self, solana_rpc_api: SolanaRpcApi, async_rpc_api: AsyncSolanaRpcApi = None, subscribe_sol_vault = False,
+                 compact_encoding = False, connection_count = 1, dispatcher_workers = c_default_worker_count):
         threading.Thread.__init__(self)
         self.token_infos = {}
-        self.updated_tokens = set()
+        self.updated_tokens = set() #Tokens whose vault changed since the last price refresh
+        self.last_reserves : dict[str, tuple[float, float]] = {} #Key=token address; Value=(token vault, SOL vault) at the last price update
         self.solana_rpc_api = solana_rpc_api
-        self.wsocket = None
-        self.write_queue = asyncio.Queue()  # Queue for outgoing messages
+        self.async_rpc_api = async_rpc_api if async_rpc_api else AsyncSolanaRpcApi.from_rpc_api(solana_rpc_api)
+        self.refresh_event = asyncio.Event() # Set whenever updated_tokens has pending work
+        self.subscribe_sol_vault = subscribe_sol_vault # Price from both cached reserves instead of a SOL vault RPC per update
+        self.compact_encoding = compact_encoding # Subscribe with base64 and decode amounts from raw account bytes
+        encoding = "base64" if compact_encoding else "jsonParsed"
+        #Subscriber keys are (token_address, is_sol_vault)
+        self.subscription_manager = AccountSubscriptionManager(solana_rpc_api.wss_uri, self._process, connection_count, encoding)
+        self.dispatcher = TokenUpdateDispatcher(worker_count=dispatcher_workers) #Publishes topic_token_update_event off the event loop
+        self.loop : asyncio.AbstractEventLoop = None
 
     def get_token_info(self, token_address):
-        if token_address in self.token_infos:
-            if token_address in self.updated_tokens:
-                self._update_price(token_address)
-
-                try:
-                    self.updated_tokens.remove(token_address)
-                except Exception as e:
-                    print(token_address + " already removed.")
-            
-            return self.token_infos[token_address]
-        else:
-            return None
+        return self.token_infos.get(token_address, None)
 
     def monitor_token(self, token_address: str):
-        if self.wsocket:
-            if token_address in self.token_infos:
-                token_info = self.token_infos[token_address]
-            else: 
-                token_info = TokensApi.get_amm_token_pool_data(token_address)
+        if token_address in self.token_infos:
+            token_info = self.token_infos[token_address]
+        else: 
+            token_info = TokensApi.get_amm_token_pool_data(token_address)
 
-                if token_info:
-                    self.token_infos[token_address] = token_info
-                else:
-                    return
-            
-            request = self.solana_rpc_api.get_account_subscribe_request(token_info.token_vault_address)
-            json_request = json.dumps(request)
+            if token_info:
+                self.token_infos[token_address] = token_info
+            else:
+                return
+        
+        self.subscription_manager.subscribe((token_address, False), token_info.token_vault_address)
 
-            self.write_queue.put_nowait(json_request)
+        if self.subscribe_sol_vault:
+            self.subscription_manager.subscribe((token_address, True), token_info.sol_vault_address)
 
     async def _init_event_loop(self):
-       await asyncio.gather(self._send_requests(), self._read_socket())
+       self.loop = asyncio.get_running_loop()
+       await asyncio.gather(self.subscription_manager.run(), self._refresh_prices())
+
+    def close(self):
+        """Thread safe. Closes the RPC session used for price refreshes."""
+        self.async_rpc_api.close_threadsafe(self.loop)
 
     def run(self):        
+        self.dispatcher.start()
         asyncio.run(self._init_event_loop())
 
-    def _update_price(self, token_address: str):
-        if token_address in self.token_infos:
-            sol_vault_address = self.token_infos[token_address].sol_vault_address
-            sol_balance = self.solana_rpc_api.get_account_balance(sol_vault_address)
-            token_info = self.token_infos[token_address]
-            
-            if sol_balance and token_info.token_vault_ui_amount > 0:
-                sol_balance /= 1e9
-            
-                token_info.price = sol_balance/token_info.token_vault_ui_amount
-
-    async def _send_requests(self):
-       while True:
-            try:        
-                request = await self.write_queue.get()
-
-                if request:
-                    await self.wsocket.send(request)
-            except Exception as e:
-                print("Error " + str(e))
-
-    async def _read_socket(self):
+    async def _refresh_prices(self):
         while True:
-            try:               
-                async with websockets.connect(self.solana_rpc_api.wss_uri) as websocket:
-                    self.wsocket = websocket  
-  
-                    token_addresses = list(self.token_infos.keys())
-
-                    for token_address in token_addresses:
-                        self.monitor_token(token_address)
-
-                    try:
-                        while True:
-                            received = await websocket.recv()
-                            jsonData = json.loads(received)
-                            self._process(jsonData)
-                    except TimeoutError as e:
-                        print(str(e))
-            except Exception as e:
-                print("Error " + str(e))
+            await self.refresh_event.wait()
+            self.refresh_event.clear()
 
-    def _process(self, data: dict):
-        params = data.get('params', None)
-        
-        if params:
-            parsed_info = params['result']['value']['data']['parsed']['info']
+            #Take every token that changed since the last pass; updates arriving meanwhile queue up for the next one
+            dirty_tokens = [token_address for token_address in self.updated_tokens if token_address in self.token_infos]
+            self.updated_tokens = set()
 
-            token_address = parsed_info['mint']
-            token_ui_amount = parsed_info['tokenAmount']['uiAmount']
+            try:
+                sol_vault_addresses = [self.token_infos[token_address].sol_vault_address for token_address in dirty_tokens]
+                sol_balances = await self.async_rpc_api.get_multiple_account_balances(sol_vault_addresses)
+            except Exception as e:
+                print("Error refreshing prices " + str(e))
+                self.updated_tokens.update(dirty_tokens) #Retry on the next pass
+                continue
 
-            token_info = self.token_infos[token_address]
+            for token_address, sol_balance in zip(dirty_tokens, sol_balances):
+                token_info = self.token_infos[token_address]
 
-            token_info.token_vault_ui_amount = token_ui_amount
+                if sol_balance and token_info.token_vault_ui_amount > 0:
+                    token_info.sol_vault_ui_amount = sol_balance/1e9
+                    token_info.price = token_info.sol_vault_ui_amount/token_info.token_vault_ui_amount
+                    self._record_trade(token_info)
 
-            self.updated_tokens.add(token_address)
+            for token_address in dirty_tokens:
+                self.dispatcher.submit(token_address)
 
-            pub.sendMessage(topicName=globals.topic_token_update_event, arg1=token_address)
-            
-            
+    def _process(self, key: tuple[str, bool], result: dict):
+        token_address, is_sol_vault = key
+        token_info = self.token_infos[token_address]
+        account_data = result['value']['data']
 
+        if self.compact_encoding:
+            mint_bytes, raw_amount = SolanaRpcApi.decode_token_account(account_data[0])
+            expected_mint = token_info.sol_address if is_sol_vault else token_address
 
+            #A vault holding another mint means the pool's vaults were mapped to the wrong sides; never price from it
+            if mint_bytes != bytes(PubkeyCache.get_pubkey(expected_mint)):
+                print(f"Error: vault update for {token_address} holds an unexpected mint")
+                return
 
+            token_ui_amount = raw_amount/(1e9 if is_sol_vault else token_info.decimals_scale_factor)
+        else:
+            token_ui_amount = account_data['parsed']['info']['tokenAmount']['uiAmount']
+
+        if is_sol_vault:
+            token_info.sol_vault_ui_amount = token_ui_amount
+        else:
+            token_info.token_vault_ui_amount = token_ui_amount
 
+        if self.subscribe_sol_vault:
+            if token_info.sol_vault_ui_amount > 0 and token_info.token_vault_ui_amount > 0:
+                token_info.price = token_info.sol_vault_ui_amount/token_info.token_vault_ui_amount
+                self._record_trade(token_info)
 
+                self.dispatcher.submit(token_address)
+        else:
+            self.updated_tokens.add(token_address)
+            self.refresh_event.set()
 
+    def _record_trade(self, token_info: TokenInfo):
+        """Infers the swap between the previous and current reserves and queues it on the token for the candles."""
+        reserves = (token_info.token_vault_ui_amount, token_info.sol_vault_ui_amount)
+        last_reserves = self.last_reserves.get(token_info.token_address, None)
+        self.last_reserves[token_info.token_address] = reserves
 
+        if last_reserves:
+            token_delta = reserves[0] - last_reserves[0]
+            sol_delta = reserves[1] - last_reserves[1]
 
+            #A swap moves the vaults in opposite directions; both rising or falling is a liquidity change
+            if (token_delta > 0 and sol_delta > 0) or (token_delta < 0 and sol_delta < 0) or (token_delta == 0 and sol_delta == 0):
+                return
 
-    
+            is_buy = token_delta < 0 or sol_delta > 0 #Buyers take tokens out and put SOL in
+            trade_count = 1 if token_delta != 0 else 0
+            token_info.trades.append(TokenTrade(datetime.now(), token_info.price, abs(token_delta), abs(sol_delta), is_buy, trade_count))
@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+import threading
+import requests
+import time
+
+c_default_latency_window = 100
+c_default_hedge_delay = 0.15 #Seconds to wait on the fastest endpoint before duplicating a hedged read
+c_max_consecutive_failures = 3
+c_unhealthy_cooldown = 10 #Seconds an endpoint is skipped after too many consecutive failures
+c_default_request_timeout = 10 #Seconds before a hung endpoint counts as failed
+
+#Rolling latency and health statistics for one JSON-RPC endpoint
+class RpcEndpoint:
+    def __init__(self, uri: str, latency_window = c_default_latency_window):
+        self.uri = uri
+        self.latencies = deque(maxlen=latency_window)
+        self.sorted_latencies : list[float] = None #Cached until the next sample
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0
+        self.lock = threading.Lock()
+
+    def record_success(self, latency: float):
+        with self.lock:
+            self.latencies.append(latency)
+            self.sorted_latencies = None
+            self.consecutive_failures = 0
+
+    def record_failure(self, latency: float = None):
+        """latency is given for timeouts, so a hung endpoint also drops in the latency ranking."""
+        with self.lock:
+            self.consecutive_failures += 1
+
+            if latency is not None:
+                self.latencies.append(latency)
+                self.sorted_latencies = None
+
+            if self.consecutive_failures >= c_max_consecutive_failures:
+                self.unhealthy_until = time.time() + c_unhealthy_cooldown
+
+    def is_healthy(self)->bool:
+        return time.time() >= self.unhealthy_until
+
+    def get_percentile(self, percentile: float)->float:
+        with self.lock:
+            if len(self.latencies) == 0:
+                return 0 #Unmeasured endpoints rank first so they get sampled
+
+            if self.sorted_latencies is None:
+                self.sorted_latencies = sorted(self.latencies)
+
+            index = min(len(self.sorted_latencies)-1, int(len(self.sorted_latencies)*percentile/100))
+
+            return self.sorted_latencies[index]
+
+    def get_p50(self)->float:
+        return self.get_percentile(50)
+
+    def get_p99(self)->float:
+        return self.get_percentile(99)
+
+class RpcRouter:
+    """
+    Sends JSON-RPC requests to the fastest healthy endpoint (by rolling p50 latency) and fails over
+    to the next one on errors. Hedged requests fire a duplicate at the runner-up endpoint when the
+    first one has not answered within hedge_delay seconds; the first successful response wins.
+    """
+    def __init__(self, uris: list[str], session: requests.Session = None, hedge_delay = c_default_hedge_delay,
+                 latency_window = c_default_latency_window, timeout = c_default_request_timeout):
+        self.endpoints = [RpcEndpoint(uri, latency_window) for uri in uris]
+        self.session = session if session else requests.Session()
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max(4, 2*len(uris)), thread_name_prefix="RpcRouter")
+
+    def get_ranked_endpoints(self)->list[RpcEndpoint]:
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.is_healthy()]
+        unhealthy = [endpoint for endpoint in self.endpoints if not endpoint.is_healthy()]
+
+        return sorted(healthy, key=lambda endpoint: endpoint.get_p50()) + unhealthy
+
+    def get_stats(self)->dict[str, dict[str, float]]:
+        return {endpoint.uri: {'p50': endpoint.get_p50(), 'p99': endpoint.get_p99(), 'healthy': endpoint.is_healthy(),
+                               'samples': len(endpoint.latencies)} for endpoint in self.endpoints}
+
+    def post(self, json_request, hedged = False)->requests.Response:
+        endpoints = self.get_ranked_endpoints()
+
+        if hedged and len(endpoints) > 1:
+            return self._post_hedged(json_request, endpoints)
+
+        last_error = None
+
+        for endpoint in endpoints:
+            try:
+                return self._post_to_endpoint(endpoint, json_request)
+            except Exception as e:
+                last_error = e
+
+        raise last_error
+
+    def _post_to_endpoint(self, endpoint: RpcEndpoint, json_request)->requests.Response:
+        start_time = time.perf_counter()
+
+        try:
+            response = self.session.post(endpoint.uri, json=json_request, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.Timeout:
+            endpoint.record_failure(time.perf_counter()-start_time)
+            raise
+        except Exception:
+            endpoint.record_failure()
+            raise
+
+        endpoint.record_success(time.perf_counter()-start_time)
+
+        return response
+
+    def _post_hedged(self, json_request, endpoints: list[RpcEndpoint])->requests.Response:
+        remaining_endpoints = list(endpoints)
+        pending = {self.executor.submit(self._post_to_endpoint, remaining_endpoints.pop(0), json_request)}
+        last_error = None
+
+        while pending:
+            #Wait for the hedge delay while a spare endpoint is left, otherwise for whichever request finishes
+            timeout = self.hedge_delay if remaining_endpoints else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+
+            if remaining_endpoints:
+                pending.add(self.executor.submit(self._post_to_endpoint, remaining_endpoints.pop(0), json_request))
+
+        raise last_error
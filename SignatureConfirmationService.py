@@ -0,0 +1,136 @@
+from SolanaRpcApi import SolanaRpcApi
+from AsyncSolanaRpcApi import AsyncSolanaRpcApi
+import JsonDecoder
+import concurrent.futures
+import threading
+import itertools
+import asyncio
+import websockets
+import time
+
+c_default_poll_interval = 0.5
+
+#A signature waiting for confirmation
+class SignatureWatch:
+    def __init__(self, tx_signature: str, future: concurrent.futures.Future, deadline: float):
+        self.tx_signature = tx_signature
+        self.future = future
+        self.deadline = deadline
+
+class SignatureConfirmationService(threading.Thread):
+    """
+    Confirms any number of outstanding signatures over one long-lived websocket (signatureSubscribe).
+    While the websocket is down, statuses are polled with batched getSignatureStatuses calls instead.
+    watch() returns a future resolving to {'err': ..., 'slot': ...} once confirmed, or None on timeout.
+    """
+    def __init__(self, solana_rpc_api: SolanaRpcApi, async_rpc_api: AsyncSolanaRpcApi = None, poll_interval = c_default_poll_interval):
+        threading.Thread.__init__(self, daemon=True)
+        self.wss_uri = solana_rpc_api.wss_uri
+        self.async_rpc_api = async_rpc_api if async_rpc_api else AsyncSolanaRpcApi.from_rpc_api(solana_rpc_api)
+        self.poll_interval = poll_interval
+        self.watches : dict[str, SignatureWatch] = {} #Key=transaction signature
+        self.pending_requests : dict[int, str] = {} #Key=request id; Value=transaction signature
+        self.subscription_signatures : dict[int, str] = {} #Key=subscription id; Value=transaction signature
+        self.request_ids = itertools.count(1)
+        self.wsocket = None
+        self.loop = asyncio.new_event_loop()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(asyncio.gather(self._read_socket(), self._poll_statuses()))
+
+    def watch(self, tx_signature: str, timeout = 60)->concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        self.loop.call_soon_threadsafe(self._add_watch, SignatureWatch(tx_signature, future, time.time() + timeout))
+
+        return future
+
+    def close(self):
+        """Thread safe. Closes the RPC session used for status polling."""
+        self.async_rpc_api.close_threadsafe(self.loop)
+
+    def get_pending_count(self)->int:
+        return len(self.watches)
+
+    def _add_watch(self, watch: SignatureWatch):
+        self.watches[watch.tx_signature] = watch
+
+        if self.wsocket:
+            self.loop.create_task(self._subscribe(watch.tx_signature))
+
+    def _resolve(self, tx_signature: str, result: dict):
+        watch = self.watches.pop(tx_signature, None)
+
+        if watch and not watch.future.done():
+            watch.future.set_result(result)
+
+    async def _subscribe(self, tx_signature: str):
+        request_id = next(self.request_ids)
+        self.pending_requests[request_id] = tx_signature
+        request = SolanaRpcApi.get_signature_request(tx_signature)
+        request['id'] = request_id
+
+        try:
+            await self.wsocket.send(JsonDecoder.dumps(request))
+        except Exception as e:
+            print("Error " + str(e))
+
+    async def _read_socket(self):
+        while True:
+            try:
+                async with websockets.connect(self.wss_uri) as websocket:
+                    self.pending_requests.clear()
+                    self.subscription_signatures.clear()
+                    self.wsocket = websocket
+
+                    for tx_signature in list(self.watches.keys()):
+                        await self._subscribe(tx_signature)
+
+                    while True:
+                        received = await websocket.recv()
+                        self._process(JsonDecoder.loads(received))
+            except Exception as e:
+                print("Error " + str(e))
+            finally:
+                self.wsocket = None
+
+            await asyncio.sleep(1)
+
+    def _process(self, data: dict):
+        params = data.get('params', None)
+
+        if params:
+            tx_signature = self.subscription_signatures.pop(params['subscription'], None)
+
+            if tx_signature:
+                result = params['result']
+                self._resolve(tx_signature, {'err': result['value']['err'], 'slot': result['context']['slot']})
+        elif 'result' in data:
+            tx_signature = self.pending_requests.pop(data.get('id', None), None)
+
+            if tx_signature:
+                self.subscription_signatures[data['result']] = tx_signature
+
+    async def _poll_statuses(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            now = time.time()
+
+            for watch in [watch for watch in self.watches.values() if now >= watch.deadline]:
+                print(f"Confirmation of {watch.tx_signature} timed out!")
+                self._resolve(watch.tx_signature, None)
+
+            #Signatures whose subscription is not confirmed yet are polled too, so a notification lost while reconnecting is not missed
+            subscribed = set(self.subscription_signatures.values())
+            tx_signatures = [tx_signature for tx_signature in self.watches.keys() if not self.wsocket or tx_signature not in subscribed]
+
+            if tx_signatures:
+                try:
+                    statuses = await self.async_rpc_api.get_signature_statuses(tx_signatures)
+                except Exception as e:
+                    print("Error " + str(e))
+                    continue
+
+                for tx_signature, status in zip(tx_signatures, statuses):
+                    if status and status.get('confirmationStatus', None) in ('confirmed', 'finalized'):
+                        self._resolve(tx_signature, {'err': status['err'], 'slot': status['slot']})
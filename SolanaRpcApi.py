@@ -5,16 +5,27 @@ from solana.rpc.api import Client
 from solana.rpc.types import TxOpts
 from solders.pubkey import Pubkey
 from solana.rpc.commitment import Confirmed, Processed, Finalized
-from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID
 from solders.transaction import VersionedTransaction
 from solana.rpc.types import TokenAccountOpts
 from TradingDTOs import SwapTransactionInfo
+from RpcRouter import RpcRouter, c_default_hedge_delay
+import JsonDecoder
+import PubkeyCache
+from requests.adapters import HTTPAdapter
 import requests
+import base64
+
+c_max_batch_size = 100 #Most RPC providers reject larger JSON-RPC batches
+c_connection_pool_size = 20
+
+#SPL token account layout: mint(32) | owner(32) | amount(u64 little endian) | ...
+c_token_account_mint_offset = 0
+c_token_account_amount_offset = 64
 
 
 class SolanaRpcApi:
 
-    def __init__(self, rpc_uri, wss_uri, http_uri, wallet_address, endpoint=None):
+    def __init__(self, rpc_uri, wss_uri, http_uri, wallet_address, endpoint=None, rpc_uris: list[str] = None, hedge_delay = c_default_hedge_delay):
         load_dotenv()
         self.rpc_uri = rpc_uri
         self.wss_uri = wss_uri
@@ -22,26 +33,69 @@ class SolanaRpcApi:
         self.wallet_address = wallet_address
         self.wallet_pubkey = Pubkey.from_string(wallet_address)
         self.TOKEN_PROGRAM_ID = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
+
+        #Keep-alive session so consecutive calls reuse the same TCP+TLS connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=c_connection_pool_size, pool_maxsize=c_connection_pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        #Reads go to the fastest healthy endpoint; rpc_uris adds more endpoints besides rpc_uri
+        self.router = RpcRouter([rpc_uri] + [uri for uri in (rpc_uris or []) if uri != rpc_uri], self.session, hedge_delay)
     
-    def run_rpc_method(self, request_name: str, params):
+    def run_rpc_method(self, request_name: str, params, decoder = JsonDecoder.loads, hedged = False):
         json_request = request(request_name, params=params)
-        response = requests.post(self.rpc_uri, json=json_request)
+        response = self.router.post(json_request, hedged)
 
-        parsed = parse(response.json())
+        parsed = parse(decoder(response.content))
 
         if isinstance(parsed, Error): 
             return None
         else:
             return parsed
 
-    def get_transaction(self, tx_signature: str):
+    def run_rpc_batch(self, request_name: str, params_list: list, decoder = JsonDecoder.loads)->list:
+        """
+        Sends one JSON-RPC call per entry in params_list, packed into as few HTTP requests as possible.
+        Returns the results in the same order as params_list; failed calls are returned as None.
+        """
+        results = []
+
+        for i in range(0, len(params_list), c_max_batch_size):
+            json_requests = [request(request_name, params=params) for params in params_list[i:i+c_max_batch_size]]
+            response = self.router.post(json_requests)
+            response_data = decoder(response.content)
+            results_by_id = {}
+
+            #A batch failing as a whole comes back as a single error object instead of a list
+            if isinstance(response_data, list):
+                for parsed in parse(response_data):
+                    if isinstance(parsed, Ok):
+                        results_by_id[parsed.id] = parsed.result
+
+            for json_request in json_requests:
+                results.append(results_by_id.get(json_request['id'], None))
+
+        return results
+
+    def get_transaction(self, tx_signature: str | list[str], hedged = False):
+        if isinstance(tx_signature, list):
+            return self.run_rpc_batch("getTransaction", [[signature, {'encoding': 'jsonParsed', 'maxSupportedTransactionVersion':0 }]
+                                                        for signature in tx_signature], JsonDecoder.decode_transaction_response)
+
         response = self.run_rpc_method("getTransaction", [tx_signature,
-                                        {'encoding': 'jsonParsed', 'maxSupportedTransactionVersion':0 }])
+                                        {'encoding': 'jsonParsed', 'maxSupportedTransactionVersion':0 }],
+                                        JsonDecoder.decode_transaction_response, hedged)
         
         if response:
             return response.result
 
-    def get_account_balance(self, account_address: str)->float:
+    def get_account_balance(self, account_address: str | list[str])->float:
+        if isinstance(account_address, list):
+            results = self.run_rpc_batch("getBalance", [[address] for address in account_address])
+
+            return [result['value'] if result else None for result in results]
+
         response = self.run_rpc_method("getBalance", [ account_address ])
         
         if response:
@@ -49,6 +103,15 @@ class SolanaRpcApi:
         else:
             return None
 
+    def get_latest_blockhash(self)->tuple[str, int, int]:
+        """Returns (blockhash, last valid block height, slot the blockhash was read at)."""
+        response = self.run_rpc_method("getLatestBlockhash", [{'commitment': 'confirmed'}])
+
+        if response:
+            value = response.result['value']
+
+            return value['blockhash'], value['lastValidBlockHeight'], response.result['context']['slot']
+
     def send_transaction(self, transaction: VersionedTransaction, maxTries=0):
         transaction_bytes = bytes(transaction)
 
@@ -57,7 +120,12 @@ class SolanaRpcApi:
                                                                             #preflight_commitment=Processed,
                                                                             max_retries=maxTries))
     
-    def get_token_account_balance(self, associated_token_address: str):
+    def get_token_account_balance(self, associated_token_address: str | list[str]):
+        if isinstance(associated_token_address, list):
+            results = self.run_rpc_batch("getTokenAccountBalance", [[address] for address in associated_token_address])
+
+            return [result['value']['uiAmount'] if result else None for result in results]
+
         response = self.run_rpc_method("getTokenAccountBalance", [ associated_token_address ])
         
         if response:
@@ -67,7 +135,7 @@ class SolanaRpcApi:
         
     def get_non_zero_token_accounts(self):
         """
-        Returns a list of dictionaries, each containing 'mint' and 'balance'
+        Returns a list of dictionaries, each containing 'mint', 'balance' and 'decimals'
         for tokens held by the wallet with a non-zero balance.
         """
         opts = TokenAccountOpts(program_id=self.TOKEN_PROGRAM_ID)
@@ -81,19 +149,20 @@ class SolanaRpcApi:
                     mint_address = account_info["mint"]
                     token_accounts.append({
                         "mint": mint_address,
-                        "balance": token_balance
+                        "balance": token_balance,
+                        "decimals": account_info["tokenAmount"]["decimals"]
                     })
         return token_accounts
 
     def get_associated_token_account_address(self,owner_address: str, mint_address: str)->str:
-        mint_address_pk = Pubkey.from_string(mint_address)        
-        owner_address_pk = Pubkey.from_string(owner_address)
+        #Derivations are memoized; see PubkeyCache.get_stats() for hit rates
+        return str(PubkeyCache.get_associated_token_address(owner_address, mint_address))
 
-        # Calculate the associated token address
-        seeds = [bytes(owner_address_pk), bytes(TOKEN_PROGRAM_ID), bytes(mint_address_pk)]
-        account_pubkey = Pubkey.find_program_address(seeds, ASSOCIATED_TOKEN_PROGRAM_ID)[0]
+    def get_associated_token_account_addresses(self, owner_address: str, mint_addresses: list[str])->dict[str, str]:
+        """Key=mint address"""
+        account_pubkeys = PubkeyCache.get_associated_token_addresses(owner_address, mint_addresses)
 
-        return str(account_pubkey)
+        return {mint_address: str(account_pubkey) for mint_address, account_pubkey in account_pubkeys.items()}
     
     @staticmethod
     def parse_swap_transaction(owner_address: str, transaction_data: dict):
@@ -156,20 +225,38 @@ class SolanaRpcApi:
                 return token_balance
 
     @staticmethod
-    def get_account_subscribe_request(account_address: str):
+    def get_account_subscribe_request(account_address: str, request_id: int = 420, encoding: str = "jsonParsed"):
          return {
                 "jsonrpc": "2.0",
-                "id": 420,
+                "id": request_id,
                 "method": "accountSubscribe",
                 "params": [
                 account_address, # pubkey of account we want to subscribe to
                 {
-                    "encoding": "jsonParsed", # base58, base64, base65+zstd, jsonParsed
+                    "encoding": encoding, # base58, base64, base65+zstd, jsonParsed
                     "commitment": "confirmed", # defaults to finalized if unset
                 }
             ]
         }           
     
+    @staticmethod
+    def get_account_unsubscribe_request(subscription_id: int, request_id: int = 421):
+         return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "method": "accountUnsubscribe",
+                "params": [ subscription_id ]
+        }
+
+    #Reads the mint and raw amount of a base64 encoded SPL token account without parsing the rest of it
+    @staticmethod
+    def decode_token_account(encoded_data: str)->tuple[bytes, int]:
+        account_data = memoryview(base64.b64decode(encoded_data))
+        mint_bytes = account_data[c_token_account_mint_offset:c_token_account_mint_offset+32].tobytes()
+        raw_amount = int.from_bytes(account_data[c_token_account_amount_offset:c_token_account_amount_offset+8], 'little')
+
+        return mint_bytes, raw_amount
+
     #Creates a transaction sub request
     @staticmethod
     def get_signature_request(signature: str):
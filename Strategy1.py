@@ -1,10 +1,11 @@
 from TradingDTOs import *
 from TokenDipSignalGenerator import TokenDipSignalGenerator
 from AbstractTradingStrategy import AbstractTradingStrategy
+from StrategyScheduler import StrategyScheduler
 
 class Strategy1(AbstractTradingStrategy):
-    def __init__(self, token_info: TokenInfo, order_executor: OrderExecutor, order_settings: StrategyOrder):
-        AbstractTradingStrategy.__init__(self, token_info, order_executor)
+    def __init__(self, token_info: TokenInfo, order_executor: OrderExecutor, order_settings: StrategyOrder, scheduler: StrategyScheduler = None):
+        AbstractTradingStrategy.__init__(self, token_info, order_executor, scheduler)
 
         self.order_settings = order_settings
         self.token_dip_signal_generator : TokenDipSignalGenerator = None
@@ -20,31 +21,34 @@ class Strategy1(AbstractTradingStrategy):
         if trigger_state == SignalState.TRIGGERED:
             self.state = StrategyState.COMPLETE  
 
-            #Create and Execute the Buy Order
-            buy_order = Order(Order_Type.BUY, self.token_info.token_address, self.order_settings.amount, self.order_settings.slippage, self.order_settings.priority_fee)
-            tx_signature = self.order_executor.execute_order(buy_order, True)
+            #The buy blocks until confirmed, so it runs on the order executor's threads rather than a strategy worker
+            self.order_executor.run_order_task(self._execute_buy)
+            self.stop()
 
-            if tx_signature:
-                #Setup a limit order with a stop loss
-                transaction_info = self.order_executor.get_order_transaction(tx_signature)
+    def _execute_buy(self):
+        #Create and Execute the Buy Order
+        buy_order = Order(Order_Type.BUY, self.token_info.token_address, self.order_settings.amount, self.order_settings.slippage, self.order_settings.priority_fee)
+        tx_signature = self.order_executor.execute_order(buy_order, True)
 
-                if transaction_info and transaction_info.token_diff > 0:
-                    temp_calc = abs(transaction_info.sol_diff/transaction_info.token_diff)   
-                    base_token_price = Amount.sol_scaled(temp_calc)
-                    tokens_bought = Amount.tokens_ui(transaction_info.token_diff, self.token_info.decimals_scale_factor)
-                    
-                    sell_order = OrderWithLimitsStops(self.token_info.token_address, base_token_price, tokens_bought, self.order_settings.slippage,
-                                                  self.order_settings.priority_fee)
-                    
-                    for option in self.pnl_options:
-                        sell_order.add_pnl_option(option)
-                
-                    #Start a limit and stop loss order
-                    self.order_executor.execute_order(sell_order, True)
-            else:
-                print("Issue with executing the trade!") #TODO future feature: notify user
+        if tx_signature:
+            #Setup a limit order with a stop loss
+            transaction_info = self.order_executor.get_order_transaction(tx_signature)
 
-            self.stop()
+            if transaction_info and transaction_info.token_diff > 0:
+                temp_calc = abs(transaction_info.sol_diff/transaction_info.token_diff)   
+                base_token_price = Amount.sol_scaled(temp_calc)
+                tokens_bought = Amount.tokens_ui(transaction_info.token_diff, self.token_info.decimals_scale_factor)
+                
+                sell_order = OrderWithLimitsStops(self.token_info.token_address, base_token_price, tokens_bought, self.order_settings.slippage,
+                                              self.order_settings.priority_fee)
+                
+                for option in self.pnl_options:
+                    sell_order.add_pnl_option(option)
+            
+                #Start a limit and stop loss order
+                self.order_executor.execute_order(sell_order, True)
+        else:
+            print("Issue with executing the trade!") #TODO future feature: notify user
 
     def load_from_dict(self, strategy_settings: dict[str, any]):                            
             sol_buy_amount = strategy_settings.get('amount_in')
@@ -0,0 +1,75 @@
+from CoalescingWorkerPool import CoalescingWorkerPool
+from collections import deque
+import threading
+import time
+
+c_default_worker_count = 8
+c_default_latency_window = 1000
+
+class StrategyScheduler(CoalescingWorkerPool):
+    """
+    Runs strategy updates (strategy._process_event_task) on a fixed pool of worker threads.
+    Each strategy runs on at most one worker at a time. Updates that arrive while a strategy is queued are merged,
+    and updates that arrive while it is running queue exactly one more run, so it always sees the latest price.
+    Runs must not block: swaps and their confirmations go through order_executor.run_order_task instead.
+    """
+    def __init__(self, worker_count = c_default_worker_count, latency_window = c_default_latency_window):
+        CoalescingWorkerPool.__init__(self, self._run_strategy, worker_count, "StrategyScheduler")
+        self.queued_since = {} #Key=queued strategy; Value=time it was first scheduled
+        self.started_at = {} #Key=running strategy; Value=time its run started
+        self.wait_times = deque(maxlen=latency_window) #Seconds between scheduling and starting a run
+        self.run_times = deque(maxlen=latency_window)
+
+    def schedule(self, strategy):
+        """Thread safe and non-blocking."""
+        self.submit(strategy)
+
+    def get_queue_depth(self)->int:
+        with self.condition:
+            return len(self.ready_keys)
+
+    def get_stats(self)->dict[str, float]:
+        with self.condition:
+            wait_times = sorted(self.wait_times)
+            run_times = sorted(self.run_times)
+
+            return {'queue_depth': len(self.ready_keys), 'running': len(self.in_flight_keys),
+                    'scheduled': self.submitted_count, 'processed': self.delivered_count, 'merged': self.merged_count,
+                    'wait_p50': self._get_percentile(wait_times, 50), 'wait_p99': self._get_percentile(wait_times, 99),
+                    'run_p50': self._get_percentile(run_times, 50), 'run_p99': self._get_percentile(run_times, 99)}
+
+    @staticmethod
+    def _get_percentile(sorted_values: list[float], percentile: float)->float:
+        if len(sorted_values) == 0:
+            return 0
+
+        return sorted_values[min(len(sorted_values)-1, int(len(sorted_values)*percentile/100))]
+
+    @staticmethod
+    def _run_strategy(strategy):
+        strategy._process_event_task()
+
+    def _on_queued(self, strategy):
+        self.queued_since[strategy] = time.perf_counter()
+
+    def _on_started(self, strategy):
+        start_time = time.perf_counter()
+        self.wait_times.append(start_time - self.queued_since.pop(strategy))
+        self.started_at[strategy] = start_time
+
+    def _on_finished(self, strategy):
+        self.run_times.append(time.perf_counter() - self.started_at.pop(strategy))
+
+default_scheduler : StrategyScheduler = None
+default_scheduler_lock = threading.Lock()
+
+def get_default_scheduler()->StrategyScheduler:
+    """The shared scheduler used by strategies that are not given one; started on first use."""
+    global default_scheduler
+
+    with default_scheduler_lock:
+        if default_scheduler is None:
+            default_scheduler = StrategyScheduler()
+            default_scheduler.start()
+
+        return default_scheduler
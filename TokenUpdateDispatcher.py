@@ -0,0 +1,25 @@
+from pubsub import pub
+from CoalescingWorkerPool import CoalescingWorkerPool
+import Globals as globals
+
+c_default_worker_count = 4
+c_default_max_pending = 10000
+
+class TokenUpdateDispatcher(CoalescingWorkerPool):
+    """
+    Delivers token update events from a fixed pool of worker threads so producers (the websocket readers) never block.
+    Updates carry no payload beyond the token address, so a token that is already queued is merged into the queued
+    update and its listeners see the latest state once. A token is never delivered on two workers at once; an update
+    arriving mid-delivery queues exactly one redelivery. When max_pending distinct tokens are queued, new ones are dropped.
+    """
+    def __init__(self, deliver = None, worker_count = c_default_worker_count, max_pending = c_default_max_pending):
+        CoalescingWorkerPool.__init__(self, deliver if deliver else self._publish, worker_count, "TokenUpdateDispatcher", max_pending)
+
+    def get_stats(self)->dict[str, int]:
+        with self.condition:
+            return {'submitted': self.submitted_count, 'delivered': self.delivered_count, 'merged': self.merged_count,
+                    'dropped': self.dropped_count, 'pending': len(self.ready_keys) + len(self.redeliver_keys)}
+
+    @staticmethod
+    def _publish(token_address: str):
+        pub.sendMessage(topicName=globals.topic_token_update_event, arg1=token_address)
@@ -1,13 +1,14 @@
 
 from TradingDTOs import TokenInfo
 import requests
+import JsonDecoder
 import json
 
 def get_request(request_uri: str):
     response = requests.get(request_uri)
     
     if response.status_code == 200:
-        return response.json()
+        return JsonDecoder.loads(response.content)
     else:
         return None
     
@@ -34,7 +35,7 @@ def get_swap_transaction(signer_pubkey: str, in_token_address: str, out_token_ad
         response = requests.post(swap_jup_uri, headers=headers, data=json_data)    
 
         if response:
-            json_response = response.json()
+            json_response = JsonDecoder.loads(response.content)
 
             return json_response['swapTransaction']
 
@@ -51,12 +52,14 @@ def get_amm_token_pool_data(token_address: str)->TokenInfo:
             token_info = TokenInfo(token_address)
             token_info.market_id = data['data']['data'][0]['id']
             token_info.price = data['data']['data'][0]['price']
+            token_info.fee_rate = data['data']['data'][0].get('feeRate', token_info.fee_rate)
 
             pool_info_uri = ray_uri + "/key/ids?ids=" + token_info.market_id
 
             data = get_request(pool_info_uri)
 
             if len(data) > 0:
+                token_info.pool_keys = data['data'][0]
                 mintA = data['data'][0]['mintA']
                 mintB = data['data'][0]['mintB']
                 vaultA = data['data'][0]['vault']['A']
@@ -3,16 +3,29 @@ import base64
 import time
 import config.config as config
 from TradingDTOs import *
-from TransactionChecker import TransactionChecker
+from SignatureConfirmationService import SignatureConfirmationService
 from AbstractTradingStrategy import *
 from Strategy1 import Strategy1
 from MarketManager import MarketManager
 from SolanaRpcApi import SolanaRpcApi
-from PnlTradingEngine import PnlTradingEngine
+from PnlTradingEngine import PnlTradingEngine, c_trailing_candle_interval
+from TransactionBroadcaster import TransactionBroadcaster
+from TriggerBook import TriggerBook
+from RaydiumSwapBuilder import RaydiumSwapBuilder
+from BlockhashPrefetcher import BlockhashPrefetcher
+from BalanceCache import BalanceCache
+from spl.token.constants import WRAPPED_SOL_MINT
+import math
+from pubsub import pub
+import Globals as globals
 from solders.keypair import Keypair
 from solders.transaction import VersionedTransaction
+import threading
+import concurrent.futures
+import requests
 
 c_default_swap_retries = 5
+c_default_order_workers = 16 #Swaps block for their confirmation (up to ~35s), so they get threads apart from the strategy workers
 
 
 
@@ -27,6 +40,22 @@ class TradesManager(OrderExecutor):
         self.token_account_dict : dict[str, TokenAccountInfo] = {} #Key=token_address; Associated token accounts for this signer
         self.sol_balance = Amount.sol_ui(0)
         self.active_trade_count = 0
+        self.transaction_broadcaster = TransactionBroadcaster([endpoint.uri for endpoint in solana_rpc_api.router.endpoints],
+                                                              config.BROADCAST_RESEND_INTERVAL)
+        self.transaction_broadcaster.start()
+        self.confirmation_service = SignatureConfirmationService(solana_rpc_api)
+        self.confirmation_service.start()
+        self.trigger_books : dict[str, TriggerBook] = {} #Key=token_address; price levels of every engine trading the token
+        self.trigger_books_lock = threading.Lock()
+        self.raydium_swap_builder = RaydiumSwapBuilder(self.signer_wallet) #Direct AMM route when config.USE_LOCAL_RAYDIUM_SWAP; Jupiter is the fallback
+        self.blockhash_prefetcher = BlockhashPrefetcher(solana_rpc_api)
+        self.blockhash_prefetcher.start()
+        self.balance_cache = BalanceCache(solana_rpc_api) #Pushed balances of the signer and its token accounts
+        self.balance_cache.watch(self.signer_pubkey, False)
+        self.balance_cache.start()
+        self.order_slots : dict[str, int] = {} #Key=transaction signature; Value=slot it was confirmed in
+        self.order_pool = concurrent.futures.ThreadPoolExecutor(max_workers=c_default_order_workers, thread_name_prefix="OrderExecutor")
+        pub.subscribe(topicName=globals.topic_token_update_event, listener=self._handle_token_update)
         
         self._update_account_balance(self.signer_pubkey)
 
@@ -49,6 +78,9 @@ class TradesManager(OrderExecutor):
         else:
             # If it's a strategy order, handle that
             self.market_manager.monitor_token(order.token_address)
+            if config.USE_LOCAL_RAYDIUM_SWAP:
+                self._prepare_raydium_template(token_info) #Exit orders then only need amounts filled in and a signature
+
             trade_strategy = self.create_strategy(
                 token_info=token_info,
                 order_executor=self,
@@ -129,6 +161,40 @@ class TradesManager(OrderExecutor):
         return tx_signature
 
     
+    def run_order_task(self, task, *args)->concurrent.futures.Future:
+        return self.order_pool.submit(self._run_order_task, task, *args)
+
+    @staticmethod
+    def _run_order_task(task, *args):
+        try:
+            return task(*args)
+        except Exception as e:
+            print("Error executing order " + str(e))
+            raise
+
+    def close(self):
+        """Closes the RPC sessions of the confirmation service and the broadcaster."""
+        self.confirmation_service.close()
+        self.transaction_broadcaster.close()
+
+    def get_trigger_book(self, token_address: str)->TriggerBook:
+        with self.trigger_books_lock:
+            if token_address not in self.trigger_books:
+                self.trigger_books[token_address] = TriggerBook()
+
+            return self.trigger_books[token_address]
+
+    def _handle_token_update(self, arg1: str):
+        trigger_book = self.trigger_books.get(arg1, None)
+
+        #One bisect per tick finds the crossed levels of every engine on this token
+        if trigger_book and len(trigger_book) > 0:
+            candles = self.market_manager.get_candlesticks(arg1, c_trailing_candle_interval)
+            high_price = candles[-1].high if candles else None
+
+            for trigger in trigger_book.update(self.market_manager.get_price(arg1), high_price):
+                trigger.owner.on_trigger(trigger)
+
     @staticmethod
     def create_strategy(token_info: TokenInfo, order_executor: OrderExecutor, order: Order)->AbstractTradingStrategy:
          if order.order_type == Order_Type.LIMIT_STOP_ORDER and isinstance(order, OrderWithLimitsStops):
@@ -136,41 +202,85 @@ class TradesManager(OrderExecutor):
          elif order.order_type == Order_Type.SIMPLE_BUY_DIP_STRATEGY and isinstance(order, StrategyOrder):
             return Strategy1(token_info, order_executor, order)
     
+    def _prepare_raydium_template(self, token_info: TokenInfo):
+        """Cached order template for the token's AMM v4 pool, or None when it has none or its pool keys are malformed."""
+        try:
+            return self.raydium_swap_builder.prepare_order_template(token_info)
+        except (KeyError, ValueError) as e:
+            print(f"Error reading Raydium pool keys for {token_info.token_address}: " + str(e))
+
+    def _build_raydium_swap(self, in_token_address: str, out_token_address: str, amount: Amount, slippage: Amount, priority_fee: Amount)->VersionedTransaction:
+        """Signed swap built from cached pool keys and a local quote, or None when the pool, its reserves or a blockhash are not available."""
+        is_buy = in_token_address == str(WRAPPED_SOL_MINT)
+        token_info = self.market_manager.get_token_info(out_token_address if is_buy else in_token_address)
+        order_type = Order_Type.BUY if is_buy else Order_Type.SELL
+
+        if token_info is None or self._prepare_raydium_template(token_info) is None:
+            return None
+
+        quote = self.market_manager.get_quote(token_info.token_address, order_type, amount, slippage)
+
+        if quote is None:
+            return None
+
+        try:
+            recent_blockhash = self.blockhash_prefetcher.get_blockhash()
+        except requests.RequestException as e:
+            print("Error fetching blockhash " + str(e))
+            return None
+
+        if recent_blockhash is None:
+            return None
+
+        out_scale = token_info.decimals_scale_factor if is_buy else 1E9
+        minimum_out = math.floor(quote.minimum_out*out_scale)
+
+        return self.raydium_swap_builder.build_swap_transaction(token_info, is_buy, amount.ToScaledValue(), minimum_out,
+                                                                priority_fee.ToScaledValue(), recent_blockhash)
+
     def _swap(self, in_token_address: str, out_token_address: str, amount: Amount, slippage: Amount, priority_fee: Amount, confirm_transaction):
         ret_val = None
-        swap_transaction = TokensApi.get_swap_transaction(
-            self.signer_pubkey,
-            in_token_address,
-            out_token_address,
-            amount.ToScaledValue(),
-            slippage.ToScaledValue(),
-            priority_fee.ToScaledValue()
-        )
-
-        if swap_transaction:
-            raw_bytes = base64.b64decode(swap_transaction)
-            raw_tx = VersionedTransaction.from_bytes(raw_bytes)
-            
-
-        signed_transaction = VersionedTransaction(raw_tx.message, [self.signer_wallet])
+        signed_transaction = None
+
+        if config.USE_LOCAL_RAYDIUM_SWAP:
+            signed_transaction = self._build_raydium_swap(in_token_address, out_token_address, amount, slippage, priority_fee)
+
+        if signed_transaction is None:
+            swap_transaction = TokensApi.get_swap_transaction(
+                self.signer_pubkey,
+                in_token_address,
+                out_token_address,
+                amount.ToScaledValue(),
+                slippage.ToScaledValue(),
+                priority_fee.ToScaledValue()
+            )
+
+            if swap_transaction:
+                raw_bytes = base64.b64decode(swap_transaction)
+                raw_tx = VersionedTransaction.from_bytes(raw_bytes)
+                signed_transaction = VersionedTransaction(raw_tx.message, [self.signer_wallet])
+
         if signed_transaction:
-            transaction_checker: TransactionChecker = None
+            confirmation = None
             try:
                 tx_signature = str(signed_transaction.signatures[0])
                 # Immediately print the transaction signature.
                 print(f"Transaction signature: {tx_signature}")
 
+                transaction_bytes = bytes(signed_transaction)
+                recent_blockhash = str(signed_transaction.message.recent_blockhash)
+
                 if confirm_transaction:
-                    transaction_checker = TransactionChecker(self.solana_api_rpc, tx_signature, timeout=35)
-                    transaction_checker.start()
+                    confirmation = self.confirmation_service.watch(tx_signature, timeout=35)
+                    stop_event = threading.Event()
+                    confirmation.add_done_callback(lambda future: stop_event.set())
+
+                    # Keep re-sending to every endpoint until the confirmation resolves or the blockhash expires
+                    self.transaction_broadcaster.broadcast(transaction_bytes, recent_blockhash, stop_event)
                 else:
                     ret_val = tx_signature
-
-                # Dynamically update the same line for each retry attempt.
-                for i in range(c_default_swap_retries):
-                    print(f"\rSending transaction attempt #{i+1}", end="")
-                    self.solana_api_rpc.send_transaction(signed_transaction)
-                print()  # To break the dynamic line after retries.
+                    self.transaction_broadcaster.broadcast(transaction_bytes, recent_blockhash, max_rounds=c_default_swap_retries)
+                print(f"Broadcasting transaction to {len(self.transaction_broadcaster.rpc_apis)} endpoint(s)")
                 
             except Exception as e:
                 # wait for 2 seconds, and then continue.
@@ -178,11 +288,12 @@ class TradesManager(OrderExecutor):
                 time.sleep(2)
                 print(" done.")
 
-            if transaction_checker:
-                # Wait for the transaction checker to complete.
-                transaction_checker.join()
-                if transaction_checker.did_succeed():
+            if confirmation:
+                # Wait for the confirmation service to report back.
+                confirmation_result = confirmation.result()
+                if confirmation_result and confirmation_result['err'] is None:
                     ret_val = tx_signature
+                    self.order_slots[tx_signature] = confirmation_result['slot']
                 else:
                     print(f"Transaction {tx_signature} failed confirmation check.")
 
@@ -191,8 +302,10 @@ class TradesManager(OrderExecutor):
     
     def _update_account_balance(self, contract_address: str):
         if contract_address == self.signer_pubkey:
-            new_sol_balance = self.solana_api_rpc.get_account_balance(self.signer_pubkey)
-            self.sol_balance.set_amount(new_sol_balance/1E9)
+            new_sol_balance = self.balance_cache.get_balance(self.signer_pubkey, False)
+
+            if new_sol_balance is not None:
+                self.sol_balance.set_amount(new_sol_balance/1E9)
         else:
             token_account_info : TokenAccountInfo = None
 
@@ -205,23 +318,61 @@ class TradesManager(OrderExecutor):
                     token_account_info = TokenAccountInfo(contract_address, token_account_address, tokens_amount)
 
                     self.token_account_dict[contract_address] = token_account_info
+                    self.balance_cache.watch(token_account_address, True)
             else:
                 token_account_info = self.token_account_dict[contract_address]
         
             if token_account_info:
-                new_balance = self.solana_api_rpc.get_token_account_balance(token_account_info.token_account_address)
+                new_balance = self.balance_cache.get_balance(token_account_info.token_account_address, True)
 
-                if new_balance:
+                if new_balance is not None:
                     #print(f"New Balance={new_balance}")
                     token_account_info.balance.set_amount(new_balance)
                 
+    def prepare_token_accounts(self, token_accounts: list[dict]):
+        """
+        Derives and watches the signer's associated token accounts up front, e.g. for its holdings at startup.
+        token_accounts are dicts with 'mint' and 'decimals', as returned by SolanaRpcApi.get_non_zero_token_accounts.
+        """
+        token_account_addresses = self.solana_api_rpc.get_associated_token_account_addresses(self.signer_pubkey,
+                                                                                             [token_account['mint'] for token_account in token_accounts])
+
+        for token_account in token_accounts:
+            contract_address = token_account['mint']
+
+            if contract_address not in self.token_account_dict:
+                token_account_address = token_account_addresses[contract_address]
+                tokens_amount = Amount.tokens_ui(0, pow(10, token_account['decimals']))
+                self.token_account_dict[contract_address] = TokenAccountInfo(contract_address, token_account_address, tokens_amount)
+                self.balance_cache.watch(token_account_address, True)
+
     def get_order_transaction(self, tx_signature)-> SwapTransactionInfo:
         return self.market_manager.get_swap_info(tx_signature, self.signer_pubkey, 30)
 
+    def _get_balance_account_address(self, contract_address: str)->str:
+        if contract_address == self.signer_pubkey:
+            return self.signer_pubkey
+        elif contract_address in self.token_account_dict:
+            return self.token_account_dict[contract_address].token_account_address
+
     def get_account_balance(self, contract_address: str)->Amount:
+        """None until a balance has actually been read for the account, e.g. while the token account is not visible yet."""
         self._update_account_balance(contract_address)
+        account_address = self._get_balance_account_address(contract_address)
+
+        if account_address is None or self.balance_cache.get_slot(account_address) == 0:
+            return None
 
         if contract_address == self.signer_pubkey:
             return self.sol_balance   
-        elif contract_address in self.token_account_dict:
+        else:
             return self.token_account_dict[contract_address].balance
+
+    def get_account_balance_slot(self, contract_address: str)->int:
+        account_address = self._get_balance_account_address(contract_address)
+
+        if account_address:
+            return self.balance_cache.get_slot(account_address)
+
+    def get_order_slot(self, tx_signature: str)->int:
+        return self.order_slots.get(tx_signature, None)
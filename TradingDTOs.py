@@ -1,12 +1,17 @@
 from enum import Enum
 from abc import abstractmethod
-from Candlesticks import Candlestick
+from Candlesticks import Candlestick, CandlestickSeries
+from datetime import datetime
+from collections import deque
 from enum import Enum
+import concurrent.futures
 
 
 
 
 
+c_default_pool_fee_rate = 0.0025 #Raydium AMM v4 trade fee
+
 class StrategyState(Enum):
     PENDING = 0,
     COMPLETE = 1,
@@ -84,20 +89,17 @@ class Amount:
 
         return f"{self.ToUiValue()} {amount_unit_str}"
     
-class TriggerPrice:
-    def __init__(self, in_sell_amount: Amount, target_price: Amount):
-        self.in_sell_amount = in_sell_amount
-        self.target_price = target_price
-        
 class PnlOption:
-    def __init__(self, trigger_at_percent: Amount, allocation_percent: Amount):
+    def __init__(self, trigger_at_percent: Amount, allocation_percent: Amount, trailing = False):
         self.trigger_at_percent = trigger_at_percent
-        self.allocation_percent = allocation_percent
+        self.allocation_percent = allocation_percent #Percent of the tokens still held when the level fills
+        self.trailing = trailing #Stop losses only: trigger_at_percent is measured from the highest price since entry
 
     @staticmethod
     def from_dict(values: dict[str, any]):
         return PnlOption(Amount.percent_ui(values.get("trigger_at_percent", 0)),
-                        Amount.percent_ui(values.get("allocation_percent", 100)))      
+                        Amount.percent_ui(values.get("allocation_percent", 100)),
+                        values.get("trailing", False))      
 class CallEvent:
     user = ""
     message = ""
@@ -125,10 +127,17 @@ class OrderWithLimitsStops(Order):
         self.stop_losses: list[PnlOption] = []
         self.base_token_price = base_token_price
 
-    def add_pnl_option(self, pnl_option: PnlOption):
-        if pnl_option.trigger_at_percent.ToUiValue() > 0:
+    def add_pnl_option(self, pnl_option: PnlOption, is_limit: bool = None):
+        """is_limit=None picks the side from the sign of trigger_at_percent; False adds a stop at any level, e.g. break-even."""
+        if is_limit is None:
+            is_limit = pnl_option.trigger_at_percent.ToUiValue() > 0
+
+            if pnl_option.trigger_at_percent.ToUiValue() == 0:
+                return
+
+        if is_limit:
             self.limits.append(pnl_option)
-        elif pnl_option.trigger_at_percent.ToUiValue() < 0:
+        else:
             self.stop_losses.append(pnl_option)
 
 class TokenAccountInfo:
@@ -143,11 +152,40 @@ class TokenInfo:
         self.market_id = ''
         self.price = 0
         self.token_vault_ui_amount = 0
+        self.sol_vault_ui_amount = 0
         self.sol_vault_address = ''
         self.token_vault_address = ''
         self.sol_address = ''
         self.token_decimals = ''
         self.decimals_scale_factor = 0
+        self.fee_rate = c_default_pool_fee_rate #Pool trade fee as a fraction of the input amount
+        self.pool_keys : dict = None #Raydium API pool key set, used to build swaps locally
+        self.trades : deque[TokenTrade] = deque() #Swaps inferred from vault changes, drained by MarketManager
+
+#Swap inferred from consecutive pool reserves. With separate vault subscriptions one swap may arrive as two
+#partial trades (one per vault); their volumes still add up to the swap's.
+class TokenTrade:
+    def __init__(self, timestamp: datetime, price: float, base_amount: float, quote_amount: float, is_buy: bool, trade_count: int):
+        self.timestamp = timestamp
+        self.price = price
+        self.base_amount = base_amount #Token ui amount
+        self.quote_amount = quote_amount #SOL ui amount
+        self.is_buy = is_buy
+        self.trade_count = trade_count
+
+#Expected result of swapping against a pool's current reserves; amounts are ui values
+class SwapQuote:
+    def __init__(self, token_address: str, order_type: Order_Type, in_amount: float, out_amount: float, minimum_out: float,
+                 fee_amount: float, spot_price: float, execution_price: float, price_impact_percent: float):
+        self.token_address = token_address
+        self.order_type = order_type #BUY spends SOL for tokens, SELL spends tokens for SOL
+        self.in_amount = in_amount
+        self.out_amount = out_amount
+        self.minimum_out = minimum_out #out_amount less the slippage tolerance
+        self.fee_amount = fee_amount #In input units
+        self.spot_price = spot_price #SOL per token before the swap
+        self.execution_price = execution_price #SOL per token paid or received
+        self.price_impact_percent = price_impact_percent
 
 class SwapTransactionInfo:
     def __init__(self):
@@ -174,8 +212,22 @@ class AbstractMarketManager:
         pass
 
     @abstractmethod
-    def get_candlesticks(self, token_address: str, interval: int)->list[Candlestick]:
+    def get_candlesticks(self, token_address: str, interval: int)->CandlestickSeries:
+        pass
+
+    @abstractmethod
+    def add_indicator(self, token_address: str, interval: int, indicator):
         pass
+
+    @abstractmethod
+    def get_quote(self, token_address: str, order_type: Order_Type, amount: Amount, slippage: Amount)->SwapQuote:
+        pass
+
+    def get_candlesticks_range(self, token_address: str, interval: int, start_time: datetime, end_time: datetime)->CandlestickSeries:
+        candlesticks = self.get_candlesticks(token_address, interval)
+
+        if candlesticks is not None:
+            return candlesticks.get_range(start_time, end_time)
     
 class OrderExecutor:
     def __init__(self, market_manager: AbstractMarketManager):#FIXME
@@ -193,5 +245,31 @@ class OrderExecutor:
     def get_account_balance(self, account_address: str)->Amount:
         pass
 
+    def run_order_task(self, task, *args)->concurrent.futures.Future:
+        """
+        Runs task(*args), a blocking order step such as execute_order and whatever follows it, and returns its future.
+        Executors with their own order threads run it there; by default it runs inline and the future is already done.
+        """
+        future = concurrent.futures.Future()
+
+        try:
+            future.set_result(task(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+        return future
+
+    def get_account_balance_slot(self, account_address: str)->int:
+        """Slot the balance returned by get_account_balance was observed at, or None if unknown."""
+        return None
+
+    def get_order_slot(self, tx_signature: str)->int:
+        """Slot a confirmed order landed in, or None if unknown."""
+        return None
+
     def get_market_manager(self)->AbstractMarketManager:
-        return self.market_manager
\ No newline at end of file
+        return self.market_manager
+
+    def get_trigger_book(self, token_address: str):
+        """Shared TriggerBook.TriggerBook for a token, or None for engines to keep a private one."""
+        return None
\ No newline at end of file
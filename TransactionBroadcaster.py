@@ -0,0 +1,77 @@
+from AsyncSolanaRpcApi import AsyncSolanaRpcApi
+import concurrent.futures
+import threading
+import asyncio
+import time
+
+c_default_resend_interval = 0.4
+c_default_max_duration = 90 #A blockhash expires after ~150 blocks (60-90 seconds)
+
+#Sends signed transactions to every RPC endpoint at once and keeps resending until told to stop
+class TransactionBroadcaster(threading.Thread):
+    def __init__(self, rpc_uris: list[str], resend_interval = c_default_resend_interval, max_duration = c_default_max_duration):
+        threading.Thread.__init__(self, daemon=True)
+        self.rpc_apis = [AsyncSolanaRpcApi(rpc_uri, None, None) for rpc_uri in rpc_uris]
+        self.resend_interval = resend_interval
+        self.max_duration = max_duration
+        self.loop = asyncio.new_event_loop()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def broadcast(self, transaction_bytes: bytes, recent_blockhash: str = None, stop_event: threading.Event = None,
+                  max_rounds: int = None)->concurrent.futures.Future:
+        """
+        Fans transaction_bytes out to all endpoints every resend_interval seconds until stop_event is set
+        (e.g. TransactionChecker.stop_event), recent_blockhash expires, max_rounds is reached or max_duration passes.
+        Returns a future with the number of rounds sent.
+        """
+        return asyncio.run_coroutine_threadsafe(self._broadcast(transaction_bytes, recent_blockhash, stop_event, max_rounds), self.loop)
+
+    def close(self):
+        """Thread safe. Closes every endpoint's RPC session."""
+        for rpc_api in self.rpc_apis:
+            rpc_api.close_threadsafe(self.loop)
+
+    async def _send_to_all(self, transaction_bytes: bytes):
+        results = await asyncio.gather(*[rpc_api.send_transaction(transaction_bytes) for rpc_api in self.rpc_apis], return_exceptions=True)
+
+        for rpc_api, result in zip(self.rpc_apis, results):
+            if isinstance(result, BaseException):
+                print(f"Error sending transaction to {rpc_api.rpc_uri}: " + str(result))
+
+        return results
+
+    async def _broadcast(self, transaction_bytes: bytes, recent_blockhash: str, stop_event: threading.Event, max_rounds: int)->int:
+        start_time = time.time()
+        rounds = 0
+
+        while True:
+            if recent_blockhash and rounds > 0:
+                #Check expiry alongside the resend so it costs no extra wait
+                results = await asyncio.gather(self._send_to_all(transaction_bytes), self.rpc_apis[0].is_blockhash_valid(recent_blockhash),
+                                               return_exceptions=True)
+                blockhash_valid = results[1] is not False
+
+                if isinstance(results[1], BaseException):
+                    print("Error checking blockhash " + str(results[1]))
+            else:
+                await self._send_to_all(transaction_bytes)
+                blockhash_valid = True
+
+            rounds += 1
+
+            if stop_event is None and max_rounds is None:
+                break
+
+            if (stop_event and stop_event.is_set()) or (max_rounds and rounds >= max_rounds) or not blockhash_valid or \
+                time.time() - start_time > self.max_duration:
+                break
+
+            await asyncio.sleep(self.resend_interval)
+
+            if stop_event and stop_event.is_set():
+                break
+
+        return rounds
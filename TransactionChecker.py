@@ -3,7 +3,7 @@ import threading
 import time
 import asyncio
 import websockets
-import json
+import JsonDecoder
 
 class TransactionChecker(threading.Thread):    
     def __init__(self, solana_rpc_api: SolanaRpcApi, tx_signature: str, timeout=60):
@@ -35,7 +35,7 @@ class TransactionChecker(threading.Thread):
     async def _check_transaction(self):
         async with websockets.connect(self.solana_rpc_api.wss_uri) as websocket:
             sub_request = self.solana_rpc_api.get_signature_request(self.tx_signature)
-            request_bytes = json.dumps(sub_request)
+            request_bytes = JsonDecoder.dumps(sub_request)
             
             await websocket.send(request_bytes)
 
@@ -47,7 +47,7 @@ class TransactionChecker(threading.Thread):
 
                     if response:
                         #print("Received a response!" + str(response))
-                        self.final_response = json.loads(response)
+                        self.final_response = JsonDecoder.loads(response)
                 except TimeoutError as e:
                     print("TransactionChecker Timed out!")
 
@@ -0,0 +1,119 @@
+import threading
+import bisect
+
+#A resting price level. Limits fire when the price rises to target_price, stop losses when it falls to it.
+#A trailing stop (trail_percent set, e.g. -0.15) keeps target_price at high_price*(1+trail_percent),
+#where high_price starts at the reference price given and follows the highest price seen while armed.
+class PriceTrigger:
+    def __init__(self, owner, target_price: float, is_limit: bool, data = None, trail_percent: float = None):
+        self.owner = owner #Receives owner.on_trigger(trigger) when dispatched by the book's manager
+        self.target_price = target_price
+        self.is_limit = is_limit
+        self.data = data
+        self.trail_percent = trail_percent
+        self.high_price = target_price/(1 + trail_percent) if trail_percent is not None else None
+
+class TriggerBook:
+    """
+    Price triggers for one token, across every engine trading it. Limits are kept sorted by negated price and stop
+    losses by price, so for any tick the crossed triggers of either side form a suffix of its list: one bisect per
+    side finds them, and removing them is a slice delete. update() costs O(log n + fired) regardless of book size.
+    Trailing stops are re-keyed only when the high exceeds the lowest trailing watermark, not on every tick.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.limit_keys : list[float] = [] #Negated target prices, ascending
+        self.limit_triggers : list[PriceTrigger] = []
+        self.stop_keys : list[float] = [] #Target prices, ascending
+        self.stop_triggers : list[PriceTrigger] = []
+        self.trailing_triggers : list[PriceTrigger] = []
+        self.lowest_trailing_high = float('inf') #Smallest high_price among trailing_triggers
+
+    def __len__(self)->int:
+        return len(self.limit_keys) + len(self.stop_keys)
+
+    def _get_side(self, trigger: PriceTrigger)->tuple[list[float], list[PriceTrigger], float]:
+        if trigger.is_limit:
+            return self.limit_keys, self.limit_triggers, -trigger.target_price
+        else:
+            return self.stop_keys, self.stop_triggers, trigger.target_price
+
+    def add(self, trigger: PriceTrigger):
+        with self.lock:
+            keys, triggers, key = self._get_side(trigger)
+            index = bisect.bisect_right(keys, key)
+            keys.insert(index, key)
+            triggers.insert(index, trigger)
+
+            if trigger.trail_percent is not None:
+                self.trailing_triggers.append(trigger)
+                self.lowest_trailing_high = min(self.lowest_trailing_high, trigger.high_price)
+
+    def remove(self, trigger: PriceTrigger)->bool:
+        with self.lock:
+            if trigger.trail_percent is not None and trigger in self.trailing_triggers:
+                self.trailing_triggers.remove(trigger)
+
+            return self._remove_key(trigger)
+
+    def _remove_key(self, trigger: PriceTrigger)->bool:
+        keys, triggers, key = self._get_side(trigger)
+        index = bisect.bisect_left(keys, key)
+
+        while index < len(keys) and keys[index] == key:
+            if triggers[index] is trigger:
+                del keys[index]
+                del triggers[index]
+                return True
+
+            index += 1
+
+        return False
+
+    def _trail(self, high_price: float):
+        lowest_trailing_high = float('inf')
+
+        for trigger in self.trailing_triggers:
+            if trigger.high_price < high_price:
+                self._remove_key(trigger)
+                trigger.high_price = high_price
+                trigger.target_price = high_price*(1 + trigger.trail_percent)
+                keys, triggers, key = self._get_side(trigger)
+                index = bisect.bisect_right(keys, key)
+                keys.insert(index, key)
+                triggers.insert(index, trigger)
+
+            lowest_trailing_high = min(lowest_trailing_high, trigger.high_price)
+
+        self.lowest_trailing_high = lowest_trailing_high
+
+    def update(self, price: float, high_price: float = None)->list[PriceTrigger]:
+        """
+        Removes and returns every trigger crossed at price. high_price is the highest price since the last update
+        (e.g. the current candle's high), so trailing stops follow highs that coalesced updates skipped.
+        """
+        with self.lock:
+            fired = []
+            high_price = max(price, high_price) if high_price else price
+
+            if high_price > self.lowest_trailing_high:
+                self._trail(high_price)
+
+            limit_index = bisect.bisect_left(self.limit_keys, -price)
+            stop_index = bisect.bisect_left(self.stop_keys, price)
+
+            if limit_index < len(self.limit_keys):
+                fired.extend(self.limit_triggers[limit_index:])
+                del self.limit_keys[limit_index:]
+                del self.limit_triggers[limit_index:]
+
+            if stop_index < len(self.stop_keys):
+                fired.extend(self.stop_triggers[stop_index:])
+                del self.stop_keys[stop_index:]
+                del self.stop_triggers[stop_index:]
+
+                if self.trailing_triggers:
+                    fired_stops = set(fired)
+                    self.trailing_triggers = [trigger for trigger in self.trailing_triggers if trigger not in fired_stops]
+
+            return fired
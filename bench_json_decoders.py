@@ -0,0 +1,102 @@
+#Measures per-message decode cost of the websocket/RPC payloads the bot handles, for each available JSON backend.
+#Usage: python bench_json_decoders.py [iterations] [capture_dir]
+#The built-in payloads are SYNTHETIC: the account frames follow a real token vault notification, but the getTransaction
+#response is generated (placeholder account keys, repeated instructions and log lines), so its size and shape only
+#approximate a real swap. For representative numbers pass a directory of captured frames, one raw JSON message per
+#*.json file (e.g. saved from a websocket session or a getTransaction call); those are benchmarked instead.
+import JsonDecoder
+import json
+import os
+import sys
+import time
+
+# accountNotification for a Raydium token vault (jsonParsed encoding)
+account_notification_json_parsed = '{"jsonrpc":"2.0","method":"accountNotification","params":{"result":{"context":{"slot":312345678},"value":{"lamports":2039280,"data":{"program":"spl-token","parsed":{"info":{"isNative":false,"mint":"GjCqkMr8uvYibgummgXXcrD7jtxUQ17Ljtr8uo4zRULC","owner":"5Q544fKrFoe6tsEbD7S8EmxGTJYAKtTVhAW5Q5pge4j1","state":"initialized","tokenAmount":{"amount":"253641235712345","decimals":6,"uiAmount":253641235.712345,"uiAmountString":"253641235.712345"}},"type":"account"},"space":165},"owner":"TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA","executable":false,"rentEpoch":18446744073709551615,"space":165}},"subscription":24040}}'
+
+# Same account with base64 encoding
+account_notification_base64 = '{"jsonrpc":"2.0","method":"accountNotification","params":{"result":{"context":{"slot":312345678},"value":{"lamports":2039280,"data":["6PuxfKDCbZRFHPJpOQ8eMnYqwdrTfbjJ3bDWQVkDmYRAg26ffOzHKuIp01GDWUpD8N2y8iF8vz+/VjpBxM0nI1lJwXOv5gAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAEAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA==","base64"],"owner":"TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA","executable":false,"rentEpoch":18446744073709551615,"space":165}},"subscription":24040}}'
+
+subscription_confirmation = '{"jsonrpc":"2.0","result":24040,"id":7}'
+
+def _build_transaction_response()->str:
+    """Synthetic swap response shaped like getTransaction (jsonParsed); not a captured one."""
+    account_keys = [{"pubkey": "Acct%02dZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5D" % i, "signer": i == 0, "source": "transaction", "writable": i < 5} for i in range(18)]
+    token_balance = lambda index, amount: {"accountIndex": index, "mint": "GjCqkMr8uvYibgummgXXcrD7jtxUQ17Ljtr8uo4zRULC", "owner": account_keys[0]["pubkey"],
+                                            "programId": "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA",
+                                            "uiTokenAmount": {"amount": str(int(amount*1e6)), "decimals": 6, "uiAmount": amount, "uiAmountString": str(amount)}}
+    instruction = {"accounts": [key["pubkey"] for key in account_keys[:12]], "data": "5D8eW3g9fT2", "programId": "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8", "stackHeight": None}
+    inner_instruction = {"parsed": {"info": {"amount": "1000", "authority": account_keys[0]["pubkey"], "destination": account_keys[3]["pubkey"], "source": account_keys[4]["pubkey"]}, "type": "transfer"},
+                         "program": "spl-token", "programId": "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA", "stackHeight": 2}
+    meta = {"computeUnitsConsumed": 61234, "err": None, "fee": 105000, "innerInstructions": [{"index": 2, "instructions": [inner_instruction]*4}],
+            "logMessages": ["Program 675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8 consumed %d of 200000 compute units" % i for i in range(40)],
+            "postBalances": [1000000000+i for i in range(18)], "postTokenBalances": [token_balance(3, 1250.5), token_balance(5, 99999.1)],
+            "preBalances": [1100000000+i for i in range(18)], "preTokenBalances": [token_balance(5, 101249.6)], "rewards": [], "status": {"Ok": None}}
+    transaction = {"message": {"accountKeys": account_keys, "addressTableLookups": [], "instructions": [instruction]*5,
+                               "recentBlockhash": "9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin"}, "signatures": ["5"*88]}
+
+    return json.dumps({"jsonrpc": "2.0", "id": 3, "result": {"blockTime": 1735000000, "slot": 312345678, "version": 0, "meta": meta, "transaction": transaction}})
+
+get_transaction_response = _build_transaction_response()
+
+def _time_decoder(decoder, payload: str, iterations: int)->float:
+    payload_bytes = payload.encode('utf-8')
+    start = time.perf_counter()
+
+    for i in range(iterations):
+        decoder(payload_bytes)
+
+    return (time.perf_counter()-start)/iterations*1e6
+
+def _load_captured_payloads(capture_dir: str)->dict[str, tuple]:
+    """Key=file name; Value=(raw frame, hot path decoder picked from the frame's kind)"""
+    payloads = {}
+
+    for file_name in sorted(os.listdir(capture_dir)):
+        if file_name.endswith(".json"):
+            with open(os.path.join(capture_dir, file_name), 'r', encoding='utf-8') as file:
+                payload = file.read().strip()
+
+            message = json.loads(payload)
+            is_account_message = isinstance(message, dict) and (message.get('method', None) == "accountNotification" or
+                                                                 isinstance(message.get('result', None), (int, bool)))
+            payloads[file_name] = (payload, JsonDecoder.decode_account_message if is_account_message else JsonDecoder.decode_transaction_response)
+
+    return payloads
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    capture_dir = sys.argv[2] if len(sys.argv) > 2 else None
+    decoders = {"json": json.loads}
+
+    if JsonDecoder.orjson:
+        decoders["orjson"] = JsonDecoder.orjson.loads
+
+    if JsonDecoder.msgspec:
+        decoders["msgspec"] = JsonDecoder.msgspec.json.decode
+
+    if capture_dir:
+        payloads = _load_captured_payloads(capture_dir)
+    else:
+        payloads = {
+            "accountNotification (jsonParsed)": (account_notification_json_parsed, JsonDecoder.decode_account_message),
+            "accountNotification (base64)": (account_notification_base64, JsonDecoder.decode_account_message),
+            "subscription confirmation": (subscription_confirmation, JsonDecoder.decode_account_message),
+            "getTransaction (jsonParsed, synthetic)": (get_transaction_response, JsonDecoder.decode_transaction_response),
+        }
+
+    print(f"Active backend: {JsonDecoder.decoder_name}; msgspec typed structs: {'yes' if JsonDecoder.msgspec else 'no'}")
+    print(f"Payloads: {'captured frames from ' + capture_dir if capture_dir else 'built-in synthetic samples'}")
+
+    for payload_name, (payload, hot_path_decoder) in payloads.items():
+        print(f"\n{payload_name} ({len(payload)} bytes)")
+        baseline = _time_decoder(json.loads, payload, iterations)
+
+        for decoder_name, decoder in decoders.items():
+            elapsed = _time_decoder(decoder, payload, iterations)
+            print(f"  {decoder_name:<10} {elapsed:8.2f} us/msg  x{baseline/elapsed:.2f}")
+
+        elapsed = _time_decoder(hot_path_decoder, payload, iterations)
+        print(f"  {'hot path':<10} {elapsed:8.2f} us/msg  x{baseline/elapsed:.2f}")
+
+if __name__ == "__main__":
+    main()
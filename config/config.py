@@ -8,6 +8,9 @@ priority_fee = Amount.sol_ui(.0001)
 PRIORITY_FEE_INCREMENT_SOL = 0.0001
 MAX_FEE_RETRIES = 5
 PRIORITY_FEE_MAX_SOL = 0.005
+USE_LOCAL_RAYDIUM_SWAP = False # Build and sign AMM v4 swaps locally from cached pool keys; otherwise every swap is built by Jupiter
+BROADCAST_RESEND_INTERVAL = 0.4 # Seconds between re-sends of a pending transaction to every RPC endpoint
+CANDLES_STORE_DIR = "candles_history" # Closed candles are persisted here and reloaded on restart; None keeps them in memory only
 profit_limit = PnlOption(trigger_at_percent = Amount.percent_ui(600), allocation_percent = Amount.percent_ui(100))
 stop_loss = PnlOption(trigger_at_percent = Amount.percent_ui(-15), allocation_percent = Amount.percent_ui(100))
 
@@ -10,6 +10,7 @@ load_dotenv()
 
 # Read environment variables
 http_uri = os.getenv('http_rpc_uri')
+http_uris = [uri.strip() for uri in os.getenv('http_rpc_uris', '').split(',') if uri.strip()] # Optional extra RPC endpoints, comma separated
 wss_uri = os.getenv('wss_rpc_uri')
 keys_hash = os.getenv('payer_hash')
 wallet_address = os.getenv('wallet_address')
\ No newline at end of file
@@ -74,6 +74,10 @@ async def sell_token(trades_manager, market_manager, token_address, slippage, pr
         token_info = market_manager.get_token_info(token_address)
         wallet_balance = trades_manager.get_account_balance(token_address)
 
+        if wallet_balance is None:
+            print(f"No balance available for {token_address} yet.")
+            return
+
         print(f"Current wallet balance for {token_address}: {wallet_balance}")
 
         try: